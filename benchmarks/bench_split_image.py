@@ -0,0 +1,54 @@
+""" Compares the throughput of SplitImage against the original per-row loop, on three 4K images.
+
+Usage: python benchmarks/bench_split_image.py [repetitions]
+"""
+import sys
+import time
+import numpy as np
+from figuregen.util.image import SplitImage
+
+def loop_split(list_img, weights, tan_degree, vertical):
+    """ The original implementation: assigns one slice per row (or column) and image """
+    height, width = list_img[0].shape[:2]
+    result = np.tile([0.0, 0.0, 0.0], (height, width, 1))
+    length, num_lines = (width, height) if vertical else (height, width)
+    cur_pos = 0
+    for i in range(len(list_img)):
+        for line in range(num_lines):
+            offset = tan_degree * (float(num_lines) * 0.5 - line)
+            start = 0 if i == 0 else int(cur_pos + offset)
+            end = length if i == len(list_img) - 1 else int(cur_pos + weights[i] * length + offset)
+            start = max(0, start)
+            end = min(length, end)
+            if vertical:
+                result[line, start:end] = list_img[i][line, start:end]
+            else:
+                result[start:end, line] = list_img[i][start:end, line]
+        cur_pos += weights[i] * length
+    return result
+
+def measure(fn, repetitions):
+    fn() # warm-up
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        fn()
+    return (time.perf_counter() - start) / repetitions
+
+if __name__ == "__main__":
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    rng = np.random.default_rng(0)
+    images = [ rng.random((2160, 3840, 3)).astype(np.float32) for _ in range(3) ]
+    megapixels = 2160 * 3840 / 1e6
+
+    for vertical in [True, False]:
+        split = SplitImage(images, vertical, 15)
+        weights, tan_degree = split.get_weights(), split.tan_degree_rad
+
+        print("vertical split" if vertical else "horizontal split")
+        results = {
+            "loop": measure(lambda: loop_split(images, weights, tan_degree, vertical), repetitions),
+            "vectorized": measure(lambda: SplitImage(images, vertical, 15), repetitions),
+            "vectorized, antialiased": measure(lambda: SplitImage(images, vertical, 15, antialias=True), repetitions),
+        }
+        for name, seconds in results.items():
+            print(f"{name:>24}: {seconds * 1000:8.1f} ms  {megapixels / seconds:8.1f} MP/s")
@@ -0,0 +1,120 @@
+""" Runs the benchmarks in suite.py and reports the time and peak memory of each case.
+
+Usage:
+    python benchmarks/run.py [-k FILTER] [--quick] [--save results.json] [--compare baseline.json]
+
+With --compare, cases that became slower or use more memory than the baseline (by more than --threshold)
+are listed and the exit code is 1, so the script can be used to catch regressions in CI.
+
+The figuregen package is imported from this repository, not from an installed copy.
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import suite
+
+def benchmark_classes():
+    for name in dir(suite):
+        obj = getattr(suite, name)
+        if isinstance(obj, type) and obj.__module__ == suite.__name__ and hasattr(obj, "params"):
+            yield name, obj
+
+def param_combinations(cls):
+    params = cls.params
+    if len(cls.param_names) == 1:
+        params = [params]
+    return list(itertools.product(*params))
+
+def measure_time(fn, min_time: float, max_repeats: int) -> float:
+    """ Median of repeated runs, repeating until min_time is exceeded """
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_repeats and (len(times) < 3 or time.perf_counter() - start < min_time):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+        if max_repeats == 1:
+            break
+    times.sort()
+    return times[len(times) // 2]
+
+def measure_peakmem(fn) -> int:
+    """ Peak memory in bytes allocated by a single run, as traced by Python (numpy arrays included) """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run(filter: str, quick: bool) -> dict:
+    results = {}
+    for cls_name, cls in benchmark_classes():
+        for args in param_combinations(cls):
+            for method in sorted(m for m in dir(cls) if m.startswith(("time_", "peakmem_"))):
+                name = f"{cls_name}.{method}({', '.join(str(a) for a in args)})"
+                if filter not in name:
+                    continue
+
+                bench = cls()
+                try:
+                    if hasattr(bench, "setup"):
+                        bench.setup(*args)
+                except NotImplementedError as err:
+                    print(f"{name:<60} skipped: {err}")
+                    continue
+
+                try:
+                    fn = lambda: getattr(bench, method)(*args)
+                    if method.startswith("time_"):
+                        value = measure_time(fn, 0.0 if quick else 1.0, 1 if quick else 20)
+                        print(f"{name:<60} {value * 1000:10.2f} ms")
+                    else:
+                        value = measure_peakmem(fn)
+                        print(f"{name:<60} {value / 2**20:10.2f} MiB")
+                    results[name] = value
+                finally:
+                    if hasattr(bench, "teardown"):
+                        bench.teardown(*args)
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for name, value in results.items():
+        old = baseline.get(name)
+        if old is not None and old > 0 and value / old > threshold:
+            regressions.append((name, old, value))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="run each case only once")
+    parser.add_argument("--save", help="write the results to this .json file")
+    parser.add_argument("--compare", help="compare against the results in this .json file")
+    parser.add_argument("--threshold", type=float, default=1.2,
+        help="ratio to the baseline above which a case counts as a regression (default: 1.2)")
+    args = parser.parse_args()
+
+    results = run(args.filter, args.quick)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, old, new in regressions:
+            print(f"Regression: {name} {old:.4g} -> {new:.4g} ({new / old:.2f}x)")
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,201 @@
+""" Benchmarks of the layout, the image export, and all backends, on synthetic figures.
+
+The classes follow the conventions of airspeed velocity (asv): `params` / `param_names` define the cases,
+`setup` prepares them (raising NotImplementedError skips a case), methods starting with `time_` are timed, and
+methods starting with `peakmem_` are measured for their peak memory. Run them with benchmarks/run.py.
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+
+import figuregen
+from figuregen import calculate as calc
+from figuregen.backend import Backend, Bounds
+from figuregen.html import HtmlBackend
+from figuregen.powerpoint import PptxBackend
+from figuregen.raster import RasterBackend
+from figuregen.tikz import TikzBackend
+from figuregen.typst import TypstBackend
+from figuregen.pdflatex import PdfBackend
+from figuregen.pdfwriter import NativePdfBackend
+from figuregen.svg import SvgBackend, NativeSvgBackend
+from figuregen.util.image import SplitImage
+
+def make_grid(rows: int, cols: int, resolution: int = 64, seed: int = 0) -> figuregen.Grid:
+    """ A grid of random images with titles, captions, labels, and frames """
+    rng = np.random.default_rng(seed)
+    grid = figuregen.Grid(rows, cols)
+    for r in range(rows):
+        for c in range(cols):
+            e = grid[r, c]
+            e.image = figuregen.PNG(rng.random((resolution, resolution, 3), dtype=np.float32))
+            e.set_frame(0.5, [0, 0, 0])
+            e.set_label(f"{r},{c}", "bottom_right", width_mm=6, height_mm=3)
+            e.set_caption(f"({r}, {c})")
+    grid.set_title("top", "Title")
+    grid.set_row_titles("left", [f"row {r}" for r in range(rows)])
+    grid.set_col_titles("top", [f"col {c}" for c in range(cols)])
+    grid.layout.titles[figuregen.TOP].size = 4
+    grid.layout.row_titles[figuregen.LEFT].size = 3
+    grid.layout.column_titles[figuregen.TOP].size = 3
+    grid.layout.captions[figuregen.BOTTOM].size = 3
+    grid.layout.set_padding(column=1, row=1)
+    return grid
+
+def make_figure(num_rows: int, grids_per_row: int, size: int, resolution: int = 64) -> list:
+    return [
+        [ make_grid(size, size, resolution, seed=r * grids_per_row + g) for g in range(grids_per_row) ]
+        for r in range(num_rows)
+    ]
+
+class Layout:
+    """ compute_aligned_sizes and gen_grid, without generating any code or files """
+    params = [1, 5, 20, 50]
+    param_names = ["grid size"]
+
+    def setup(self, size):
+        self.figure = make_figure(2, 3, size)
+        self.backend = Backend(executor="inline")
+        # Wide enough that the images do not shrink below 1mm
+        self.grid_width = 30 + 5 * size
+
+    def teardown(self, size):
+        self.backend.shutdown()
+
+    def time_layout(self, size):
+        for row in self.figure:
+            sizes = self.backend.compute_aligned_sizes(row, self.grid_width * len(row))
+            for grid, (grid_size, img_size) in zip(row, sizes):
+                self.backend.gen_grid(grid, Bounds(0, 0, grid_size.width_mm, grid_size.height_mm), img_size)
+
+    def time_calculate(self, size):
+        for row in self.figure:
+            for grid in row:
+                elem_size = calc.element_size_from_width(grid, self.grid_width)
+                height = calc.total_height(grid, elem_size)
+                calc.element_size_from_height(grid, height)
+                for r in range(grid.rows):
+                    for c in range(grid.cols):
+                        calc.image_pos(grid, elem_size, c, r)
+                        calc.south_caption_pos(grid, elem_size, c, r)
+
+    def peakmem_layout(self, size):
+        self.time_layout(size)
+
+class Export:
+    """ Exporting a single raster image """
+    params = [[64, 512, 1024, 3840], ["png", "jpg", "html"]]
+    param_names = ["resolution", "format"]
+
+    def setup(self, resolution, fmt):
+        rng = np.random.default_rng(0)
+        pixels = rng.random((resolution * 9 // 16, resolution, 3), dtype=np.float32)
+        self.image = figuregen.JPEG(pixels) if fmt == "jpg" else figuregen.PNG(pixels)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown(self, resolution, fmt):
+        shutil.rmtree(self.tmpdir)
+
+    def time_export(self, resolution, fmt):
+        if fmt == "html":
+            self.image.make_html(100, 56)
+        else:
+            self.image.make_raster(100, 56, os.path.join(self.tmpdir, "image"))
+
+    def peakmem_export(self, resolution, fmt):
+        self.time_export(resolution, fmt)
+
+BACKENDS = {
+    "tikz": (TikzBackend, ".tikz"),
+    "typst": (TypstBackend, ".typ"),
+    "html": (HtmlBackend, ".html"),
+    "pptx": (PptxBackend, ".pptx"),
+    "raster": (RasterBackend, ".png"),
+    "svg": (NativeSvgBackend, ".svg"),
+    "pdf": (NativePdfBackend, ".pdf"),
+}
+
+class Generate:
+    """ Backend.generate of a complete figure with one grid, including all image exports """
+    params = [list(BACKENDS.keys()), [1, 5, 20, 50]]
+    param_names = ["backend", "grid size"]
+
+    def setup(self, backend, size):
+        if backend == "pptx" and size > 20:
+            raise NotImplementedError("python-pptx takes minutes for this many shapes")
+        self.figure = [[ make_grid(size, size) ]]
+        self.tmpdir = tempfile.mkdtemp()
+        backend_type, ext = BACKENDS[backend]
+        self.backend = backend_type()
+        self.filename = os.path.join(self.tmpdir, "figure" + ext)
+
+    def teardown(self, backend, size):
+        self.backend.shutdown()
+        shutil.rmtree(self.tmpdir)
+
+    def time_generate(self, backend, size):
+        figuregen.figure(self.figure, 18, self.filename, backend=self.backend)
+
+    def peakmem_generate(self, backend, size):
+        self.time_generate(backend, size)
+
+class GenerateMultiRow:
+    """ Figures with multiple rows of grids, each with large images """
+    params = [list(BACKENDS.keys()), [64, 1024]]
+    param_names = ["backend", "resolution"]
+
+    def setup(self, backend, resolution):
+        self.figure = make_figure(3, 3, 2, resolution)
+        self.tmpdir = tempfile.mkdtemp()
+        backend_type, ext = BACKENDS[backend]
+        self.backend = backend_type()
+        self.filename = os.path.join(self.tmpdir, "figure" + ext)
+
+    def teardown(self, backend, resolution):
+        self.backend.shutdown()
+        shutil.rmtree(self.tmpdir)
+
+    def time_generate(self, backend, resolution):
+        figuregen.figure(self.figure, 18, self.filename, backend=self.backend)
+
+    def peakmem_generate(self, backend, resolution):
+        self.time_generate(backend, resolution)
+
+class Compile:
+    """ Backends that call external tools, skipped if the tool is not installed """
+    params = [["pdflatex", "typst"], [1, 5]]
+    param_names = ["tool", "grid size"]
+
+    def setup(self, tool, size):
+        if shutil.which(tool) is None:
+            raise NotImplementedError(f"{tool} is not installed")
+        self.figure = [[ make_grid(size, size) ]]
+        self.tmpdir = tempfile.mkdtemp()
+        self.backend = PdfBackend() if tool == "pdflatex" else SvgBackend()
+        self.filename = os.path.join(self.tmpdir, "figure.pdf" if tool == "pdflatex" else "figure.svg")
+
+    def teardown(self, tool, size):
+        self.backend.shutdown()
+        shutil.rmtree(self.tmpdir)
+
+    def time_generate(self, tool, size):
+        figuregen.figure(self.figure, 18, self.filename, backend=self.backend)
+
+class Split:
+    """ SplitImage of three images """
+    params = [[512, 3840], [True, False]]
+    param_names = ["resolution", "vertical"]
+
+    def setup(self, resolution, vertical):
+        rng = np.random.default_rng(0)
+        self.images = [ rng.random((resolution * 9 // 16, resolution, 3), dtype=np.float32) for _ in range(3) ]
+
+    def time_split(self, resolution, vertical):
+        SplitImage(self.images, vertical, 15)
+
+    def time_split_antialiased(self, resolution, vertical):
+        SplitImage(self.images, vertical, 15, antialias=True)
+
+    def peakmem_split(self, resolution, vertical):
+        SplitImage(self.images, vertical, 15)
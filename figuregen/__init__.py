@@ -3,4 +3,7 @@ from .figuregen import *
 from .layout import GridLayout, TextFieldLayout, LEFT, TOP, BOTTOM, RIGHT
 from .element_data import *
 from .matplot_lineplot import MatplotLinePlot
-from .pgf_lineplot import PgfLinePlot
\ No newline at end of file
+from .pgf_lineplot import PgfLinePlot
+from .cache import RenderCache
+from .batch import FigureBatch, FigureTiming, build_many
+from .profiling import Profiler, ProfileReport, TimingEvent
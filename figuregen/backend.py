@@ -1,9 +1,21 @@
-from typing import List, Sequence, Tuple
+from typing import Iterable, Iterator, List, Sequence, Tuple
 from dataclasses import dataclass, field
+from concurrent.futures import Future
+import asyncio
+import contextlib
+import copy
 import os
+import threading
+import numpy as np
+import simpleimageio
 from .figuregen import *
 from . import calculate as calc
 from .element_data import *
+from .cache import RenderCache, export_key
+from .manifest import BuildManifest
+from .executor import Executor, make_executor
+from .profiling import Profiler
+from .util.image import resize, RESAMPLE_FILTERS
 
 @dataclass
 class Bounds:
@@ -54,39 +66,409 @@ class LineComponent(Component):
     linewidth: float
     color: Tuple[float, float, float]
 
+def write_chunks(file, data: str | Iterable[str]):
+    """ Writes a string, or a sequence of strings as they are generated, to an open file """
+    if isinstance(data, str):
+        file.write(data)
+    else:
+        for chunk in data:
+            file.write(chunk)
+
+def _is_passthrough(data: ElementData) -> bool:
+    return isinstance(data, RasterImage) and data.can_passthrough()
+
+class SharedExports:
+    """ The results of all exports of one figure, so that elements that appear multiple times, or have the same
+    content, are only exported once and share the generated file.
+
+    Elements are matched by identity first. Content hashes are only computed for elements of the same type and
+    resolution, so figures without duplicates do not pay for hashing.
+    """
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._futures = {}
+        self._candidates = {}
+        self._hashes = {}
+
+    def _content_hash(self, data: ElementData) -> str | None:
+        if id(data) not in self._hashes:
+            self._hashes[id(data)] = data.content_hash()
+        return self._hashes[id(data)]
+
+    def get_or_run(self, data: ElementData, key: tuple, run):
+        """ Returns the result of the first call with the same element (or content) and key, or calls run() if
+        there is none. Concurrent calls with the same element wait for the first one.
+        """
+        identity = (id(data), *key)
+        resolution = (data.width_px, data.height_px) if isinstance(data, RasterImage) else None
+        signature = (type(data), resolution, *key)
+        with self._mutex:
+            future = self._futures.get(identity)
+            candidates = list(self._candidates.get(signature, []))
+        if future is not None:
+            return future.result()
+
+        for other, other_future in candidates:
+            h = self._content_hash(data)
+            if h is not None and self._content_hash(other) == h:
+                future = other_future
+                break
+
+        with self._mutex:
+            future = self._futures.get(identity, future)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                # Also keeps the element alive, so its id is not reused during the build
+                self._candidates.setdefault(signature, []).append((data, future))
+            self._futures[identity] = future
+
+        if not is_owner:
+            return future.result()
+        try:
+            result = run()
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        future.set_result(result)
+        return result
+
+def component_id(c: Component) -> str:
+    """ The id of a component within the figure, e.g., "fig0-grid1-row2-col3" """
+    elem_id = f"fig{c.figure_idx}-grid{c.grid_idx}"
+    if c.row_idx >= 0:
+        elem_id += f"-row{c.row_idx}"
+    if c.col_idx >= 0:
+        elem_id += f"-col{c.col_idx}"
+    return elem_id
+
+def _file_size(filename: str) -> int:
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
 class Backend:
+    def __init__(self, render_cache: RenderCache | None = None, executor: str | Executor = "thread",
+                 max_workers: int | None = None, export_dpi: float | None = None, resample_filter: str = "lanczos",
+                 incremental: bool = False, profiler: Profiler | None = None, deduplicate: bool = True):
+        """
+        Options shared by all backends. Derived classes forward additional keyword arguments to this constructor.
+
+        Args:
+            render_cache: a RenderCache to look up and store exported images and plots, or None to always
+                re-export all elements
+            executor: how to run the image exports: "thread" (default), "process" for a pool of worker processes,
+                "inline" to run everything sequentially, or an Executor object (which can be shared by backends)
+            max_workers: number of threads or processes, ignored if an Executor object is given
+            export_dpi: if set, raster images with a higher resolution than needed to print them at this dpi
+                are downsampled before they are exported. Images are never upsampled.
+            resample_filter: the filter used for downsampling, one of "nearest", "box", "bilinear", "bicubic",
+                or "lanczos"
+            incremental: if true, a manifest of all exported files is stored next to the output file. When the
+                figure is generated again, files of unchanged elements are reused instead of being exported.
+            profiler: if set, the time spent in each stage (layout, generating components, exporting each element,
+                writing, compiling) is recorded there, see Profiler.report()
+            deduplicate: if true, elements that appear multiple times in a figure (the same object, or identical
+                content at the same size) are exported once, and all occurrences reference the same file
+        """
+        if resample_filter not in RESAMPLE_FILTERS:
+            raise ValueError(f"Unknown resample filter '{resample_filter}', use one of {RESAMPLE_FILTERS}")
+        self.render_cache = render_cache
+        self._executor = make_executor(executor, max_workers)
+        self._owns_executor = not isinstance(executor, Executor)
+        self.export_dpi = export_dpi
+        self.resample_filter = resample_filter
+        self.incremental = incremental
+        self.profiler = profiler
+        self.deduplicate = deduplicate
+        self._manifest = None
+        self._shared_exports = None
+
+    def _forwarded_options(self) -> dict:
+        """ Keyword arguments for backends that wrap another backend, so both share the same options """
+        return {
+            "render_cache": self.render_cache,
+            "executor": self._executor,
+            "export_dpi": self.export_dpi,
+            "resample_filter": self.resample_filter,
+            "profiler": self.profiler,
+            "deduplicate": self.deduplicate,
+        }
+
+    def _measure(self, stage: str, name: str = ""):
+        """ Context manager that records the enclosed code in the profiler. Yields the TimingEvent, or None if
+        profiling is disabled.
+        """
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.measure(stage, name)
+
+    def shutdown(self):
+        """ Releases the threads or processes of the executor, unless it was given by the caller (and might be
+        shared with other backends). The backend cannot be used afterwards.
+        """
+        if self._owns_executor:
+            self._executor.shutdown()
+
+    def _set_build_state(self, manifest: BuildManifest | None, shared_exports: SharedExports | None):
+        """ Sets the manifest and shared exports of the figure that is being generated.
+        Backends that wrap another backend forward them.
+        """
+        self._manifest = manifest
+        self._shared_exports = shared_exports
+
+    def _start_build(self, filename: str):
+        manifest = BuildManifest.for_output(filename) if self.incremental else None
+        self._set_build_state(manifest, SharedExports() if self.deduplicate else None)
+
+    def _finish_build(self):
+        if self._manifest is not None:
+            self._manifest.save()
+        self._set_build_state(None, None)
+
+    def _shared(self, data: ElementData, key: tuple, run):
+        """ Calls run(), or returns the result of an earlier call for the same element and key in this figure """
+        if self._shared_exports is None:
+            return run()
+        return self._shared_exports.get_or_run(data, key, run)
+
+    def _dedup_key(self, data: ElementData, kind: str, width: float, height: float) -> tuple:
+        """ Identifies the output of an export within a figure """
+        resolution = self._target_resolution(data, width, height) if kind in ["raster", "html"] else None
+        if kind == "raster" and resolution is None and isinstance(data, RasterImage):
+            # Raster images are exported at their own resolution, regardless of their size in the figure
+            return (kind,)
+        return (kind, f"{width:.4f}", f"{height:.4f}", resolution, self.resample_filter)
+
+    def _target_resolution(self, data: ElementData, width: float, height: float) -> Tuple[int, int] | None:
+        """ The resolution in pixels to downsample a raster image to, or None if it should be exported as-is """
+        if self.export_dpi is None or not isinstance(data, RasterImage):
+            return None
+        w = min(data.width_px, max(1, round(width / 25.4 * self.export_dpi)))
+        h = min(data.height_px, max(1, round(height / 25.4 * self.export_dpi)))
+        if w == data.width_px and h == data.height_px:
+            return None
+        return w, h
+
+    def _downsample(self, data: RasterImage, resolution: Tuple[int, int]) -> RasterImage:
+        """ Creates a copy of the image with the given resolution. Filtering is done in linear space. """
+        lin = simpleimageio.srgb_to_lin(data.raw_float)
+        lin = np.maximum(resize(lin, resolution[0], resolution[1], self.resample_filter), 0)
+        small = copy.copy(data)
+        small.raw = simpleimageio.lin_to_srgb(lin)
+        small.width, small.height = resolution
+        small.scale = 1
+        return small
+
+    def _export_file(self, data: ElementData, kind: str, width: float, height: float, base_filename: str,
+                     name: str = "", share: bool = True) -> str:
+        """ Exports an element via make_pdf (kind = "pdf") or make_raster (kind = "raster").
+        Consults the render cache first, if there is one. The name identifies the element in the profiler.
+
+        If share is true, an element that was already exported in this figure is not exported again, the file of
+        the first occurrence is returned instead. Callers that move or delete the file must set it to false.
+        """
+        if share:
+            return self._shared(data, self._dedup_key(data, kind, width, height),
+                lambda: self._export_file(data, kind, width, height, base_filename, name, share=False))
+
+        resolution = self._target_resolution(data, width, height) if kind == "raster" else None
+        if resolution is None and kind == "raster" and _is_passthrough(data):
+            # Copying the source file is cheaper than hashing it for the cache or sending it to a worker
+            with self._measure("export", name) as event:
+                filename = data.make_raster(width, height, base_filename)
+                if event is not None:
+                    event.bytes_written = _file_size(filename)
+            return filename
+
+        key = None
+        if self.render_cache is not None or self._manifest is not None:
+            extra = [] if resolution is None else [resolution, self.resample_filter]
+            key = export_key(data, kind, width, height, *extra)
+
+        def export(base):
+            d = data if resolution is None else self._downsample(data, resolution)
+            return self._executor.export(d, kind, width, height, base)
+        return self._export_cached(key, base_filename, export, name)
+
+    def _export_cached(self, key: str | None, base_filename: str, export, name: str = "") -> str:
+        """ Reuses the file from the previous build or copies the file cached under the given key, if any.
+        Otherwise, calls export(base_filename) and adds the generated file to the render cache.
+        A key of None disables the cache and the manifest.
+        """
+        with self._measure("export", name) as event:
+            exported = []
+            def tracked_export(base):
+                exported.append(True)
+                return export(base)
+
+            filename = self._fetch_or_export(key, base_filename, tracked_export)
+            if event is not None:
+                event.bytes_written = _file_size(filename)
+                if key is not None:
+                    event.cache_hit = not exported
+            return filename
+
+    def _fetch_or_export(self, key: str | None, base_filename: str, export) -> str:
+        if key is None:
+            return export(base_filename)
+
+        manifest = self._manifest
+        if manifest is not None:
+            filename = manifest.lookup(base_filename, key)
+            if filename is not None:
+                return filename
+
+        if self.render_cache is not None:
+            filename = self.render_cache.fetch_or_export(key, base_filename, export)
+        else:
+            filename = export(base_filename)
+
+        if manifest is not None:
+            manifest.record(base_filename, key, filename)
+        return filename
+
+    def _export_html(self, data: ElementData, width: float, height: float, name: str = "") -> str:
+        """ Generates the inline html code of an element via make_html, consulting the render cache first. """
+        return self._shared(data, self._dedup_key(data, "html", width, height),
+            lambda: self._export_html_unshared(data, width, height, name))
+
+    def _export_html_unshared(self, data: ElementData, width: float, height: float, name: str) -> str:
+        with self._measure("export", name) as event:
+            exported = []
+            html = self._fetch_or_export_html(data, width, height, lambda: exported.append(True))
+            if event is not None:
+                event.bytes_written = len(html)
+                if self.render_cache is not None and not _is_passthrough(data):
+                    event.cache_hit = not exported
+            return html
+
+    def _fetch_or_export_html(self, data: ElementData, width: float, height: float, on_export) -> str:
+        resolution = self._target_resolution(data, width, height)
+        if resolution is None and _is_passthrough(data):
+            return data.make_html(width, height)
+
+        def export():
+            on_export()
+            d = data if resolution is None else self._downsample(data, resolution)
+            return self._executor.export(d, "html", width, height, None)
+
+        if self.render_cache is None:
+            return export()
+
+        extra = [] if resolution is None else [resolution, self.resample_filter]
+        key = self.render_cache.key(data, "html", width, height, *extra)
+        if key is None:
+            return export()
+        return self.render_cache.fetch_text_or_export(key, export)
+
+    def _stream_lines(self, data: List[List], lookahead: int = 0) -> Iterator[str]:
+        """ Yields the lines of all rows in order, each followed by a newline.
+
+        Lines can be strings, Futures, or callables returning a string. Callables are only submitted to the executor
+        once there are fewer than `lookahead` other callables running or waiting to be written, so that the results
+        held in memory are bounded. All references to a line are dropped as soon as it was yielded.
+        The given list is emptied.
+        """
+        lines = [ line for row in data for line in row ]
+        data.clear()
+        deferred = [ callable(line) for line in lines ]
+
+        in_flight = 0
+        next_submit = 0
+        for i in range(len(lines)):
+            while next_submit < len(lines) and (next_submit <= i or in_flight < lookahead):
+                if deferred[next_submit]:
+                    lines[next_submit] = self._executor.submit(lines[next_submit])
+                    in_flight += 1
+                next_submit += 1
+
+            line = lines[i]
+            lines[i] = None
+            if deferred[i]:
+                in_flight -= 1
+            yield (line.result() if isinstance(line, Future) else line) + "\n"
+
     def generate(self, grids: List[List[Grid]], width_mm: float, filename: str):
-        output_dir = os.path.dirname(filename)
+        self._start_build(filename)
+
+        gen_rows, bounds = self._layout(grids, width_mm, os.path.dirname(filename))
+
+        # Combine all rows
+        with self._measure("combine_rows"):
+            result = self.combine_rows(gen_rows, bounds)
+        with self._measure("write_to_file", filename) as event:
+            self.write_to_file(result, filename)
+            if event is not None:
+                event.bytes_written = _file_size(filename)
+        self._finish_build()
+
+    async def generate_async(self, grids: List[List[Grid]], width_mm: float, filename: str):
+        """ Like generate(), but waits for the exports and external tools without blocking the event loop.
+
+        The layout and code generation run synchronously, the exports run in the executor as usual.
+        """
+        self._start_build(filename)
+
+        gen_rows, bounds = self._layout(grids, width_mm, os.path.dirname(filename))
+        futures = [ line for row in gen_rows if isinstance(row, list) for line in row if isinstance(line, Future) ]
 
+        # Combining can start additional exports (or, for some backends, wait for them)
+        with self._measure("combine_rows"):
+            result = await asyncio.to_thread(self.combine_rows, gen_rows, bounds)
+            await asyncio.gather(*[ asyncio.wrap_future(f) for f in futures ])
+
+        with self._measure("write_to_file", filename) as event:
+            await self.write_to_file_async(result, filename)
+            if event is not None:
+                event.bytes_written = _file_size(filename)
+        self._finish_build()
+
+    async def write_to_file_async(self, data, filename: str):
+        """ Asynchronous version of write_to_file, the default runs it in a separate thread.
+        Backends that call external tools override this to run them as asyncio subprocesses.
+        """
+        await asyncio.to_thread(self.write_to_file, data, filename)
+
+    def _layout(self, grids: List[List[Grid]], width_mm: float, output_dir: str) -> Tuple[list, Bounds]:
+        """ Generates and assembles the components of all grids, and combines them per row.
+
+        Returns:
+            The combined rows, and the bounds of the whole figure
+        """
         gen_rows = []
         top = 0
         row_idx = 0
         for row in grids:
-            sizes = self.compute_aligned_sizes(row, width_mm)
+            with self._measure("layout", f"fig{row_idx}"):
+                sizes = self.compute_aligned_sizes(row, width_mm)
 
             # generate all grids
             gen_grids = []
             left = 0
             for grid_idx in range(len(row)):
                 bounds = Bounds(top, left, sizes[grid_idx][0].width_mm, sizes[grid_idx][0].height_mm)
-                components = self.gen_grid(grids[row_idx][grid_idx], bounds, sizes[grid_idx][1])
+                with self._measure("gen_grid", f"fig{row_idx}-grid{grid_idx}"):
+                    components = self.gen_grid(grids[row_idx][grid_idx], bounds, sizes[grid_idx][1])
 
                 # Set the correct figure and grid indices on all components
                 for c in components:
                     c.figure_idx = row_idx
                     c.grid_idx = grid_idx
 
-                gen_grids.append(self.assemble_grid(components, output_dir))
+                with self._measure("assemble_grid", f"fig{row_idx}-grid{grid_idx}"):
+                    gen_grids.append(self.assemble_grid(components, output_dir))
                 left += sizes[grid_idx][0].width_mm
 
             bounds = Bounds(top, 0, width_mm, sizes[0][0].height_mm)
-            gen_rows.append(self.combine_grids(gen_grids, row_idx, bounds))
+            with self._measure("combine_grids", f"fig{row_idx}"):
+                gen_rows.append(self.combine_grids(gen_grids, row_idx, bounds))
             top += sizes[0][0].height_mm
             row_idx += 1
 
-        # Combine all rows
-        result = self.combine_rows(gen_rows, Bounds(0, 0, width_mm, top))
-        self.write_to_file(result, filename)
+        return gen_rows, Bounds(0, 0, width_mm, top)
 
     def compute_aligned_sizes(self, grids: List[Grid], width_mm: float) -> List[Tuple[calc.Size, calc.Size]]:
         """
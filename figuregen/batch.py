@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple
+from .figuregen import Grid, _backend_from_filename, _validate
+from .backend import Backend
+from .cache import RenderCache, CacheStats
+from .executor import Executor, make_executor
+
+@dataclass
+class FigureTiming:
+    filename: str
+    seconds: float
+    error: BaseException | None = None
+
+class _BatchExports(RenderCache):
+    """ Used instead of a render cache by a FigureBatch that was not given one.
+
+    Keeps the exported files (and generated html code) in memory instead of copying them to a cache directory,
+    so identical elements of later figures are written from memory. If the total size exceeds the limit, the
+    least recently used entries are dropped.
+    """
+
+    def __init__(self, max_size_mb: float = 256):
+        self.directory = None
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._mutex = threading.Lock()
+        self._stats = CacheStats()
+        self._in_flight = {}
+        # Maps key -> ((extension, content) of a file or the text, size), least recently used first
+        self._entries = OrderedDict()
+
+    def fetch(self, key: str, base_filename: str) -> str | None:
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        ext, content = entry
+        with open(base_filename + ext, "wb") as f:
+            f.write(content)
+        self._count_hit()
+        return base_filename + ext
+
+    def fetch_text(self, key: str) -> str | None:
+        text = self._lookup(key)
+        if text is not None:
+            self._count_hit()
+        return text
+
+    def store(self, key: str, filename: str):
+        with open(filename, "rb") as f:
+            content = f.read()
+        self._insert(key, (os.path.splitext(filename)[1], content), len(content))
+
+    def store_text(self, key: str, text: str):
+        self._insert(key, text, len(text))
+
+    def clear(self):
+        with self._mutex:
+            self._entries.clear()
+            self._stats.size_bytes = 0
+
+    def _lookup(self, key: str):
+        with self._mutex:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _insert(self, key: str, value, size: int):
+        with self._mutex:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._stats.size_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._stats.size_bytes += size
+            self._stats.misses += 1
+            self._evict()
+
+    def _evict(self):
+        while self._stats.size_bytes > self.max_size_bytes and len(self._entries) > 0:
+            _, (_, size) = self._entries.popitem(last=False)
+            self._stats.size_bytes -= size
+            self._stats.evictions += 1
+
+class FigureBatch:
+    """ Generates many figures that share one executor and one render cache.
+
+    Identical elements that appear in multiple figures are exported only once: concurrent exports of the
+    same element wait for each other, and later ones copy the cached file. Without a render cache, the
+    exported files are kept in memory while the batch is open.
+
+    Usage:
+        with FigureBatch() as batch:
+            for scene in scenes:
+                batch.add([[make_grid(scene)]], 18, f"{scene}.pdf")
+            timings = batch.build()
+    """
+
+    def __init__(self, executor: str | Executor = "thread", max_workers: int | None = None,
+                 render_cache: RenderCache | None = None, max_parallel_figures: int = 4, **backend_options):
+        """
+        Args:
+            executor: how to run the image exports of all figures, see Backend.__init__
+            max_workers: number of threads or processes of the executor
+            render_cache: the cache shared by all figures. If None, the exported files are kept in memory (up to
+                256 MB), so identical elements are still only exported once per batch, but not across batches.
+            max_parallel_figures: how many figures are laid out and written at the same time
+            backend_options: additional options for the backends that are created for each figure,
+                e.g., export_dpi. See Backend.__init__.
+        """
+        self._executor = make_executor(executor, max_workers)
+        self._owns_executor = not isinstance(executor, Executor)
+
+        self.render_cache = render_cache if render_cache is not None else _BatchExports()
+
+        self._max_parallel_figures = max_parallel_figures
+        self._backend_options = backend_options
+        self._jobs = []
+
+    @property
+    def backend_options(self) -> dict:
+        """ Keyword arguments for custom backends, so they share the executor and cache of this batch """
+        return dict(self._backend_options, executor=self._executor, render_cache=self.render_cache)
+
+    @property
+    def cache_stats(self) -> CacheStats:
+        return self.render_cache.stats
+
+    def add(self, grids: List[List[Grid]], width_cm: float, filename: str, backend: Backend | None = None):
+        """ Adds a figure, see figuregen.figure()
+
+        Args:
+            backend: a custom backend, should be created with `**batch.backend_options`. If None, the backend is
+                derived from the file extension. Figures are built in parallel and a backend holds the state of
+                the figure it is generating, so each figure needs its own backend object.
+        """
+        if backend is not None and any(job[3] is backend for job in self._jobs):
+            raise ValueError(f"The backend of '{filename}' is already used by another figure of the batch, "
+                "create one backend per figure")
+        self._jobs.append((grids, width_cm, filename, backend))
+
+    def _build_one(self, grids, width_cm, filename, backend) -> FigureTiming:
+        start = time.perf_counter()
+        try:
+            if not _validate(grids):
+                raise ValueError(f"Figure data of '{filename}' is invalid")
+            if backend is None:
+                default_backend = _backend_from_filename(filename, **self.backend_options)
+                try:
+                    default_backend.generate(grids, width_cm * 10, filename)
+                finally:
+                    default_backend.shutdown()
+            else:
+                backend.generate(grids, width_cm * 10, filename)
+        except Exception as err:
+            return FigureTiming(filename, time.perf_counter() - start, err)
+        return FigureTiming(filename, time.perf_counter() - start)
+
+    def build(self) -> List[FigureTiming]:
+        """ Generates all figures added so far.
+
+        Errors do not stop the other figures, they are reported in the returned timings.
+
+        Returns:
+            The wall-clock time spent on each figure, in the order they were added
+        """
+        jobs, self._jobs = self._jobs, []
+        # Figures wait for their exports, so they need their own threads, separate from the executor's
+        with ThreadPoolExecutor(self._max_parallel_figures) as pool:
+            return list(pool.map(lambda job: self._build_one(*job), jobs))
+
+    def close(self):
+        """ Shuts down the executor (if created by the batch) """
+        if self._owns_executor:
+            self._executor.shutdown()
+        if isinstance(self.render_cache, _BatchExports):
+            self.render_cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def build_many(jobs: Iterable[Tuple[List[List[Grid]], float, str]], **kwargs) -> List[FigureTiming]:
+    """ Generates many figures with a shared executor and render cache, see FigureBatch
+
+    Args:
+        jobs: tuples of (grids, width_cm, filename), the arguments of figuregen.figure()
+        kwargs: passed to FigureBatch.__init__
+
+    Returns:
+        The time spent on each figure, in the same order as the jobs
+    """
+    with FigureBatch(**kwargs) as batch:
+        for job in jobs:
+            batch.add(*job)
+        return batch.build()
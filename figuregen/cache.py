@@ -0,0 +1,284 @@
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+
+def _update_hash(h, value) -> bool:
+    if value is None:
+        h.update(b"N")
+    elif isinstance(value, (bool, int, float, complex, str, np.generic)):
+        h.update(type(value).__name__.encode("utf-8"))
+        h.update(repr(value).encode("utf-8"))
+    elif isinstance(value, bytes):
+        h.update(b"B" + str(len(value)).encode("utf-8"))
+        h.update(value)
+    elif isinstance(value, np.ndarray):
+        h.update(b"A" + str(value.dtype).encode("utf-8") + str(value.shape).encode("utf-8"))
+        h.update(np.ascontiguousarray(value).data)
+    elif isinstance(value, (list, tuple)):
+        h.update(b"L" + str(len(value)).encode("utf-8"))
+        for v in value:
+            if not _update_hash(h, v):
+                return False
+    elif isinstance(value, dict):
+        h.update(b"D" + str(len(value)).encode("utf-8"))
+        for k in sorted(value.keys(), key=repr):
+            if not _update_hash(h, k) or not _update_hash(h, value[k]):
+                return False
+    else:
+        return False
+    return True
+
+def content_hash(value) -> str | None:
+    """ Computes a stable hash of (nested) lists, tuples, dicts, numbers, strings, and numpy arrays.
+
+    Returns:
+        The hex digest, or None if the value contains anything else, e.g., arbitrary objects.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    if not _update_hash(h, value):
+        return None
+    return h.hexdigest()
+
+def file_hash(filename: str) -> str:
+    """ Computes the hash of a file's content """
+    h = hashlib.blake2b(digest_size=20)
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def export_key(data, kind: str, width: float, height: float, *extra) -> str | None:
+    """ Computes a key that identifies the output of exporting an element
+
+    Args:
+        data: the ElementData to export
+        kind: the type of output, e.g., "raster", "pdf", or "html"
+        width: Desired width of the image in [mm]
+        height: Desired height of the image in [mm]
+        extra: additional values that change the output, e.g., backend settings
+
+    Returns:
+        The key, or None if the element's content cannot be hashed
+    """
+    h = data.content_hash()
+    if h is None:
+        return None
+    return content_hash([h, kind, f"{width:.4f}", f"{height:.4f}", list(extra)])
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    num_entries: int = 0
+    size_bytes: int = 0
+
+class RenderCache:
+    """ Persistent on-disk cache for the files generated by ElementData.make_raster / make_pdf / make_html
+
+    Entries are keyed by a hash of the element's content, the requested size, and the output format.
+    The backends consult the cache before exporting an element, so unchanged images and plots are
+    copied from the cache instead of being re-encoded or recompiled. If the total size exceeds the
+    given limit, the least recently used entries are evicted.
+
+    The cache can be shared by multiple backends and threads. Multiple processes can share a directory,
+    but will only see each other's entries after they were created. Within one process, identical elements
+    that are exported concurrently (e.g., by different figures sharing the cache) are only exported once,
+    see fetch_or_export().
+    """
+
+    def __init__(self, directory: str, max_size_mb: float = 1024):
+        """
+        Args:
+            directory: where to store the cached files, created if it does not exist
+            max_size_mb: upper bound on the total size of all cached files, in megabytes
+        """
+        self.directory = directory
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        os.makedirs(directory, exist_ok=True)
+
+        self._mutex = threading.Lock()
+        self._stats = CacheStats()
+        self._in_flight = {}
+
+        # Maps key -> (filename, size), least recently used first
+        self._entries = OrderedDict()
+        files = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith(".") or name.endswith(".tmp") or not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            files.append((st.st_mtime, name.split(".")[0], path, st.st_size))
+        for _, key, path, size in sorted(files):
+            self._entries[key] = (path, size)
+            self._stats.size_bytes += size
+        self._evict()
+
+    @property
+    def stats(self) -> CacheStats:
+        """ A snapshot of the number of cache hits, misses, evictions, and the current size """
+        with self._mutex:
+            self._stats.num_entries = len(self._entries)
+            return CacheStats(**vars(self._stats))
+
+    def key(self, data, kind: str, width: float, height: float, *extra) -> str | None:
+        """ Computes the cache key for exporting an element, see export_key() """
+        return export_key(data, kind, width, height, *extra)
+
+    def fetch(self, key: str, base_filename: str) -> str | None:
+        """ Copies a cached file to the given location, if it exists.
+
+        Args:
+            key: the cache key, see key()
+            base_filename: filename without extension, the extension of the cached file will be appended
+
+        Returns:
+            The filename of the copy, or None if the cache does not contain the key.
+        """
+        path = self._lookup(key)
+        if path is None:
+            return None
+        filename = base_filename + os.path.splitext(path)[1]
+        try:
+            shutil.copyfile(path, filename)
+        except FileNotFoundError:
+            self._drop(key)
+            return None
+        except shutil.SameFileError:
+            pass
+        self._count_hit()
+        return filename
+
+    def fetch_text(self, key: str) -> str | None:
+        """ Returns the cached text (e.g., generated html code), or None if the cache does not contain the key. """
+        path = self._lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            self._drop(key)
+            return None
+        self._count_hit()
+        return text
+
+    def store(self, key: str, filename: str):
+        """ Adds a copy of the given file to the cache """
+        path = os.path.join(self.directory, key + os.path.splitext(filename)[1])
+        tmp = path + f".{threading.get_ident()}.tmp"
+        shutil.copyfile(filename, tmp)
+        os.replace(tmp, path)
+        self._insert(key, path)
+
+    def store_text(self, key: str, text: str):
+        """ Adds the given text (e.g., generated html code) to the cache """
+        path = os.path.join(self.directory, key + ".txt")
+        tmp = path + f".{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+        self._insert(key, path)
+
+    def fetch_or_export(self, key: str, base_filename: str, export) -> str:
+        """ Copies the cached file to the given location, or calls export(base_filename) and stores the result.
+
+        If another thread is already exporting the same key, waits for it and copies its result instead.
+        """
+        return self._single_flight(key, lambda: self.fetch(key, base_filename),
+            lambda: self._store_file(key, export(base_filename)))
+
+    def fetch_text_or_export(self, key: str, export) -> str:
+        """ Returns the cached text, or calls export() and stores the returned text, see fetch_or_export() """
+        return self._single_flight(key, lambda: self.fetch_text(key),
+            lambda: self._store_text(key, export()))
+
+    def _store_file(self, key: str, filename: str) -> str:
+        self.store(key, filename)
+        return filename
+
+    def _store_text(self, key: str, text: str) -> str:
+        self.store_text(key, text)
+        return text
+
+    def _single_flight(self, key: str, fetch, produce):
+        while True:
+            result = fetch()
+            if result is not None:
+                return result
+
+            with self._mutex:
+                done = self._in_flight.get(key)
+                is_owner = done is None
+                if is_owner:
+                    done = threading.Event()
+                    self._in_flight[key] = done
+            if not is_owner:
+                # Try again once the other thread is finished. If it failed, this thread takes over.
+                done.wait()
+                continue
+
+            try:
+                return produce()
+            finally:
+                with self._mutex:
+                    del self._in_flight[key]
+                done.set()
+
+    def clear(self):
+        """ Removes all cached files """
+        with self._mutex:
+            for path, _ in self._entries.values():
+                if os.path.exists(path):
+                    os.remove(path)
+            self._entries.clear()
+            self._stats.size_bytes = 0
+
+    def _lookup(self, key: str) -> str | None:
+        with self._mutex:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        try:
+            # Persist the access time so the LRU order survives across sessions
+            os.utime(entry[0])
+        except FileNotFoundError:
+            pass
+        return entry[0]
+
+    def _count_hit(self):
+        with self._mutex:
+            self._stats.hits += 1
+
+    def _drop(self, key: str):
+        with self._mutex:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._stats.size_bytes -= entry[1]
+
+    def _insert(self, key: str, path: str):
+        size = os.path.getsize(path)
+        with self._mutex:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._stats.size_bytes -= old[1]
+            self._entries[key] = (path, size)
+            self._stats.size_bytes += size
+            self._stats.misses += 1
+            self._evict()
+
+    def _evict(self):
+        while self._stats.size_bytes > self.max_size_bytes and len(self._entries) > 0:
+            _, (path, size) = self._entries.popitem(last=False)
+            self._stats.size_bytes -= size
+            self._stats.evictions += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -4,6 +4,9 @@ import base64
 import simpleimageio
 import numpy as np
 import tempfile
+from simpleimageio import zoom
+from . import cache
+from . import image_header
 
 class Error(Exception):
     def __init__(self, message):
@@ -68,6 +71,17 @@ class ElementData:
         html += f"' style='width: {width}mm; height: {height}mm;' />"
         return html
 
+    def content_hash(self) -> str | None:
+        ''' A hash of everything that determines the exported output of this element.
+
+        Used to look up previously exported files in a RenderCache. The default hashes all attributes of the
+        object, which works for all elements that only store numbers, strings, lists, dicts, and numpy arrays.
+
+        Returns:
+            The hash as a hex string, or None if the element cannot be cached.
+        '''
+        return cache.content_hash([type(self).__module__, type(self).__qualname__, vars(self)])
+
 class Plot(ElementData):
     ''' Base class for all generated images and plots.
 
@@ -123,63 +137,247 @@ class PDF(Image):
         shutil.copy(self.file, base_filename + ".pdf")
         return base_filename + ".pdf"
 
+    def content_hash(self) -> str | None:
+        return cache.content_hash([type(self).__qualname__, cache.file_hash(self.file), self.dpi, self.ext])
+
+# Linear value of each 8-bit sRGB value, used to write 8-bit data with simpleimageio. The values are offset by a
+# quarter step, so the writer quantizes them back to the same 8-bit value whether it truncates or rounds.
+_SRGB8_TO_LIN = simpleimageio.srgb_to_lin((np.arange(256, dtype=np.float32)[:, None] + 0.25) / 255)[:, 0]
+
 class RasterImage(Image):
     ''' Abstract base class for all supported raster image types. '''
-    def __init__(self, raw_image_or_filename):
+
+    # File extensions of source files that can be exported as-is, without decoding and re-encoding
+    passthrough_extensions = ()
+
+    def __init__(self, raw_image_or_filename, lazy=None, hardlink=False):
         '''
             Either provide raw image data OR a filename.
+
+            If lazy is True and a filename is given, only the header of the file is read to determine the
+            resolution. The image is decoded when it is exported and released again afterwards, so large
+            images do not occupy memory while the figure is being built.
+            Formats other than .png, .jpg, .exr, and .pfm are always read immediately.
+            The default (None) is lazy for files that are already in the output format: these are copied to the
+            output as-is, without decoding and re-encoding. Accessing raw or source reads the image into memory, after
+            which it is exported from memory, so the data can be modified.
+
+            If hardlink is True, files that are exported as-is are hard-linked instead of copied, where the
+            file system supports it. The output then shares its storage with the source file, so neither must be
+            modified in place.
+
+            Raw image data is stored as given, without a copy. It can be a view into a larger array (e.g., a crop),
+            an np.memmap, or an array in shared memory, so only the pixels that are actually exported are read.
+            Conversion to float happens on export.
+            Raw data can be float sRGB in [0, 1], or 8-bit sRGB (uint8, e.g., from util.image.tonemap_uint8), which
+            is written to .jpg files as-is.
         '''
         assert raw_image_or_filename is not None
 
+        self._raw = None
+        # (stored data, scale, magnified data) of the last access to raw
+        self._magnified = None
+        self.lazy = False
+        self.hardlink = hardlink
+        # Integer magnification, applied by repeating pixels when the image is exported
+        self.scale = 1
         if isinstance(raw_image_or_filename, str):
             self.file = raw_image_or_filename
-            self.raw = simpleimageio.lin_to_srgb(simpleimageio.read(self.file))
-            self.width = self.raw.shape[1]
-            self.height = self.raw.shape[0]
+            if lazy is None:
+                lazy = os.path.splitext(self.file)[1].lower() in self.passthrough_extensions
+            size = image_header.read_size(self.file) if lazy else None
+            if size is not None:
+                self.lazy = True
+                self.width, self.height = size
+            else:
+                self.raw = simpleimageio.lin_to_srgb(simpleimageio.read(self.file))
+                self.width = self.raw.shape[1]
+                self.height = self.raw.shape[0]
         else:
             self.file = None
             self.raw = raw_image_or_filename
             self.width = self.raw.shape[1]
             self.height = self.raw.shape[0]
 
+    @property
+    def source(self):
+        ''' The stored image data in sRGB, before magnification. This is the array that was passed in, not a copy.
+
+        Lazy images are read from the file on first access and kept in memory from then on, so modifications in
+        place are kept. The file is then no longer exported as-is.
+        '''
+        if self._raw is None and self.lazy:
+            self._raw = self._read()
+        return self._raw
+
+    @property
+    def raw(self):
+        ''' The image data in sRGB, with width_px x height_px pixels.
+
+        If the image is magnified (scale > 1), the magnified pixels are computed on first access and kept until the
+        stored data or the scale change, so modifications in place are exported. Assigning sets the stored data,
+        which is still magnified by scale.
+        '''
+        source = self.source
+        if self.scale == 1:
+            return source
+        if self._magnified is None or self._magnified[0] is not source or self._magnified[1] != self.scale:
+            self._magnified = (source, self.scale, self._magnify(source))
+        return self._magnified[2]
+
+    def _read(self):
+        return simpleimageio.lin_to_srgb(simpleimageio.read(self.file))
+
+    def _magnify(self, source):
+        if self.scale == 1:
+            return source
+        if source.dtype == np.uint8:
+            return np.repeat(np.repeat(source, self.scale, axis=0), self.scale, axis=1)
+        return zoom(source, self.scale)
+
+    def _pixels(self):
+        ''' The image data (see raw) for export. Lazy images are decoded without keeping the result. '''
+        if not self.is_loaded:
+            return self._magnify(self._read())
+        return self.raw
+
+    @property
+    def is_8bit(self):
+        ''' True if the image data is 8-bit sRGB (uint8) rather than float '''
+        return self.is_loaded and np.asarray(self._raw).dtype == np.uint8
+
+    @property
+    def raw_float(self):
+        ''' The image data (see raw) as float32 sRGB values in [0, 1], also for 8-bit data '''
+        if self.is_8bit:
+            return self._pixels().astype(np.float32) / 255
+        return np.asarray(self._pixels(), dtype=np.float32)
+
+    def _linear(self):
+        ''' The image data in linear RGB, as expected by simpleimageio.write '''
+        if self.is_8bit:
+            return _SRGB8_TO_LIN[self._pixels()]
+        return simpleimageio.srgb_to_lin(self._pixels())
+
+    @raw.setter
+    def raw(self, v):
+        self._raw = v
+        self._magnified = None
+
+    @property
+    def is_loaded(self):
+        ''' False if the image data has not been read from the file yet '''
+        return self._raw is not None or not self.lazy
+
     @Image.width_px.getter
     def width_px(self):
-        return self.width
+        return self.width * self.scale
 
     @Image.height_px.getter
     def height_px(self):
-        return self.height
+        return self.height * self.scale
 
     @Image.aspect_ratio.getter
     def aspect_ratio(self):
         return float(self.height / float(self.width))
 
     def convert(self, out_filename):
-        simpleimageio.write(out_filename, simpleimageio.srgb_to_lin(self.raw))
+        simpleimageio.write(out_filename, self._linear())
+
+    def can_passthrough(self):
+        ''' True if the source file can be exported as-is '''
+        return (not self.is_loaded and self.scale == 1
+            and os.path.splitext(self.file)[1].lower() in self.passthrough_extensions)
+
+    def copy_source(self, filename):
+        ''' Copies (or hard-links) the source file to the given location '''
+        if os.path.lexists(filename):
+            os.remove(filename)
+        if self.hardlink:
+            try:
+                os.link(self.file, filename)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(self.file, filename)
+
+    def make_html(self, width, height) -> str:
+        if not self.can_passthrough():
+            return ElementData.make_html(self, width, height)
+
+        with open(self.file, "rb") as f:
+            b64 = base64.b64encode(f.read())
+        html = f"<img src='data:{self.mimetype};base64," + b64.decode('utf-8')
+        html += f"' style='width: {width}mm; height: {height}mm;' />"
+        return html
+
+    def content_hash(self) -> str | None:
+        ''' Hashes the stored data (see source) and the scale, but not the magnified copy that raw keeps, so the
+        key does not change when raw is accessed. Modify source rather than raw in place, so the change is seen.
+        Images that are not loaded yet are identified by the content of their file instead.
+        '''
+        attrs = { k: v for k, v in vars(self).items() if k != "_magnified" }
+        if self.is_loaded:
+            return cache.content_hash([type(self).__module__, type(self).__qualname__, attrs])
+        del attrs["_raw"]
+        return cache.content_hash([type(self).__module__, type(self).__qualname__, cache.file_hash(self.file),
+            attrs])
 
 class PNG(RasterImage):
     ''' A raster image that will be converted to .png '''
-    def __init__(self, raw_image_or_filename):
+    passthrough_extensions = (".png",)
+    mimetype = "image/png"
+
+    def __init__(self, raw_image_or_filename, lazy=None, hardlink=False):
         self.ext = ".png"
-        RasterImage.__init__(self, raw_image_or_filename)
+        RasterImage.__init__(self, raw_image_or_filename, lazy, hardlink)
 
     def make_raster(self, width, height, base_filename) -> str:
         filename = base_filename + self.ext
-        self.convert(filename)
+        if self.can_passthrough():
+            self.copy_source(filename)
+        else:
+            self.convert(filename)
         return filename
 
 class JPEG(RasterImage):
     ''' A raster image that will be converted to .jpg '''
-    def __init__(self, raw_image_or_filename, quality=85):
+    passthrough_extensions = (".jpg", ".jpeg")
+    mimetype = "image/jpeg"
+
+    default_quality = 85
+
+    def __init__(self, raw_image_or_filename, quality=default_quality, lazy=None, hardlink=False):
+        '''
+            Files that already are JPEGs are exported as-is by default, unless a quality other than the default is
+            given. See RasterImage for the other arguments.
+        '''
         self.ext = ".jpg"
         self.quality = quality
-        RasterImage.__init__(self, raw_image_or_filename)
+        RasterImage.__init__(self, raw_image_or_filename, lazy, hardlink)
+
+    def can_passthrough(self):
+        return self.quality == self.default_quality and RasterImage.can_passthrough(self)
 
     def make_raster(self, width, height, base_filename) -> str:
         filename = base_filename + self.ext
-        simpleimageio.write(filename, simpleimageio.srgb_to_lin(self.raw), self.quality)
+        if self.can_passthrough():
+            self.copy_source(filename)
+        else:
+            self._write_jpeg(filename)
         return filename
 
+    def _write_jpeg(self, filename):
+        if not self.is_8bit:
+            simpleimageio.write(filename, self._linear(), self.quality)
+            return
+        # 8-bit data is encoded directly, without converting it to float and back
+        from PIL import Image as PILImage
+        pixels = np.ascontiguousarray(self._pixels())
+        if pixels.ndim == 3 and pixels.shape[2] == 1:
+            pixels = pixels[..., 0]
+        PILImage.fromarray(pixels).save(filename, quality=self.quality)
+
 class HTML(Image):
     ''' Embeds a .html.
 
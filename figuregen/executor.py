@@ -0,0 +1,195 @@
+import copy
+import mmap
+import multiprocessing
+import sys
+import threading
+from typing import Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from .element_data import ElementData, RasterImage
+
+def export_element(data: ElementData, kind: str, width: float, height: float, base_filename: str) -> str:
+    """ Exports an element via make_pdf (kind = "pdf"), make_raster (kind = "raster"), or make_html (kind = "html").
+
+    Returns:
+        The filename of the generated file, or the html code if kind = "html".
+    """
+    if kind == "pdf":
+        return data.make_pdf(width, height, base_filename)
+    if kind == "raster":
+        return data.make_raster(width, height, base_filename)
+    if kind == "html":
+        return data.make_html(width, height)
+    raise ValueError(f"Unknown export kind '{kind}'")
+
+# Serializes the temporary replacement of resource_tracker.register in _attach_shared_memory
+_register_lock = threading.Lock()
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """ Attaches to shared memory that is owned (and unlinked) by the parent process, without registering it
+    with the resource tracker, which would otherwise unlink it or warn about a leak when the worker exits.
+
+    Only called in the worker processes of a ProcessExecutor. These run one task at a time on their main thread,
+    so no other code registers resources while the registration is switched off below.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Older versions always register the memory. Unregistering it afterwards would also drop the registration
+    # of the parent, as the workers share its tracker, so the registration is skipped instead, like track=False.
+    with _register_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+def _export_shared(data: RasterImage, shm_name: str, shape, dtype, kind: str, width: float, height: float,
+                   base_filename: str) -> str:
+    """ Runs in a worker process: attaches the raw image data from shared memory and exports the image """
+    shm = _attach_shared_memory(shm_name)
+    try:
+        data.raw = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        return export_element(data, kind, width, height, base_filename)
+    finally:
+        data.raw = None
+        shm.close()
+
+def _export_memmap(data: RasterImage, filename: str, offset: int, shape, dtype, strides, kind: str, width: float,
+                   height: float, base_filename: str) -> str:
+    """ Runs in a worker process: maps the raw image data from the file it is stored in and exports the image """
+    try:
+        data.raw = np.ndarray(shape, dtype=dtype, buffer=np.memmap(filename, mode="r"), offset=offset,
+            strides=strides)
+        return export_element(data, kind, width, height, base_filename)
+    finally:
+        data.raw = None
+
+def _memmap_location(arr: np.ndarray) -> Tuple[str, int] | None:
+    """ The file and byte offset of an array that is (a view of) an np.memmap, or None if it is not mapped
+    from a file or cannot be mapped again in another process.
+    """
+    base = arr
+    while isinstance(base, np.ndarray) and not isinstance(base.base, mmap.mmap):
+        base = base.base
+    if (not isinstance(base, np.memmap) or base.filename is None or base.mode == "c"
+            or any(s < 0 for s in arr.strides)):
+        return None
+    start = arr.__array_interface__["data"][0] - base.__array_interface__["data"][0]
+    return base.filename, base.offset + start
+
+class Executor:
+    """ Runs the tasks of a backend: assembling the code for each component, and exporting element data.
+
+    The default implementation runs everything immediately in the calling thread.
+    """
+
+    def submit(self, fn, *args) -> Future:
+        """ Schedules fn(*args) and returns a Future for its result """
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except BaseException as err:
+            future.set_exception(err)
+        return future
+
+    def export(self, data: ElementData, kind: str, width: float, height: float, base_filename: str) -> str:
+        """ Exports an element, see export_element(). Called from within the tasks passed to submit(). """
+        return export_element(data, kind, width, height, base_filename)
+
+    def shutdown(self):
+        """ Releases all threads and processes, waiting for pending tasks to finish """
+        pass
+
+class InlineExecutor(Executor):
+    """ Runs all tasks sequentially in the calling thread. Useful for debugging and profiling. """
+    pass
+
+class ThreadExecutor(Executor):
+    """ Runs all tasks in a pool of threads. The default. """
+
+    def __init__(self, max_workers: int | None = None):
+        """
+        Args:
+            max_workers: number of threads, None to use the default of concurrent.futures.ThreadPoolExecutor
+        """
+        self._thread_pool = ThreadPoolExecutor(max_workers)
+
+    def submit(self, fn, *args) -> Future:
+        return self._thread_pool.submit(fn, *args)
+
+    def shutdown(self):
+        self._thread_pool.shutdown()
+
+class ProcessExecutor(ThreadExecutor):
+    """ Exports element data in a pool of worker processes, so encoding images and rendering plots use all cores.
+
+    The code generation of the backend still runs in threads, only the calls to make_raster / make_pdf / make_html
+    are shipped to the worker processes, which return the generated file names (or html code).
+    Large raw images are passed via shared memory instead of being pickled.
+
+    Raw images that are (views of) an np.memmap are mapped from their file again by the workers, without a copy.
+
+    All element data must be picklable. As with any use of multiprocessing, scripts that generate figures need
+    to be guarded by `if __name__ == "__main__":`, because the worker processes import the main module.
+    """
+
+    def __init__(self, max_workers: int | None = None, shared_memory_threshold_mb: float = 1.0,
+                 start_method: str | None = None):
+        """
+        Args:
+            max_workers: number of worker processes (and of the threads that wait for them), None to use one per
+                core
+            shared_memory_threshold_mb: raw images of this size or larger are shared with the workers instead of
+                being pickled
+            start_method: the multiprocessing start method, defaults to "forkserver" where available, as
+                forking a process with running threads is unsafe
+        """
+        ThreadExecutor.__init__(self, max_workers)
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._process_pool = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context(start_method))
+        self._shm_threshold = int(shared_memory_threshold_mb * 1024 * 1024)
+
+    def export(self, data: ElementData, kind: str, width: float, height: float, base_filename: str) -> str:
+        # Lazy images are cheap to pickle, the worker reads the file itself
+        if not isinstance(data, RasterImage) or not data.is_loaded or data.source.nbytes < self._shm_threshold:
+            return self._process_pool.submit(export_element, data, kind, width, height, base_filename).result()
+
+        stripped = copy.copy(data)
+        stripped.raw = None
+        source = data.source
+        location = _memmap_location(source) if isinstance(source, np.ndarray) else None
+        if location is not None:
+            filename, offset = location
+            return self._process_pool.submit(_export_memmap, stripped, filename, offset, source.shape,
+                source.dtype, source.strides, kind, width, height, base_filename).result()
+
+        raw = np.ascontiguousarray(source)
+        shm = shared_memory.SharedMemory(create=True, size=raw.nbytes)
+        try:
+            np.ndarray(raw.shape, dtype=raw.dtype, buffer=shm.buf)[...] = raw
+            return self._process_pool.submit(_export_shared, stripped, shm.name, raw.shape, raw.dtype, kind,
+                width, height, base_filename).result()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        ThreadExecutor.shutdown(self)
+        self._process_pool.shutdown()
+
+def make_executor(executor: str | Executor = "thread", max_workers: int | None = None) -> Executor:
+    """ Creates an executor from its name: "thread", "process", or "inline".
+    Returns the given object if it already is an Executor.
+    """
+    if isinstance(executor, Executor):
+        return executor
+    if executor == "thread":
+        return ThreadExecutor(max_workers)
+    if executor == "process":
+        return ProcessExecutor(max_workers)
+    if executor == "inline":
+        return InlineExecutor()
+    raise ValueError(f"Unknown executor '{executor}', use 'thread', 'process', or 'inline'")
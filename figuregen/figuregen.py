@@ -1,6 +1,7 @@
 from typing import List, Self
 from .layout import GridLayout, TextFieldLayout, LEFT, TOP, BOTTOM, RIGHT
 from .element_data import *
+import asyncio
 import copy
 import os
 from dataclasses import dataclass
@@ -318,23 +319,27 @@ from .pdflatex import PdfBackend
 from .html import HtmlBackend
 from .powerpoint import PptxBackend
 from .typst import TypstBackend
-from .svg import SvgBackend
+from .svg import SvgBackend, NativeSvgBackend
+from .raster import RasterBackend
+from .pdfwriter import NativePdfBackend
 
-def _backend_from_filename(filename: str) -> Backend:
-    """ Guesses the correct backend based on the filename """
+def _backend_from_filename(filename: str, **kwargs) -> Backend:
+    """ Guesses the correct backend based on the filename. Keyword arguments are passed to its constructor. """
     extension = os.path.splitext(filename)[1].lower()
     if extension == ".pptx":
-        return PptxBackend()
+        return PptxBackend(**kwargs)
     elif extension == ".html":
-        return HtmlBackend()
+        return HtmlBackend(**kwargs)
     elif extension == ".pdf":
-        return PdfBackend()
+        return PdfBackend(**kwargs)
     elif extension == ".tikz":
-        return TikzBackend()
+        return TikzBackend(**kwargs)
     elif extension == ".typ":
-        return TypstBackend()
+        return TypstBackend(**kwargs)
     elif extension == ".svg":
-        return SvgBackend()
+        return SvgBackend(**kwargs)
+    elif extension in [".png", ".jpg", ".jpeg", ".exr"]:
+        return RasterBackend(**kwargs)
     else:
         raise ValueError(f"Could not derive backend from extension '{filename}'. Please specify.")
 
@@ -349,9 +354,53 @@ def figure(grids: List[List[Grid]], width_cm: float, filename: str, backend: Bac
         width_cm: total width of the figure in centimeters
         backend: a Backend object that will be used to create the figure, or None to use a default
     """
-    if backend is None:
-        backend = _backend_from_filename(filename)
+    if not _validate(grids):
+        return
+
+    if backend is not None:
+        backend.generate(grids, width_cm * 10, filename)
+        return
+
+    backend = _backend_from_filename(filename)
+    try:
+        backend.generate(grids, width_cm * 10, filename)
+    finally:
+        backend.shutdown()
+
+async def figure_async(grids: List[List[Grid]], width_cm: float, filename: str, backend: Backend | None = None,
+                       semaphore: asyncio.Semaphore | None = None):
+    """
+    Asynchronous version of figure(), to generate figures from within an asyncio event loop.
+
+    The layout is computed synchronously. Image exports run in the backend's executor and external tools
+    (pdflatex, typst) run as asyncio subprocesses, so the event loop is not blocked while waiting for them.
+    Any number of figures can be generated concurrently, but each needs its own backend object.
+
+    Args:
+        grids: a list of lists of Grids (figuregen.Grid), which stacks horizontal figures vertically
+        width_cm: total width of the figure in centimeters
+        backend: a Backend object that will be used to create the figure, or None to use a default
+        semaphore: if given, the figure is generated while holding this semaphore, e.g., to limit the number
+            of figures that are generated at the same time
+    """
+    if not _validate(grids):
+        return
 
+    own_backend = backend is None
+    if own_backend:
+        backend = _backend_from_filename(filename)
+    try:
+        if semaphore is None:
+            await backend.generate_async(grids, width_cm * 10, filename)
+        else:
+            async with semaphore:
+                await backend.generate_async(grids, width_cm * 10, filename)
+    finally:
+        if own_backend:
+            backend.shutdown()
+
+def _validate(grids: List[List[Grid]]) -> bool:
+    """ Validates all grids and prints the errors, if any. Returns true if all grids are valid. """
     errors: List[ValidationError] = []
     for row in range(len(grids)):
         for col in range(len(grids[row])):
@@ -366,9 +415,8 @@ def figure(grids: List[List[Grid]], width_cm: float, filename: str, backend: Bac
         print("Figure data is invalid:")
         for err in errors:
             print(f" - {err}")
-        return
-
-    backend.generate(grids, width_cm * 10, filename)
+        return False
+    return True
 
 def horizontal_figure(grids, width_cm: float, filename, backend: Backend | None = None):
     """
@@ -0,0 +1,8 @@
+import os
+
+def find_font(font: str) -> str:
+    """ Path of a font file, given either a path or a family name known to matplotlib (e.g., "DejaVu Sans") """
+    if os.path.isfile(font):
+        return font
+    from matplotlib import font_manager
+    return font_manager.findfont(font_manager.FontProperties(family=[font]))
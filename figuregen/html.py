@@ -1,9 +1,13 @@
-from typing import Union
+from typing import Iterator, Union
+import functools
+import itertools
 from .backend import *
-from concurrent.futures import ThreadPoolExecutor, Future
+from .cache import file_hash
+from concurrent.futures import Future
 
 class HtmlBackend(Backend):
-    def __init__(self, inline=False, custom_head: str = "", id_prefix=""):
+    def __init__(self, inline=False, custom_head: str = "", id_prefix="", max_buffered_images: int = 16,
+                 asset_dir: str | None = None, **kwargs):
         """
         Creates a new HTML backend that emits a static webpage with embedded base64 images.
 
@@ -11,11 +15,19 @@ class HtmlBackend(Backend):
             inline: boolean, if true does not generate <html>, <head>, <body> tags
             custom_head: additonal lines to add to the <head>, ignored if inline = False
             id_prefix: additional text in front of the figure's elements, useful if multiple figures are in on .html
+            max_buffered_images: how many images are encoded ahead of the one currently written to the file.
+                The output is streamed to the file, so this bounds the memory held by base64 payloads.
+            asset_dir: if set, images are not embedded but written to this directory (relative to the .html file)
+                and loaded lazily by the browser. File names are hashes of the content, so unchanged images
+                keep their name (and stay in the browser's cache) when the figure is regenerated.
+            kwargs: options shared by all backends, see Backend.__init__
         """
+        Backend.__init__(self, **kwargs)
         self._inline = inline
         self._custom_head = custom_head
         self._prefix = id_prefix
-        self._thread_pool = ThreadPoolExecutor()
+        self._max_buffered_images = max_buffered_images
+        self._asset_dir = asset_dir
 
     @property
     def style(self) -> str:
@@ -36,10 +48,48 @@ class HtmlBackend(Backend):
     def _html_color(self, rgb) -> str:
         return f"rgb({rgb[0]},{rgb[1]},{rgb[2]})"
 
-    def _make_image(self, c: ImageComponent, dims, pos, elem_id):
+    def _write_asset(self, c: ImageComponent, output_dir: str, elem_idx: str, elem_id: str) -> str | None:
+        """ Writes the image to the asset directory and returns its path relative to the .html file, or None if
+        the element cannot be exported as a raster image.
+        """
+        asset_dir = os.path.join(output_dir, self._asset_dir)
+        os.makedirs(asset_dir, exist_ok=True)
+        base_filename = os.path.join(asset_dir, ".tmp-" + elem_idx)
+        try:
+            # The file is renamed afterwards, so it cannot be shared, the result of this function is shared instead
+            filename = self._export_file(c.data, "raster", c.bounds.width, c.bounds.height, base_filename, elem_id,
+                share=False)
+        except NotImplementedError:
+            return None
+
+        name = os.path.basename(filename)
+        if name.startswith(".tmp-"):
+            name = file_hash(filename) + os.path.splitext(filename)[1]
+            os.replace(filename, os.path.join(asset_dir, name))
+            if self._manifest is not None:
+                # The next build reuses the renamed file, see BuildManifest.lookup()
+                self._manifest.relocate(base_filename, os.path.join(asset_dir, name))
+        return "/".join([ *os.path.normpath(self._asset_dir).split(os.sep), name ])
+
+    def _make_asset(self, c: ImageComponent, output_dir: str, elem_idx: str, elem_id: str) -> str | None:
+        """ Writes the image to the asset directory (once per figure) and returns the <img> tag referencing it,
+        or None if the element cannot be exported as a raster image.
+        """
+        src = self._shared(c.data, ("asset", *self._dedup_key(c.data, "raster", c.bounds.width, c.bounds.height)),
+            lambda: self._write_asset(c, output_dir, elem_idx, elem_id))
+        if src is None:
+            return None
+        return (f"<img src='{src}' loading='lazy' decoding='async' "
+            f"style='width: {c.bounds.width}mm; height: {c.bounds.height}mm;' />")
+
+    def _make_image(self, c: ImageComponent, dims, pos, elem_id, output_dir):
         # Generate the image data
         elem_idx = self._prefix + "img-" + elem_id
-        imgtag = c.data.make_html(c.bounds.width, c.bounds.height)
+        imgtag = None
+        if self._asset_dir is not None:
+            imgtag = self._make_asset(c, output_dir, elem_idx, elem_id)
+        if imgtag is None:
+            imgtag = self._export_html(c.data, c.bounds.width, c.bounds.height, elem_id)
 
         html_code = f"<div class='element' id='{elem_idx}' style='"
         html_code += dims + pos
@@ -69,7 +119,8 @@ class HtmlBackend(Backend):
                 dims = f"width: {c.bounds.width}mm; height: {c.bounds.height}mm;"
 
             if isinstance(c, ImageComponent):
-                html_lines.append(self._thread_pool.submit(self._make_image, c, dims, pos, elem_id))
+                # Exported lazily while the output is streamed, see combine_rows
+                html_lines.append(functools.partial(self._make_image, c, dims, pos, elem_id, output_dir))
 
             if isinstance(c, TextComponent):
                 elem_idx = self._prefix + c.type + "-" + elem_id
@@ -146,23 +197,18 @@ class HtmlBackend(Backend):
 
         return result
 
-    def combine_rows(self, data: List[List[Union[str, Future]]], bounds: Bounds) -> str:
+    def combine_rows(self, data: List[List[Union[str, Future]]], bounds: Bounds) -> Iterator[str]:
         # Create a container div to make sure that everything can be moved around on a final page
         pos = f"top: {bounds.top}mm; left: {bounds.left}mm; "
         dims = f"width: {bounds.width}mm; height: {bounds.height}mm; "
 
-        # Synchronize all export tasks
-        html_code = "<div class='figure' style='" + pos + dims + "'>\n"
-        for row in data:
-            for line in row:
-                if isinstance(line, Future):
-                    html_code += line.result() + "\n"
-                else:
-                    html_code += line + "\n"
-        html_code += "</div>\n"
-        return html_code
+        # The images are exported while the code is written, a few ahead of the current position
+        return itertools.chain(
+            ["<div class='figure' style='" + pos + dims + "'>\n"],
+            self._stream_lines(data, self._max_buffered_images),
+            ["</div>\n"])
 
-    def write_to_file(self, data: str, filename: str):
+    def write_to_file(self, data: str | Iterable[str], filename: str):
         with open(filename, "w") as f:
             if not self._inline:
                 f.writelines([
@@ -177,7 +223,7 @@ class HtmlBackend(Backend):
                     "<body>"
                 ])
 
-            f.write(data)
+            write_chunks(f, data)
 
             if not self._inline:
                 f.write("</body>")
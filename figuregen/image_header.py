@@ -0,0 +1,101 @@
+import os
+import struct
+
+def _png_size(f):
+    header = f.read(24)
+    if len(header) < 24 or header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+def _jpeg_size(f):
+    if f.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff": # fill bytes
+            marker = f.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code == 0xd8 or code == 0x01 or 0xd0 <= code <= 0xd7: # markers without payload
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        length = struct.unpack(">H", length)[0]
+        # Start of frame markers, except DHT (c4), JPG (c8), and DAC (cc)
+        if 0xc0 <= code <= 0xcf and code not in (0xc4, 0xc8, 0xcc):
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+def _read_cstring(f, max_len=256):
+    chars = bytearray()
+    while len(chars) < max_len:
+        c = f.read(1)
+        if not c:
+            return None
+        if c == b"\x00":
+            return chars.decode("latin-1")
+        chars += c
+    return None
+
+def _exr_size(f):
+    header = f.read(8)
+    if len(header) < 8 or header[:4] != b"\x76\x2f\x31\x01":
+        return None
+    while True:
+        name = _read_cstring(f)
+        if not name: # an empty name terminates the header
+            return None
+        attr_type = _read_cstring(f)
+        size = f.read(4)
+        if attr_type is None or len(size) < 4:
+            return None
+        size = struct.unpack("<i", size)[0]
+        if name == "dataWindow" and attr_type == "box2i" and size == 16:
+            x_min, y_min, x_max, y_max = struct.unpack("<iiii", f.read(16))
+            return x_max - x_min + 1, y_max - y_min + 1
+        f.seek(size, os.SEEK_CUR)
+
+def _pfm_size(f):
+    header = f.read(128).split()
+    if len(header) < 3 or header[0] not in (b"PF", b"Pf"):
+        return None
+    try:
+        return int(header[1]), int(header[2])
+    except ValueError:
+        return None
+
+_readers = {
+    ".png": _png_size,
+    ".jpg": _jpeg_size,
+    ".jpeg": _jpeg_size,
+    ".exr": _exr_size,
+    ".pfm": _pfm_size,
+}
+
+def read_size(filename: str) -> tuple[int, int] | None:
+    """ Reads the resolution of an image from its file header, without decoding the pixels.
+
+    Supports .png, .jpg / .jpeg, .exr, and .pfm files.
+
+    Returns:
+        (width, height) in pixels, or None if the format is not supported or the header is invalid.
+    """
+    reader = _readers.get(os.path.splitext(filename)[1].lower())
+    if reader is None:
+        return None
+    with open(filename, "rb") as f:
+        try:
+            return reader(f)
+        except struct.error:
+            return None
@@ -0,0 +1,232 @@
+import asyncio
+import os
+import subprocess
+import tempfile
+import threading
+import weakref
+from .cache import content_hash
+
+class LatexCompiler:
+    """ Compiles LaTeX documents with pdflatex, reusing precompiled format files for their preambles.
+
+    The first time a preamble is seen, it is dumped into a format file via the mylatexformat package.
+    All subsequent documents with the same preamble load that format instead of processing the preamble
+    (and all the packages it loads) again, which is where pdflatex spends most of its time for small documents.
+    If a document contains a line with only `\\endofdump`, everything up to that line forms the precompiled
+    preamble, and everything after it is processed on every run. This way, per-document definitions
+    do not prevent the reuse of the format.
+
+    If the format cannot be built (e.g., because mylatexformat is not installed), documents with that preamble
+    are compiled the normal way. If a document fails to compile with a format, it is compiled again the normal
+    way. If that succeeds, the format was at fault (e.g., written by an older pdflatex) and is built again for the
+    next document. Should that format fail too, the preamble is no longer precompiled.
+
+    One compiler can be shared by any number of threads, it runs at most `max_jobs` pdflatex processes at once.
+    Use default_compiler() to get the instance shared by all backends and plots.
+    """
+
+    END_OF_DUMP = "\\endofdump"
+
+    def __init__(self, format_dir: str | None = None, max_jobs: int | None = None, use_formats: bool = True):
+        """
+        Args:
+            format_dir: where to store the format files, defaults to a folder in the system's temp directory,
+                so formats are shared between sessions
+            max_jobs: maximum number of concurrent pdflatex processes, defaults to the number of cores
+            use_formats: set to False to always compile documents the normal way
+        """
+        if format_dir is None:
+            format_dir = os.path.join(tempfile.gettempdir(), "figuregen-latex-formats")
+        self.format_dir = os.path.abspath(format_dir)
+        os.makedirs(self.format_dir, exist_ok=True)
+        self.use_formats = use_formats
+
+        self.max_jobs = max_jobs or os.cpu_count() or 1
+        self._jobs = threading.BoundedSemaphore(self.max_jobs)
+        self._async_jobs = weakref.WeakKeyDictionary()
+        self._mutex = threading.Lock()
+        self._format_locks = {}
+        self._failed_formats = set()
+        self._rebuilt_formats = set()
+
+    def _split(self, tex_code: str) -> tuple[str, str] | None:
+        """ Splits the code into the preamble to dump, and the rest. Returns None if there is no preamble. """
+        lines = tex_code.splitlines(keepends=True)
+        for i, line in enumerate(lines):
+            if line.strip() == self.END_OF_DUMP:
+                return "".join(lines[:i]), "".join(lines[i+1:])
+        idx = tex_code.find("\\begin{document}")
+        if idx < 0:
+            return None
+        return tex_code[:idx], tex_code[idx:]
+
+    def _strip_marker(self, tex_code: str) -> str:
+        lines = tex_code.splitlines(keepends=True)
+        return "".join(l for l in lines if l.strip() != self.END_OF_DUMP)
+
+    def _format_lock(self, name: str) -> threading.Lock:
+        with self._mutex:
+            if name not in self._format_locks:
+                self._format_locks[name] = threading.Lock()
+            return self._format_locks[name]
+
+    def _ensure_format(self, preamble: str) -> str | None:
+        """ Builds the format file for the given preamble, if it does not exist yet.
+
+        Returns:
+            The name of the format, or None if it could not be built.
+        """
+        name = "fmt-" + content_hash(preamble)
+        if os.path.exists(os.path.join(self.format_dir, name + ".fmt")):
+            return name
+
+        with self._format_lock(name):
+            if name in self._failed_formats:
+                return None
+            if os.path.exists(os.path.join(self.format_dir, name + ".fmt")):
+                return name
+
+            # Use a unique job name so concurrent processes never see a partially written format
+            jobname = f"{name}-{os.getpid()}-{threading.get_ident()}"
+            with open(os.path.join(self.format_dir, jobname + ".tex"), "w") as f:
+                f.write(preamble)
+                f.write(self.END_OF_DUMP + "\n\\begin{document}\n\\end{document}\n")
+
+            with self._jobs:
+                result = subprocess.call([
+                        "pdflatex",
+                        "-ini",
+                        "-interaction=batchmode",
+                        f"-jobname={jobname}",
+                        "&pdflatex",
+                        "mylatexformat.ltx",
+                        f"{jobname}.tex"
+                    ], cwd=self.format_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+            fmt_file = os.path.join(self.format_dir, jobname + ".fmt")
+            if result != 0 or not os.path.exists(fmt_file):
+                self._failed_formats.add(name)
+                return None
+            os.replace(fmt_file, os.path.join(self.format_dir, name + ".fmt"))
+            for ext in [".tex", ".log"]:
+                if os.path.exists(os.path.join(self.format_dir, jobname + ext)):
+                    os.remove(os.path.join(self.format_dir, jobname + ext))
+            return name
+
+    def _discard_format(self, name: str):
+        """ Deletes a format that documents failed to load, so it is built again, but only once """
+        with self._format_lock(name):
+            if name in self._rebuilt_formats:
+                self._failed_formats.add(name)
+            self._rebuilt_formats.add(name)
+            try:
+                os.remove(os.path.join(self.format_dir, name + ".fmt"))
+            except FileNotFoundError:
+                pass
+
+    def _prepare(self, tex_code: str, working_dir: str, jobname: str, interaction: str, use_format: bool = True):
+        """ Writes the .tex file and returns the pdflatex command line, environment, and the name of the format """
+        fmt = None
+        if self.use_formats and use_format:
+            parts = self._split(tex_code)
+            if parts is not None:
+                fmt = self._ensure_format(parts[0])
+
+        env = None
+        tex_filename = os.path.join(working_dir, jobname + ".tex")
+        with open(tex_filename, "w") as f:
+            if fmt is not None:
+                f.write(f"%&{fmt}\n")
+                f.write(tex_code)
+            else:
+                f.write(self._strip_marker(tex_code))
+
+        args = [ "pdflatex", f"-interaction={interaction}" ]
+        if fmt is not None:
+            # A trailing separator makes kpathsea append the default search path
+            env = dict(os.environ)
+            env["TEXFORMATS"] = self.format_dir + os.pathsep + env.get("TEXFORMATS", "")
+            args.append(f"-fmt={fmt}")
+        args.append(jobname + ".tex")
+        return args, env, fmt
+
+    def compile(self, tex_code: str, working_dir: str, jobname: str, interaction: str = "batchmode") -> str:
+        """ Writes the code to a .tex file and compiles it with pdflatex.
+
+        Args:
+            tex_code: the full LaTeX document
+            working_dir: where to write the .tex file and run pdflatex, relative paths in the code are
+                resolved from here
+            jobname: name of the .tex / .pdf / .log files, without extension
+            interaction: the pdflatex interaction mode
+
+        Returns:
+            The filename of the generated .pdf
+
+        Raises:
+            subprocess.CalledProcessError: if pdflatex fails, the .log file in the working_dir contains the details
+        """
+        args, env, fmt = self._prepare(tex_code, working_dir, jobname, interaction)
+        try:
+            with self._jobs:
+                subprocess.check_call(args, cwd=working_dir, stdout=subprocess.DEVNULL, env=env)
+        except subprocess.CalledProcessError:
+            if fmt is None:
+                raise
+            args, env, _ = self._prepare(tex_code, working_dir, jobname, interaction, use_format=False)
+            with self._jobs:
+                subprocess.check_call(args, cwd=working_dir, stdout=subprocess.DEVNULL, env=env)
+            self._discard_format(fmt)
+        return os.path.join(working_dir, jobname + ".pdf")
+
+    async def compile_async(self, tex_code: str, working_dir: str, jobname: str,
+                            interaction: str = "batchmode") -> str:
+        """ Like compile(), but runs pdflatex as an asyncio subprocess.
+
+        At most `max_jobs` of these run at once per event loop. Building a missing format file happens
+        in a separate thread.
+        """
+        args, env, fmt = await asyncio.to_thread(self._prepare, tex_code, working_dir, jobname, interaction)
+
+        loop = asyncio.get_running_loop()
+        with self._mutex:
+            if loop not in self._async_jobs:
+                self._async_jobs[loop] = asyncio.Semaphore(self.max_jobs)
+            jobs = self._async_jobs[loop]
+
+        async def run(args, env):
+            async with jobs:
+                proc = await asyncio.create_subprocess_exec(*args, cwd=working_dir,
+                    stdout=asyncio.subprocess.DEVNULL, env=env)
+                return await proc.wait()
+
+        returncode = await run(args, env)
+        if returncode != 0 and fmt is not None:
+            args, env, _ = await asyncio.to_thread(self._prepare, tex_code, working_dir, jobname, interaction,
+                False)
+            returncode = await run(args, env)
+            if returncode == 0:
+                await asyncio.to_thread(self._discard_format, fmt)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, args)
+        return os.path.join(working_dir, jobname + ".pdf")
+
+    def clear_formats(self):
+        """ Deletes all format files, e.g., after updating the LaTeX distribution """
+        with self._mutex:
+            for name in os.listdir(self.format_dir):
+                if name.startswith("fmt-"):
+                    os.remove(os.path.join(self.format_dir, name))
+            self._failed_formats.clear()
+            self._rebuilt_formats.clear()
+
+_default_compiler = None
+_default_compiler_mutex = threading.Lock()
+
+def default_compiler() -> LatexCompiler:
+    """ The compiler shared by all backends and plots that are not given a specific one """
+    global _default_compiler
+    with _default_compiler_mutex:
+        if _default_compiler is None:
+            _default_compiler = LatexCompiler()
+        return _default_compiler
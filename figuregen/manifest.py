@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+from typing import Tuple
+
+class BuildManifest:
+    """ Records which file was exported for each element of a figure, and from which content.
+
+    Stored as a .json file next to the output. When the figure is generated again, elements whose
+    content, size, and settings are unchanged reuse the file from the previous run instead of being exported.
+    """
+
+    VERSION = 1
+
+    def __init__(self, filename: str):
+        """
+        Args:
+            filename: the .json file to read the previous build from and to write the new one to
+        """
+        self.filename = filename
+        self._dir = os.path.dirname(os.path.abspath(filename))
+        self._mutex = threading.Lock()
+        self._previous = {}
+        self._entries = {}
+        self.num_reused = 0
+        self.num_exported = 0
+
+        try:
+            with open(filename, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == self.VERSION:
+                self._previous = manifest["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    @staticmethod
+    def for_output(filename: str) -> "BuildManifest":
+        """ The manifest that belongs to the given output file """
+        path, name = os.path.split(filename)
+        return BuildManifest(os.path.join(path, "." + name + ".manifest.json"))
+
+    def _rel(self, filename: str) -> str:
+        return os.path.relpath(os.path.abspath(filename), self._dir)
+
+    def lookup(self, base_filename: str, key: str) -> str | None:
+        """ Returns the file exported to the given location by the previous build, if its key matches and
+        the file still exists. """
+        found = self.lookup_page(base_filename, key)
+        return None if found is None else found[0]
+
+    def lookup_page(self, base_filename: str, key: str) -> Tuple[str, int | None] | None:
+        """ Like lookup(), but also returns the page of the file that was recorded, see record() """
+        entry = self._previous.get(self._rel(base_filename))
+        if entry is None or entry["key"] != key:
+            return None
+        filename = os.path.join(self._dir, entry["file"])
+        if not os.path.exists(filename):
+            return None
+        page = entry.get("page")
+        self.record(base_filename, key, filename, reused=True, page=page)
+        return filename, page
+
+    def record(self, base_filename: str, key: str, filename: str, reused: bool = False, page: int | None = None):
+        """ Adds an exported file to the manifest of the current build
+
+        Args:
+            page: if the element is one page of a multi-page file (e.g., a batch of PgfLinePlots), its number
+        """
+        entry = { "key": key, "file": self._rel(filename) }
+        if page is not None:
+            entry["page"] = page
+        with self._mutex:
+            self._entries[self._rel(base_filename)] = entry
+            if reused:
+                self.num_reused += 1
+            else:
+                self.num_exported += 1
+
+    def relocate(self, base_filename: str, filename: str):
+        """ Updates the file recorded for the given location, after it was moved to the given filename """
+        with self._mutex:
+            entry = self._entries.get(self._rel(base_filename))
+            if entry is not None:
+                entry["file"] = self._rel(filename)
+
+    def save(self):
+        """ Writes the entries of the current build, entries of the previous build that were not used are dropped """
+        tmp = self.filename + ".tmp"
+        with self._mutex:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({ "version": self.VERSION, "entries": self._entries }, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.filename)
@@ -1,8 +1,10 @@
+import asyncio
 import tempfile
 import os
 import shutil
 import subprocess
 from .tikz import TikzBackend
+from .latex_compiler import LatexCompiler, default_compiler
 from .backend import Backend, Component, Bounds
 from typing import List
 
@@ -17,9 +19,20 @@ class PdfBackend(Backend):
     """
 
     def __init__(self, intermediate_dir = None, preamble_lines=[ "\\usepackage[utf8]{inputenc}",
-            "\\usepackage[T1]{fontenc}", "\\usepackage{libertine}" ]):
+            "\\usepackage[T1]{fontenc}", "\\usepackage{libertine}" ], compiler: LatexCompiler | None = None,
+            batch_pgf_plots=True, **kwargs):
+        """
+        Args:
+            intermediate_dir: directory for the generated .tikz, .tex, and image files, a temporary one if None
+            preamble_lines: additional lines for the LaTeX preamble, e.g., to load fonts
+            compiler: the LatexCompiler to run pdflatex, None to use the shared default_compiler()
+            batch_pgf_plots: if true, all PgfLinePlots are compiled with a single pdflatex run, see TikzBackend
+            kwargs: options shared by all backends, see Backend.__init__
+        """
+        Backend.__init__(self, **kwargs)
+        self._compiler = compiler
         self._custom_preamble = "\n".join(preamble_lines)
-        self._tikz_gen = TikzBackend(False)
+        self._tikz_gen = TikzBackend(False, batch_pgf_plots, **self._forwarded_options())
 
         if intermediate_dir is not None:
             self._temp_folder = None
@@ -40,6 +53,10 @@ class PdfBackend(Backend):
             "\\documentclass[varwidth=500cm, border=0pt]{standalone}",
         ])
 
+    def _set_build_state(self, manifest, shared_exports):
+        Backend._set_build_state(self, manifest, shared_exports)
+        self._tikz_gen._set_build_state(manifest, shared_exports)
+
     def assemble_grid(self, components: List[Component], output_dir: str):
         return self._tikz_gen.assemble_grid(components, self._intermediate_dir)
 
@@ -49,14 +66,15 @@ class PdfBackend(Backend):
     def combine_rows(self, data, bounds: Bounds):
         return self._tikz_gen.combine_rows(data, bounds)
 
-    def write_to_file(self, data, filename):
+    def _write_tex(self, data, filename) -> str:
+        """ Writes the .tikz file and returns the code of the LaTeX document that includes it """
         _, ext = os.path.splitext(filename)
         assert ext.lower() == ".pdf", "Filename should have .pdf extension!"
 
         tikz_filename = os.path.join(self._intermediate_dir, "figure.tikz")
         self._tikz_gen.write_to_file(data, tikz_filename)
 
-        tex_code = "\n".join([
+        return "\n".join([
             self.preamble,
             self._custom_preamble,
             self._tikz_gen.preamble,
@@ -66,27 +84,36 @@ class PdfBackend(Backend):
             "\\end{document}",
         ])
 
-        tex_filename = os.path.join(self._intermediate_dir, "figure.tex")
-        pdf_filename = os.path.join(self._intermediate_dir, "figure.pdf")
-        with open(tex_filename, "w") as f:
-            f.write(tex_code)
+    @property
+    def _compiler_or_default(self) -> LatexCompiler:
+        return self._compiler if self._compiler is not None else default_compiler()
+
+    def _report_errors(self):
+        from texsnip import extract_errors, red
+
+        logfile = os.path.join(self._intermediate_dir, "figure.log")
+        if not os.path.exists(logfile):
+            print("Error: pdflatex failed, but no log was written.")
+        else:
+            print("Error: pdflatex failed with the following errors:")
+            print("\n".join([errline for errline in extract_errors(logfile)]))
+        print(red(f"Error: pdflatex failed. You can view the full log in {logfile}. "
+            "This path can be changed by specifying an intermediate_dir"))
+
+    def write_to_file(self, data, filename):
+        tex_code = self._write_tex(data, filename)
+        try:
+            with self._measure("compile", "pdflatex"):
+                self._compiler_or_default.compile(tex_code, self._intermediate_dir, "figure")
+        except subprocess.CalledProcessError:
+            self._report_errors()
+        shutil.copy(os.path.join(self._intermediate_dir, "figure.pdf"), filename)
 
+    async def write_to_file_async(self, data, filename):
+        tex_code = await asyncio.to_thread(self._write_tex, data, filename)
         try:
-            subprocess.check_call([
-                    "pdflatex",
-                    "-interaction=batchmode",
-                    "figure.tex"
-                ], cwd=self._intermediate_dir, stdout=subprocess.DEVNULL)
+            with self._measure("compile", "pdflatex"):
+                await self._compiler_or_default.compile_async(tex_code, self._intermediate_dir, "figure")
         except subprocess.CalledProcessError:
-            from texsnip import extract_errors, red
-
-            logfile = os.path.join(self._intermediate_dir, "figure.log")
-            if not os.path.exists(logfile):
-                print("Error: pdflatex failed, but no log was written.")
-            else:
-                print("Error: pdflatex failed with the following errors:")
-                print("\n".join([errline for errline in extract_errors(logfile)]))
-            print(red(f"Error: pdflatex failed. You can view the full log in {logfile}. "
-                "This path can be changed by specifying an intermediate_dir"))
-
-        shutil.copy(pdf_filename, filename)
\ No newline at end of file
+            self._report_errors()
+        shutil.copy(os.path.join(self._intermediate_dir, "figure.pdf"), filename)
@@ -0,0 +1,377 @@
+import io
+import math
+import tempfile
+import zlib
+from .backend import *
+from .fonts import find_font
+
+MM_TO_PT = 72 / 25.4
+
+@dataclass
+class _RasterXObject:
+    """ An encoded image, ready to be written as an image XObject """
+    width: int
+    height: int
+    filter: str
+    data: bytes
+
+@dataclass
+class _PdfXObject:
+    """ The first page of a .pdf file, written as a form XObject """
+    data: bytes
+
+def _add_object(writer, obj):
+    """ Adds a new object to the .pdf and returns a reference to it.
+
+    pypdf has no public method for this, so this calls PdfWriter._add_object, which has kept its signature since
+    pypdf 3. The supported versions are pinned by the "pdf" extra in setup.py.
+    """
+    return writer._add_object(obj)
+
+class _Font:
+    """ A TrueType font that is embedded as a subset. Text is encoded as glyph ids (Identity-H encoding), so all
+    characters of the font can be used.
+    """
+
+    def __init__(self, filename: str):
+        from fontTools.ttLib import TTFont
+        self.filename = filename
+        self._ttf = TTFont(filename, lazy=True)
+        self._upem = self._ttf["head"].unitsPerEm
+        self._cmap = self._ttf.getBestCmap()
+        self._hmtx = self._ttf["hmtx"]
+        self.ascent = self._ttf["hhea"].ascent / self._upem
+        self.descent = -self._ttf["hhea"].descent / self._upem
+        # Glyph id -> character of all glyphs in the text so far
+        self.used = {}
+
+    def glyph_ids(self, text: str) -> List[int]:
+        """ Glyph id of each character, 0 (.notdef) for characters that are not in the font. Marks them as used. """
+        ids = []
+        for char in text:
+            glyph = self._cmap.get(ord(char))
+            gid = 0 if glyph is None else self._ttf.getGlyphID(glyph)
+            self.used.setdefault(gid, char)
+            ids.append(gid)
+        return ids
+
+    def encode(self, text: str) -> bytes:
+        return b"".join(gid.to_bytes(2, "big") for gid in self.glyph_ids(text))
+
+    def glyph_width(self, gid: int) -> float:
+        """ Advance width of a glyph, relative to the font size """
+        return self._hmtx[self._ttf.getGlyphName(gid)][0] / self._upem
+
+    def text_width(self, text: str) -> float:
+        """ Width of the text, relative to the font size. Marks all its characters as used. """
+        return sum(self.glyph_width(gid) for gid in self.glyph_ids(text))
+
+    def subset(self) -> bytes:
+        """ The font file with only the used glyphs, which keep their ids """
+        from fontTools import subset
+        options = subset.Options()
+        options.notdef_outline = True
+        options.retain_gids = True
+        options.name_IDs = ["*"]
+        options.drop_tables += ["GSUB", "GPOS", "kern", "FFTM"]
+        font = subset.load_font(self.filename, options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(gids=sorted(self.used))
+        subsetter.subset(font)
+        out = io.BytesIO()
+        font.save(out)
+        return out.getvalue()
+
+    def to_unicode(self) -> bytes:
+        """ CMap from glyph ids to characters, so text can be extracted from the .pdf """
+        chars = [ f"<{gid:04X}> <{char.encode('utf-16-be').hex().upper()}>"
+            for gid, char in sorted(self.used.items()) if gid != 0 ]
+        blocks = []
+        for i in range(0, len(chars), 100):
+            block = chars[i:i + 100]
+            blocks.append(f"{len(block)} beginbfchar\n" + "\n".join(block) + "\nendbfchar")
+        return "\n".join([
+            "/CIDInit /ProcSet findresource begin",
+            "12 dict begin",
+            "begincmap",
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+            "/CMapName /Adobe-Identity-UCS def",
+            "/CMapType 2 def",
+            "1 begincodespacerange",
+            "<0000> <FFFF>",
+            "endcodespacerange",
+            *blocks,
+            "endcmap",
+            "CMapName currentdict /CMap defineresource pop",
+            "end",
+            "end",
+        ]).encode("ascii")
+
+    def postscript_name(self) -> str:
+        name = self._ttf["name"].getDebugName(6) or "Font"
+        return "".join(c for c in name if c.isalnum() or c == "-")
+
+class NativePdfBackend(Backend):
+    """
+    Writes the figure as .pdf directly, without pdflatex.
+
+    Raster images are embedded as image XObjects (JPEG files as-is), elements that can be exported as .pdf
+    (e.g., PDF) are embedded as vector graphics via form XObjects. Frames, markers, and lines are drawn as
+    vector paths, text is set in a single font that is embedded as a subset. LaTeX markup in the text is not
+    interpreted, use PdfBackend for that.
+
+    Additional dependencies: pypdf and fontTools, installed with the "pdf" extra (pip install figuregen[pdf])
+    """
+
+    def __init__(self, font: str = "DejaVu Sans", line_space: float = 1.2, **kwargs):
+        """
+        Args:
+            font: family name or path of the TrueType font used for all text
+            line_space: line spacing of multi-line text, as a multiple of the font size
+            kwargs: options shared by all backends, see Backend.__init__
+        """
+        Backend.__init__(self, **kwargs)
+        self._font_file = find_font(font)
+        self.line_space = line_space
+
+    def _load_image(self, c: ImageComponent, elem_id: str) -> _RasterXObject | _PdfXObject:
+        """ Exports an image as .pdf if supported, or as a raster image otherwise, and reads the result.
+        Repeated occurrences of an element share the result, and are written as a single XObject.
+        """
+        key = ("xobject", *self._dedup_key(c.data, "raster", c.bounds.width, c.bounds.height))
+        return self._shared(c.data, key, lambda: self._read_image(c, elem_id))
+
+    def _read_image(self, c: ImageComponent, elem_id: str) -> _RasterXObject | _PdfXObject:
+        from PIL import Image
+        with tempfile.TemporaryDirectory() as tmpdir:
+            base_filename = os.path.join(tmpdir, "image")
+            try:
+                filename = self._export_file(c.data, "pdf", c.bounds.width, c.bounds.height, base_filename, elem_id,
+                    share=False)
+                with open(filename, "rb") as f:
+                    return _PdfXObject(f.read())
+            except NotImplementedError:
+                filename = self._export_file(c.data, "raster", c.bounds.width, c.bounds.height, base_filename,
+                    elem_id, share=False)
+
+            with Image.open(filename) as img:
+                if img.format == "JPEG" and img.mode == "RGB":
+                    with open(filename, "rb") as f:
+                        return _RasterXObject(img.width, img.height, "/DCTDecode", f.read())
+                rgb = img.convert("RGB")
+                return _RasterXObject(rgb.width, rgb.height, "/FlateDecode", zlib.compress(rgb.tobytes(), 6))
+
+    def assemble_grid(self, components: List[Component], output_dir: str):
+        # Encoding the images is the expensive part, so it runs in the executor
+        return [
+            (c, self._executor.submit(self._load_image, c, component_id(c)) if isinstance(c, ImageComponent) else None)
+            for c in components
+        ]
+
+    def combine_grids(self, data, idx: int, bounds: Bounds):
+        return [ item for grid in data for item in grid ]
+
+    def _color(self, rgb, op: str) -> str:
+        return f"{rgb[0] / 255:.4f} {rgb[1] / 255:.4f} {rgb[2] / 255:.4f} {op}"
+
+    def _rect(self, bounds: Bounds, page_height: float) -> Tuple[float, float, float, float]:
+        """ Lower left corner, width, and height of the bounds in pt, in PDF coordinates """
+        return (bounds.left * MM_TO_PT, page_height - (bounds.top + bounds.height) * MM_TO_PT,
+            bounds.width * MM_TO_PT, bounds.height * MM_TO_PT)
+
+    def _stroke_rect(self, x, y, w, h, linewidth, color, dashed=False, clip=None) -> str:
+        ops = ["q"]
+        if clip is not None:
+            ops.append(f"{clip[0]:.3f} {clip[1]:.3f} {clip[2]:.3f} {clip[3]:.3f} re W n")
+        ops.append(self._color(color, "RG"))
+        ops.append(f"{linewidth:.3f} w")
+        if dashed:
+            ops.append("[3 3] 0 d")
+        ops.append(f"{x:.3f} {y:.3f} {w:.3f} {h:.3f} re S")
+        ops.append("Q")
+        return "\n".join(ops)
+
+    def _make_text(self, c: TextComponent, font: _Font, page_height: float) -> str:
+        ops = []
+        x, y, w, h = self._rect(c.bounds, page_height)
+        if c.background_color is not None:
+            ops.append(f"q {self._color(c.background_color, 'rg')} {x:.3f} {y:.3f} {w:.3f} {h:.3f} re f Q")
+
+        lines = [ l.strip() for l in c.content.split("\\\\") ]
+        if "".join(lines).strip() == "":
+            return "\n".join(ops)
+
+        # Lay out the text in a local frame with the origin in the center of the bounds, y pointing up
+        rotated = round(c.rotation / 90) % 2 == 1
+        width, height = (h, w) if rotated else (w, h)
+        pad_x, pad_y = c.padding.width_mm * MM_TO_PT, c.padding.height_mm * MM_TO_PT
+        size = c.fontsize
+        line_height = max(self.line_space, font.ascent + font.descent) * size
+        block = line_height * len(lines)
+        top = {
+            "top": height / 2 - pad_y,
+            "center": block / 2,
+            "bottom": -height / 2 + pad_y + block,
+        }[c.vertical_alignment]
+
+        angle = math.radians(c.rotation)
+        cos, sin = math.cos(angle), math.sin(angle)
+        cx, cy = x + w / 2, y + h / 2
+        ops.append(f"BT /F1 {size:.3f} Tf {self._color(c.color, 'rg')}")
+        for i, line in enumerate(lines):
+            line_width = font.text_width(line) * size
+            lx = {
+                "left": -width / 2 + pad_x,
+                "center": -line_width / 2,
+                "right": width / 2 - pad_x - line_width,
+            }[c.horizontal_alignment]
+            ly = top - i * line_height - (line_height - (font.ascent + font.descent) * size) / 2 - font.ascent * size
+            tx, ty = cx + lx * cos - ly * sin, cy + lx * sin + ly * cos
+            ops.append(f"{cos:.5f} {sin:.5f} {-sin:.5f} {cos:.5f} {tx:.3f} {ty:.3f} Tm")
+            ops.append(f"<{font.encode(line).hex()}> Tj")
+        ops.append("ET")
+        return "\n".join(ops)
+
+    def _add_xobject(self, writer, xobj: _RasterXObject | _PdfXObject):
+        from pypdf import PdfReader
+        from pypdf.generic import (ArrayObject, DecodedStreamObject, FloatObject, NameObject, NumberObject,
+            StreamObject)
+
+        if isinstance(xobj, _RasterXObject):
+            # The data is already encoded with the given filter
+            stream = StreamObject()
+            stream.set_data(xobj.data)
+            stream.update({
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Image"),
+                NameObject("/Width"): NumberObject(xobj.width),
+                NameObject("/Height"): NumberObject(xobj.height),
+                NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+                NameObject("/BitsPerComponent"): NumberObject(8),
+                NameObject("/Filter"): NameObject(xobj.filter),
+            })
+            return _add_object(writer, stream), (0, 0, 1, 1)
+
+        page = PdfReader(io.BytesIO(xobj.data)).pages[0]
+        contents = page.get_contents()
+        box = [ float(v) for v in page.mediabox ]
+        stream = DecodedStreamObject()
+        stream.set_data(contents.get_data() if contents is not None else b"")
+        stream.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Form"),
+            NameObject("/BBox"): ArrayObject([ FloatObject(v) for v in box ]),
+        })
+        if "/Resources" in page:
+            stream[NameObject("/Resources")] = page["/Resources"].get_object().clone(writer)
+        stream = stream.flate_encode()
+        return _add_object(writer, stream), (box[0], box[1], box[2] - box[0], box[3] - box[1])
+
+    def _add_font(self, writer, font: _Font):
+        from pypdf.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject,
+            TextStringObject)
+        data = font.subset()
+        font_file = DecodedStreamObject()
+        font_file.set_data(data)
+        font_file[NameObject("/Length1")] = NumberObject(len(data))
+        font_file = font_file.flate_encode()
+
+        to_unicode = DecodedStreamObject()
+        to_unicode.set_data(font.to_unicode())
+        to_unicode = to_unicode.flate_encode()
+
+        name = NameObject("/FGSUBS+" + font.postscript_name())
+        descriptor = DictionaryObject({
+            NameObject("/Type"): NameObject("/FontDescriptor"),
+            NameObject("/FontName"): name,
+            NameObject("/Flags"): NumberObject(4),
+            NameObject("/FontBBox"): ArrayObject([ NumberObject(v) for v in [-1000, round(-font.descent * 1000),
+                2000, round(font.ascent * 1000)] ]),
+            NameObject("/ItalicAngle"): NumberObject(0),
+            NameObject("/Ascent"): NumberObject(round(font.ascent * 1000)),
+            NameObject("/Descent"): NumberObject(round(-font.descent * 1000)),
+            NameObject("/CapHeight"): NumberObject(round(font.ascent * 1000)),
+            NameObject("/StemV"): NumberObject(80),
+            NameObject("/FontFile2"): _add_object(writer, font_file),
+        })
+        widths = ArrayObject()
+        for gid in sorted(font.used):
+            widths.append(NumberObject(gid))
+            widths.append(ArrayObject([ NumberObject(round(font.glyph_width(gid) * 1000)) ]))
+        cid_font = DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/CIDFontType2"),
+            NameObject("/BaseFont"): name,
+            NameObject("/CIDSystemInfo"): DictionaryObject({
+                NameObject("/Registry"): TextStringObject("Adobe"),
+                NameObject("/Ordering"): TextStringObject("Identity"),
+                NameObject("/Supplement"): NumberObject(0),
+            }),
+            NameObject("/FontDescriptor"): _add_object(writer, descriptor),
+            NameObject("/W"): widths,
+            NameObject("/CIDToGIDMap"): NameObject("/Identity"),
+        })
+        return _add_object(writer, DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type0"),
+            NameObject("/BaseFont"): name,
+            NameObject("/Encoding"): NameObject("/Identity-H"),
+            NameObject("/DescendantFonts"): ArrayObject([ _add_object(writer, cid_font) ]),
+            NameObject("/ToUnicode"): _add_object(writer, to_unicode),
+        }))
+
+    def combine_rows(self, data, bounds: Bounds):
+        from pypdf import PdfWriter
+        from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+        page_width, page_height = bounds.width * MM_TO_PT, bounds.height * MM_TO_PT
+        writer = PdfWriter()
+        page = writer.add_blank_page(page_width, page_height)
+        font = _Font(self._font_file)
+
+        ops = []
+        xobjects = DictionaryObject()
+        names = {}
+        for c, future in (item for row in data for item in row):
+            if isinstance(c, ImageComponent):
+                x, y, w, h = self._rect(c.bounds, page_height)
+                xobj = future.result()
+                if id(xobj) not in names:
+                    ref, box = self._add_xobject(writer, xobj)
+                    names[id(xobj)] = (f"/Im{len(xobjects)}", box)
+                    xobjects[NameObject(names[id(xobj)][0])] = ref
+                name, (bx, by, bw, bh) = names[id(xobj)]
+                sx, sy = w / bw, h / bh
+                ops.append(f"q {x:.3f} {y:.3f} {w:.3f} {h:.3f} re W n "
+                    f"{sx:.6f} 0 0 {sy:.6f} {x - bx * sx:.3f} {y - by * sy:.3f} cm {name} Do Q")
+                if c.has_frame:
+                    # The frame is drawn inside the image
+                    lw = c.frame_linewidth
+                    ops.append(self._stroke_rect(x + lw / 2, y + lw / 2, w - lw, h - lw, lw, c.frame_color))
+            elif isinstance(c, TextComponent):
+                ops.append(self._make_text(c, font, page_height))
+            elif isinstance(c, RectangleComponent):
+                # Markers are clipped to their own bounds, like in the other backends
+                rect = self._rect(c.bounds, page_height)
+                ops.append(self._stroke_rect(*rect, c.linewidth, c.color, c.dashed, clip=rect))
+            elif isinstance(c, LineComponent):
+                x, y, w, h = self._rect(c.bounds, page_height)
+                ops.append(f"q {x:.3f} {y:.3f} {w:.3f} {h:.3f} re W n {self._color(c.color, 'RG')} "
+                    f"{c.linewidth:.3f} w {c.from_x * MM_TO_PT:.3f} {page_height - c.from_y * MM_TO_PT:.3f} m "
+                    f"{c.to_x * MM_TO_PT:.3f} {page_height - c.to_y * MM_TO_PT:.3f} l S Q")
+
+        resources = DictionaryObject({ NameObject("/XObject"): xobjects })
+        if font.used:
+            resources[NameObject("/Font")] = DictionaryObject({ NameObject("/F1"): self._add_font(writer, font) })
+        page[NameObject("/Resources")] = resources
+
+        content = DecodedStreamObject()
+        content.set_data("\n".join(ops).encode("latin-1"))
+        page.replace_contents(content.flate_encode())
+        return writer
+
+    def write_to_file(self, data, filename: str):
+        _, ext = os.path.splitext(filename)
+        assert ext.lower() == ".pdf", "Filename should have .pdf extension!"
+        with open(filename, "wb") as f:
+            data.write(f)
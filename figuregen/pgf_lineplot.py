@@ -5,6 +5,8 @@ import tempfile
 import subprocess
 import shutil
 import decimal
+from .latex_compiler import LatexCompiler, default_compiler
+from typing import List, Tuple
 
 class PgfLinePlot(Plot):
     def __init__(self, aspect_ratio, data, dpi=300, axis_lines="left", tex_dir=None) -> None:
@@ -165,12 +167,8 @@ class PgfLinePlot(Plot):
             temp_folder = tempfile.TemporaryDirectory()
             temp_dir = temp_folder.name
 
-        with open(os.path.join(temp_dir, f"{os.path.basename(name)}.tex"), "w") as fp:
-            fp.write(tex)
-
         try:
-            subprocess.check_call(["pdflatex", "-interaction=nonstopmode", f"{os.path.basename(name)}.tex"],
-                cwd=temp_dir, stdout=subprocess.DEVNULL)
+            default_compiler().compile(tex, temp_dir, os.path.basename(name), interaction="nonstopmode")
         except subprocess.CalledProcessError:
             from texsnip import extract_errors, red
 
@@ -225,11 +223,8 @@ class PgfLinePlot(Plot):
         self._clip_ticks("x")
         self._clip_ticks("y")
 
-    def _make_tex(self, width, height):
-        self._clean()
-
-        tex_code = ""
-
+    def _make_preamble(self):
+        """ The part of the preamble that only depends on the font, shared by all plots with the same font. """
         preamble_lines = [
             "\\documentclass{article}",
             "\\pagenumbering{gobble}",
@@ -241,6 +236,18 @@ class PgfLinePlot(Plot):
             "\\usepackage{tikz}",
             "\\usepackage{pgfplots}",
             "\\pgfplotsset{compat=newest}",
+            "\\usepackage" + self._font_tex_package,
+        ]
+        return "\n".join(preamble_lines)
+
+    def _make_definitions(self, width, height, set_page_size=True):
+        """ Defines the size, colors, and styles of this plot.
+
+        Args:
+            set_page_size: if False, does not set the page size via the geometry package. Then, the definitions can
+                be used within the document body, e.g., inside a group for each page of a multi-page document.
+        """
+        preamble_lines = [
             "\\pgfplotsset{",
             "    legend image code/.code={",
             f"        \\draw[mark repeat=2,mark phase=2,line width={self._legend['line_width']}pt]",
@@ -248,21 +255,25 @@ class PgfLinePlot(Plot):
             "    }",
             "}",
 
-            "\\usepackage" + self._font_tex_package,
-
             "\\newcommand{\\width}{" + f"{width}mm" + "}",
             "\\newcommand{\\height}{" + f"{height}mm" + "}",
             "\\newcommand{\\padbot}{" + f"{self._pad_bot_mm}mm" + "}",
             "\\newcommand{\\padleft}{" + f"{self._pad_left_mm}mm" + "}",
             "\\newcommand{\\padright}{" + f"{self._pad_right_mm}mm" + "}",
 
-            "\\geometry{",
-            "    papersize={\\width,\\height},",
-            "    total={\\width,\\height},",
-            "    left=0mm,",
-            "    top=0mm,",
-            "}",
+        ]
 
+        if set_page_size:
+            preamble_lines.extend([
+                "\\geometry{",
+                "    papersize={\\width,\\height},",
+                "    total={\\width,\\height},",
+                "    left=0mm,",
+                "    top=0mm,",
+                "}",
+            ])
+
+        preamble_lines.extend([
             "\\makeatletter \\newcommand{\\pgfplotsdrawaxis}{\\pgfplots@draw@axis} \\makeatother",
             "\\pgfplotsset{axis line on top/.style={",
             "axis line style=transparent,",
@@ -279,7 +290,7 @@ class PgfLinePlot(Plot):
             "}",
             "\\definecolor{legendframecolor}{RGB}{" +
                 f"{self._legend['color'][0]},{self._legend['color'][1]},{self._legend['color'][2]}" + "}",
-        ]
+        ])
 
         if self._colors is not None:
             i = 0
@@ -305,11 +316,13 @@ class PgfLinePlot(Plot):
                 i += 1
         preamble_lines.append("\\definecolor{gridcolor}{RGB}{220,220,220}")
 
-        tex_code += "\n".join(preamble_lines) + "\n"
+        return "\n".join(preamble_lines)
+
+    def _make_picture(self):
+        """ The tikzpicture with the plot, uses the macros from _make_definitions() """
+        tex_code = ""
 
         body_start_lines = [
-            "\\begin{document}",
-            "\\raggedleft",
             "\\begin{tikzpicture}[trim axis left]",
             "\\clip (-\\padleft,-\\padbot) rectangle (\\width-\\padleft, \\height-\\padbot);",
             "\\begin{axis}[",
@@ -465,12 +478,23 @@ class PgfLinePlot(Plot):
         body_end_lines = [
             "\\end{axis}",
             "\\end{tikzpicture}",
-            "\\end{document}",
         ]
         tex_code += "\n".join(body_end_lines) + "\n"
 
         return tex_code
 
+    def _make_tex(self, width, height):
+        self._clean()
+        return "\n".join([
+            self._make_preamble(),
+            # Everything above is the same for all plots with the same font and can be precompiled
+            LatexCompiler.END_OF_DUMP,
+            self._make_definitions(width, height),
+            "\\begin{document}",
+            "\\raggedleft",
+            self._make_picture() + "\\end{document}",
+        ]) + "\n"
+
     def make_pdf(self, width, height, filename):
         tex = self._make_tex(width, height)
         self._compile_tex(tex, filename)
@@ -480,4 +504,43 @@ class PgfLinePlot(Plot):
         fn = self.make_pdf(width, height, filename)
         from pdf2image.pdf2image import convert_from_path
         convert_from_path(fn, dpi=self._dpi, transparent=True, fmt="png", output_file=filename, single_file=True)
-        return filename + ".png"
\ No newline at end of file
+        return filename + ".png"
+
+def make_pdf_batch(plots: List[Tuple[PgfLinePlot, float, float]], filename: str) -> str:
+    """ Compiles multiple plots with a single pdflatex run into one .pdf, with one page per plot.
+
+    Args:
+        plots: list of (plot, width, height) tuples, width and height in [mm]. All plots must use the same font.
+        filename: Name of the output without the .pdf extension
+
+    Returns:
+        The filename of the generated .pdf
+    """
+    preamble = plots[0][0]._make_preamble()
+    pages = []
+    for plot, width, height in plots:
+        assert plot._make_preamble() == preamble, "All plots in a batch must use the same font"
+        plot._clean()
+
+        # Each plot is shipped out as its own page, with the same size and placement as in a separate document
+        pages.append("\n".join([
+            "{%",
+            plot._make_definitions(width, height, set_page_size=False),
+            "\\pdfpagewidth=\\width \\pdfpageheight=\\height",
+            "\\shipout\\vbox to \\height{\\hbox to \\width{\\hfill%",
+            plot._make_picture().rstrip() + "%",
+            "}\\vss}%",
+            "}%",
+        ]))
+
+    tex = "\n".join([
+        preamble,
+        LatexCompiler.END_OF_DUMP,
+        "\\begin{document}",
+        "\\hoffset=-1in \\voffset=-1in",
+        *pages,
+        "\\end{document}",
+    ]) + "\n"
+
+    plots[0][0]._compile_tex(tex, filename)
+    return filename + ".pdf"
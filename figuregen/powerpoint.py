@@ -4,7 +4,7 @@ from pptx.dml.color import RGBColor
 from pptx.enum.shapes import MSO_SHAPE, MSO_CONNECTOR
 from pptx.enum.text import PP_ALIGN
 import importlib.resources as pkg_resources
-from concurrent.futures import ThreadPoolExecutor, Future
+from concurrent.futures import Future
 from threading import Lock
 from .backend import *
 
@@ -17,8 +17,12 @@ class PptxBackend(Backend):
     - do not support 'dashed' frames - if a frame is 'dashed' the frame in pptx will be normal (but still has a frame)
     - only support text rotation by 0° and +-90°
     '''
-    def __init__(self):
-        self._thread_pool = ThreadPoolExecutor()
+    def __init__(self, **kwargs):
+        """
+        Args:
+            kwargs: options shared by all backends, see Backend.__init__
+        """
+        Backend.__init__(self, **kwargs)
         self._slide_mutex = Lock()
 
     def assemble_grid(self, components: List[Component], output_dir: str):
@@ -30,15 +34,16 @@ class PptxBackend(Backend):
             flat.extend(row)
         return flat
 
-    def _add_image(self, c: Component, slide):
-        # Write image to temp folder
-        with tempfile.TemporaryDirectory() as tmpdir:
-            fname = c.data.make_raster(c.bounds.width, c.bounds.height, os.path.join(tmpdir, "image"))
-            self._slide_mutex.acquire()
-            shape = slide.shapes.add_picture(fname, Mm(c.bounds.left), Mm(c.bounds.top),
-                width=Mm(c.bounds.width))
-            shape.shadow.inherit = False
-            self._slide_mutex.release()
+    def _add_image(self, c: Component, slide, tmpdir: str):
+        # Write image to temp folder, which is shared by all images so that repeated images can reuse the same file.
+        # python-pptx stores identical files as a single image part.
+        fname = self._export_file(c.data, "raster", c.bounds.width, c.bounds.height,
+            os.path.join(tmpdir, "image-" + component_id(c)), component_id(c))
+        self._slide_mutex.acquire()
+        shape = slide.shapes.add_picture(fname, Mm(c.bounds.left), Mm(c.bounds.top),
+            width=Mm(c.bounds.width))
+        shape.shadow.inherit = False
+        self._slide_mutex.release()
 
         if c.has_frame:
             self._slide_mutex.acquire()
@@ -76,12 +81,13 @@ class PptxBackend(Backend):
             flat.extend(row)
 
         # Generate all images in parallel
-        futures = []
-        for c in flat:
-            if isinstance(c, ImageComponent):
-                futures.append(self._thread_pool.submit(self._add_image, c, slide))
-        for f in futures:
-            f.result()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            futures = []
+            for c in flat:
+                if isinstance(c, ImageComponent):
+                    futures.append(self._executor.submit(self._add_image, c, slide, tmpdir))
+            for f in futures:
+                f.result()
 
         # Add everything else afterwards, to ensure proper z-order
         for c in flat:
@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+@dataclass
+class TimingEvent:
+    """ One measured stage of generating a figure """
+
+    # Name of the stage, e.g., "layout", "gen_grid", "export", "write_to_file", or "compile"
+    stage: str
+
+    # What was processed, e.g., the element id "fig0-grid1-row2-col3", or "" for the whole figure
+    name: str
+
+    # Start time in seconds, relative to the creation of the profiler
+    start: float = 0.0
+
+    # Elapsed wall-clock time and CPU time of the measuring thread, in seconds
+    wall: float = 0.0
+    cpu: float = 0.0
+
+    thread: int = 0
+    bytes_written: int = 0
+
+    # For exports: True if the file was reused from the cache or a previous build, False if it was exported
+    cache_hit: bool | None = None
+
+@dataclass
+class StageSummary:
+    count: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    bytes_written: int = 0
+
+@dataclass
+class ProfileReport:
+    """ All events recorded by a Profiler, with some aggregate statistics.
+
+    Stages can be nested (e.g., "write_to_file" contains "compile", and waits for pending exports),
+    so the times of different stages do not add up to the total.
+    """
+    events: List[TimingEvent] = field(default_factory=list)
+
+    def by_stage(self) -> Dict[str, StageSummary]:
+        """ Total times and bytes per stage """
+        stages = {}
+        for e in self.events:
+            s = stages.setdefault(e.stage, StageSummary())
+            s.count += 1
+            s.wall += e.wall
+            s.cpu += e.cpu
+            s.bytes_written += e.bytes_written
+        return stages
+
+    def slowest(self, stage: str = "export", n: int = 10) -> List[TimingEvent]:
+        """ The n events of a stage with the longest wall-clock time """
+        return sorted((e for e in self.events if e.stage == stage), key=lambda e: -e.wall)[:n]
+
+    @property
+    def cache_hits(self) -> int:
+        return sum(1 for e in self.events if e.cache_hit is True)
+
+    @property
+    def cache_misses(self) -> int:
+        return sum(1 for e in self.events if e.cache_hit is False)
+
+    @property
+    def bytes_written(self) -> int:
+        return sum(e.bytes_written for e in self.events)
+
+    def __str__(self) -> str:
+        lines = [ f"{'stage':<16} {'count':>6} {'wall [ms]':>10} {'cpu [ms]':>10} {'written [KiB]':>14}" ]
+        for name, s in self.by_stage().items():
+            lines.append(f"{name:<16} {s.count:>6} {s.wall * 1000:>10.1f} {s.cpu * 1000:>10.1f} "
+                f"{s.bytes_written / 1024:>14.1f}")
+        lines.append(f"cache hits: {self.cache_hits}, misses: {self.cache_misses}")
+        return "\n".join(lines)
+
+class Profiler:
+    """ Records the time spent in each stage of generating figures, and per element.
+
+    Pass an instance to a backend (`profiler=...`) to enable it. A profiler can be shared by multiple
+    backends and figures, all events end up in the same report.
+    """
+
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self._mutex = threading.Lock()
+        self._events: List[TimingEvent] = []
+
+    @contextmanager
+    def measure(self, stage: str, name: str = ""):
+        """ Measures the enclosed code as one event. The event is yielded, so the code can set the number of
+        bytes written and whether the cache was hit. Nothing is recorded if the code raises an exception.
+        """
+        event = TimingEvent(stage, name, thread=threading.get_ident())
+        start_cpu = time.thread_time()
+        start = time.perf_counter()
+        yield event
+        event.wall = time.perf_counter() - start
+        event.cpu = time.thread_time() - start_cpu
+        event.start = start - self._t0
+        with self._mutex:
+            self._events.append(event)
+
+    def report(self) -> ProfileReport:
+        """ A snapshot of all events recorded so far, ordered by their start time """
+        with self._mutex:
+            return ProfileReport(sorted(self._events, key=lambda e: e.start))
+
+    def clear(self):
+        with self._mutex:
+            self._events.clear()
+
+    def write_chrome_trace(self, filename: str):
+        """ Writes all events in the Trace Event Format, which can be viewed in chrome://tracing or Perfetto """
+        pid = os.getpid()
+        trace = []
+        for e in self.report().events:
+            args = { "cpu_ms": e.cpu * 1000, "bytes_written": e.bytes_written }
+            if e.cache_hit is not None:
+                args["cache_hit"] = e.cache_hit
+            trace.append({
+                "name": e.name or e.stage,
+                "cat": e.stage,
+                "ph": "X",
+                "ts": e.start * 1e6,
+                "dur": e.wall * 1e6,
+                "pid": pid,
+                "tid": e.thread,
+                "args": args,
+            })
+        with open(filename, "w") as f:
+            json.dump({ "traceEvents": trace, "displayTimeUnit": "ms" }, f)
@@ -0,0 +1,234 @@
+import math
+import tempfile
+import threading
+import numpy as np
+import simpleimageio
+from .backend import *
+from .fonts import find_font
+from .util.image import resize
+
+def _force_autohint():
+    """ The FreeType load flag for autohinting. Matplotlib 3.10 replaced the integer constant by an enum. """
+    from matplotlib import ft2font
+    if hasattr(ft2font, "LoadFlags"):
+        return ft2font.LoadFlags.FORCE_AUTOHINT
+    return ft2font.LOAD_FORCE_AUTOHINT
+
+class RasterBackend(Backend):
+    """
+    Draws the figure directly into an image at a given resolution and writes it as .png, .jpg, or .exr.
+
+    Does not require any external tools: images are resampled with numpy / PIL, text is rendered with the
+    FreeType rasterizer that is bundled with matplotlib. The result is meant for previews and thumbnails,
+    the layout matches the other backends, but the typesetting is simpler: text is set in a single font without
+    LaTeX or Typst markup, and can only be rotated by multiples of 90°.
+    """
+
+    def __init__(self, dpi: float = 300, font: str = "DejaVu Sans", background: Sequence[float] = (255, 255, 255),
+                 line_space: float = 1.2, quality: int = 90, **kwargs):
+        """
+        Args:
+            dpi: resolution of the output image, in pixels per inch
+            font: family name or path of the font used for all text
+            background: sRGB color (from 0 to 255) of the area that is not covered by any element
+            line_space: line spacing of multi-line text, as a multiple of the font size
+            quality: JPEG quality, between 0 and 100
+            kwargs: options shared by all backends, see Backend.__init__
+        """
+        Backend.__init__(self, **kwargs)
+        self.dpi = dpi
+        self.background = background
+        self.line_space = line_space
+        self.quality = quality
+        self._font_file = find_font(font)
+        self._font_cache = threading.local()
+
+    @property
+    def _px_per_mm(self) -> float:
+        return self.dpi / 25.4
+
+    @property
+    def _px_per_pt(self) -> float:
+        return self.dpi / 72
+
+    def _rect(self, bounds: Bounds) -> Tuple[int, int, int, int]:
+        """ Pixel coordinates (top, left, bottom, right) of the given bounds """
+        s = self._px_per_mm
+        return (round(bounds.top * s), round(bounds.left * s),
+            round((bounds.top + bounds.height) * s), round((bounds.left + bounds.width) * s))
+
+    def _make_pixels(self, c: ImageComponent) -> np.ndarray:
+        """ The sRGB pixels of an image, resampled to the size it covers in the output """
+        top, left, bottom, right = self._rect(c.bounds)
+        width, height = max(1, right - left), max(1, bottom - top)
+        return self._shared(c.data, ("pixels", width, height), lambda: self._resample(c, width, height))
+
+    def _resample(self, c: ImageComponent, width: int, height: int) -> np.ndarray:
+        with self._measure("export", component_id(c)):
+            if isinstance(c.data, RasterImage):
+                img = c.data.raw_float
+            else:
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    filename = self._export_file(c.data, "raster", c.bounds.width, c.bounds.height,
+                        os.path.join(tmpdir, "image"), share=False)
+                    img = simpleimageio.lin_to_srgb(simpleimageio.read(filename))
+
+            if img.ndim == 2:
+                img = img[..., None]
+            if img.shape[2] == 1:
+                img = np.repeat(img, 3, axis=2)
+            img = img[..., :3]
+
+            if img.shape[0] != height or img.shape[1] != width:
+                # Pixels are magnified without interpolation, like the other backends do
+                downsample = img.shape[0] > height or img.shape[1] > width
+                lin = simpleimageio.srgb_to_lin(img)
+                lin = resize(lin, width, height, self.resample_filter if downsample else "nearest")
+                img = simpleimageio.lin_to_srgb(np.maximum(lin, 0))
+            return np.clip(img, 0, 1).astype(np.float32)
+
+    def assemble_grid(self, components: List[Component], output_dir: str):
+        # Resampling the images is the expensive part, so it runs in the executor
+        return [
+            (c, self._executor.submit(self._make_pixels, c) if isinstance(c, ImageComponent) else None)
+            for c in components
+        ]
+
+    def combine_grids(self, data, idx: int, bounds: Bounds):
+        return [ item for grid in data for item in grid ]
+
+    def _blend(self, canvas: np.ndarray, top: int, left: int, coverage: np.ndarray, color: Sequence[float]):
+        """ Blends a solid color into the canvas, weighted by the coverage (between 0 and 1) of each pixel """
+        h, w = coverage.shape
+        t, l = max(top, 0), max(left, 0)
+        b, r = min(top + h, canvas.shape[0]), min(left + w, canvas.shape[1])
+        if t >= b or l >= r:
+            return
+        alpha = coverage[t - top:b - top, l - left:r - left, None]
+        rgb = np.asarray(color[:3], dtype=np.float32) / 255
+        region = canvas[t:b, l:r]
+        region += alpha * (rgb - region)
+
+    def _draw_segment(self, canvas: np.ndarray, x0: float, y0: float, x1: float, y1: float, linewidth_pt: float,
+                      color: Sequence[float], dashed: bool = False):
+        """ Draws an anti-aliased line between two points given in pixels """
+        half = max(linewidth_pt * self._px_per_pt, 1) / 2
+        left, top = math.floor(min(x0, x1) - half - 1), math.floor(min(y0, y1) - half - 1)
+        right, bottom = math.ceil(max(x0, x1) + half + 1), math.ceil(max(y0, y1) + half + 1)
+        ys, xs = np.mgrid[top:bottom, left:right].astype(np.float32) + 0.5
+
+        dx, dy = x1 - x0, y1 - y0
+        length = math.hypot(dx, dy)
+        if length == 0:
+            t = np.zeros_like(xs)
+        else:
+            t = np.clip(((xs - x0) * dx + (ys - y0) * dy) / length**2, 0, 1)
+        dist = np.hypot(xs - (x0 + t * dx), ys - (y0 + t * dy))
+        coverage = np.clip(half + 0.5 - dist, 0, 1)
+
+        if dashed:
+            # 3pt on, 3pt off, like the default dash pattern of TikZ
+            dash = 3 * self._px_per_pt
+            coverage *= (t * length) % (2 * dash) < dash
+        self._blend(canvas, top, left, coverage, color)
+
+    def _draw_rectangle(self, canvas: np.ndarray, bounds: Bounds, linewidth_pt: float, color: Sequence[float],
+                        dashed: bool = False, inset: bool = False):
+        """ Draws the outline of a rectangle. If inset is true, the line is inside the bounds, otherwise centered. """
+        s = self._px_per_mm
+        d = linewidth_pt * self._px_per_pt / 2 if inset else 0
+        left, top = bounds.left * s + d, bounds.top * s + d
+        right, bottom = (bounds.left + bounds.width) * s - d, (bounds.top + bounds.height) * s - d
+        corners = [(left, top), (right, top), (right, bottom), (left, bottom), (left, top)]
+        for (x0, y0), (x1, y1) in zip(corners[:-1], corners[1:]):
+            self._draw_segment(canvas, x0, y0, x1, y1, linewidth_pt, color, dashed)
+
+    def _font(self, fontsize: float):
+        """ A FreeType font at the given size. FT2Font objects are not thread-safe, so each thread has its own. """
+        from matplotlib.ft2font import FT2Font
+        font = getattr(self._font_cache, "font", None)
+        if font is None:
+            font = self._font_cache.font = FT2Font(self._font_file)
+        font.set_size(fontsize, self.dpi)
+        return font
+
+    def _render_text(self, text: str, fontsize: float, alignment: str) -> np.ndarray:
+        """ Renders (multi-line) text into a coverage mask, aligning the lines horizontally """
+        font = self._font(fontsize)
+        size_px = fontsize * self._px_per_pt
+        ascent = font.ascender / font.units_per_EM * size_px
+        descent = -font.descender / font.units_per_EM * size_px
+        line_height = max(self.line_space * size_px, ascent + descent)
+
+        lines = []
+        for line in text.split("\n"):
+            font.set_text(line, 0.0, flags=_force_autohint())
+            font.draw_glyphs_to_bitmap(antialiased=True)
+            lines.append((np.asarray(font.get_image(), dtype=np.float32) / 255, font.get_descent() / 64))
+
+        width = max(bitmap.shape[1] for bitmap, _ in lines)
+        mask = np.zeros((max(1, math.ceil(line_height * len(lines))), max(1, width)), dtype=np.float32)
+        for i, (bitmap, bitmap_descent) in enumerate(lines):
+            baseline = i * line_height + (line_height - ascent - descent) / 2 + ascent
+            top = round(baseline + bitmap_descent) - bitmap.shape[0]
+            left = { "left": 0, "center": (width - bitmap.shape[1]) // 2, "right": width - bitmap.shape[1] }[alignment]
+            t, b = max(top, 0), min(top + bitmap.shape[0], mask.shape[0])
+            if t < b:
+                mask[t:b, left:left + bitmap.shape[1]] = np.maximum(mask[t:b, left:left + bitmap.shape[1]],
+                    bitmap[t - top:b - top])
+        return mask
+
+    def _draw_text(self, canvas: np.ndarray, c: TextComponent):
+        top, left, bottom, right = self._rect(c.bounds)
+        if c.background_color is not None:
+            self._blend(canvas, top, left, np.ones((bottom - top, right - left), dtype=np.float32), c.background_color)
+
+        content = c.content.replace("\\\\", "\n")
+        if content.strip() == "":
+            return
+
+        mask = self._render_text(content, c.fontsize, c.horizontal_alignment)
+        mask = np.rot90(mask, round(c.rotation / 90) % 4)
+
+        pad_x = round(c.padding.width_mm * self._px_per_mm)
+        pad_y = round(c.padding.height_mm * self._px_per_mm)
+        h, w = mask.shape
+        x = {
+            "left": left + pad_x,
+            "center": (left + right - w) // 2,
+            "right": right - pad_x - w,
+        }[c.horizontal_alignment]
+        y = {
+            "top": top + pad_y,
+            "center": (top + bottom - h) // 2,
+            "bottom": bottom - pad_y - h,
+        }[c.vertical_alignment]
+        self._blend(canvas, y, x, mask, c.color)
+
+    def combine_rows(self, data, bounds: Bounds) -> np.ndarray:
+        height = max(1, round(bounds.height * self._px_per_mm))
+        width = max(1, round(bounds.width * self._px_per_mm))
+        canvas = np.empty((height, width, 3), dtype=np.float32)
+        canvas[...] = np.asarray(self.background[:3], dtype=np.float32) / 255
+
+        for c, pixels in (item for row in data for item in row):
+            if isinstance(c, ImageComponent):
+                top, left, bottom, right = self._rect(c.bounds)
+                img = pixels.result()
+                canvas[top:bottom, left:right] = img[:max(0, min(bottom, height) - top), :max(0, min(right, width) - left)]
+                if c.has_frame:
+                    self._draw_rectangle(canvas, c.bounds, c.frame_linewidth, c.frame_color, inset=True)
+            elif isinstance(c, TextComponent):
+                self._draw_text(canvas, c)
+            elif isinstance(c, RectangleComponent):
+                self._draw_rectangle(canvas, c.bounds, c.linewidth, c.color, c.dashed)
+            elif isinstance(c, LineComponent):
+                s = self._px_per_mm
+                self._draw_segment(canvas, c.from_x * s, c.from_y * s, c.to_x * s, c.to_y * s, c.linewidth, c.color)
+        return canvas
+
+    def write_to_file(self, data: np.ndarray, filename: str):
+        ext = os.path.splitext(filename)[1].lower()
+        assert ext in [".png", ".jpg", ".jpeg", ".exr"], "Filename should have a .png, .jpg, or .exr extension!"
+        # simpleimageio expects linear RGB and converts to sRGB for .png and .jpg
+        simpleimageio.write(filename, simpleimageio.srgb_to_lin(data), self.quality)
@@ -1,4 +1,10 @@
+import asyncio
+import base64
+import functools
+import itertools
 import subprocess
+import tempfile
+from xml.sax.saxutils import escape
 from .backend import *
 from .typst import TypstBackend
 
@@ -12,8 +18,16 @@ class SvgBackend(Backend):
     cannot be the same for two figures that are created at the same time, as they might overwrite each other's files.
     """
 
-    def __init__(self, intermediate_dir = None, preamble_lines: List[str] = [ "#set text(font: \"Linux Biolinum\")" ]):
-        self._typst_gen = TypstBackend()
+    def __init__(self, intermediate_dir = None, preamble_lines: List[str] = [ "#set text(font: \"Linux Biolinum\")" ],
+                 **kwargs):
+        """
+        Args:
+            intermediate_dir: directory for the generated .typ and image files, a temporary one if None
+            preamble_lines: additional lines to put at the start of the Typst file, e.g., to set the font
+            kwargs: options shared by all backends, see Backend.__init__
+        """
+        Backend.__init__(self, **kwargs)
+        self._typst_gen = TypstBackend(**self._forwarded_options())
 
         self._preamble = "\n".join(preamble_lines) + "\n" + "#set page(width: auto, height: auto, margin: 0pt, fill: none)"
 
@@ -30,6 +44,10 @@ class SvgBackend(Backend):
             self._temp_folder.cleanup()
             self._temp_folder = None
 
+    def _set_build_state(self, manifest, shared_exports):
+        Backend._set_build_state(self, manifest, shared_exports)
+        self._typst_gen._set_build_state(manifest, shared_exports)
+
     def assemble_grid(self, components: List[Component], output_dir: str):
         return self._typst_gen.assemble_grid(components, self._intermediate_dir)
 
@@ -39,28 +57,186 @@ class SvgBackend(Backend):
     def combine_rows(self, data, bounds: Bounds):
         return self._typst_gen.combine_rows(data, bounds)
 
-    def write_to_file(self, data, filename):
+    def _write_typ(self, data, filename):
         _, ext = os.path.splitext(filename)
         assert ext.lower() == ".svg", "Filename should have .svg extension!"
 
         typ_filename = os.path.join(self._intermediate_dir, "figure.typ")
-        self._typst_gen.write_to_file(data, typ_filename)
+        self._typst_gen.write_to_file(data, typ_filename, self._preamble + "\n")
 
-        with open(typ_filename, "r") as f:
-            typ_code = f.read()
-        with open(typ_filename, "w") as f:
-            typ_code = f.write(self._preamble + "\n" + typ_code)
+    _typst_args = [ "typst", "c", "figure.typ", "-f", "svg" ]
 
-        svg_filename = os.path.join(self._intermediate_dir, "figure.svg")
+    def _report_errors(self):
+        print(f"Error: Typst compilation failed. Try specifying an `intermediate_dir` to manually compile and check.")
 
+    def write_to_file(self, data, filename):
+        self._write_typ(data, filename)
         try:
-            subprocess.check_call([
-                    "typst",
-                    "c",
-                    "figure.typ",
-                    "-f", "svg"
-                ], cwd=self._intermediate_dir, stdout=subprocess.DEVNULL)
+            with self._measure("compile", "typst"):
+                subprocess.check_call(self._typst_args, cwd=self._intermediate_dir, stdout=subprocess.DEVNULL)
         except subprocess.CalledProcessError:
-            print(f"Error: Typst compilation failed. Try specifying an `intermediate_dir` to manually compile and check.")
+            self._report_errors()
+        shutil.copy(os.path.join(self._intermediate_dir, "figure.svg"), filename)
+
+    async def write_to_file_async(self, data, filename):
+        await asyncio.to_thread(self._write_typ, data, filename)
+        with self._measure("compile", "typst"):
+            proc = await asyncio.create_subprocess_exec(*self._typst_args, cwd=self._intermediate_dir,
+                stdout=asyncio.subprocess.DEVNULL)
+            returncode = await proc.wait()
+        if returncode != 0:
+            self._report_errors()
+        shutil.copy(os.path.join(self._intermediate_dir, "figure.svg"), filename)
+
+class NativeSvgBackend(Backend):
+    """
+    Writes the figure as .svg directly, without external tools. .svg files are written by SvgBackend by default,
+    use this backend by passing backend=NativeSvgBackend() to figuregen.figure().
+
+    Images are embedded as base64, or written next to the .svg file and referenced. Text is emitted as <text>
+    elements, so it is rendered with the fonts of the viewer. Use SvgBackend for text that is typeset by Typst.
+    """
+
+    def __init__(self, embed_images: bool = True, font_family: str = "Linux Biolinum, Libertinus Sans, sans-serif",
+                 line_space: float = 1.2, max_buffered_images: int = 16, **kwargs):
+        """
+        Args:
+            embed_images: if true, images are embedded as base64. Otherwise, they are written to the directory of
+                the .svg file and referenced by their relative path.
+            font_family: value of the CSS font-family of all text
+            line_space: line spacing of multi-line text, as a multiple of the font size
+            max_buffered_images: how many images are encoded ahead of the one currently written to the file
+            kwargs: options shared by all backends, see Backend.__init__
+        """
+        Backend.__init__(self, **kwargs)
+        self._embed_images = embed_images
+        self._font_family = font_family
+        self._line_space = line_space
+        self._max_buffered_images = max_buffered_images
+
+    def _svg_color(self, rgb) -> str:
+        if rgb is None:
+            return "none"
+        return f"rgb({rgb[0]},{rgb[1]},{rgb[2]})"
+
+    def _clip(self, bounds: Bounds, content: str) -> str:
+        """ Clips the content (in figure coordinates) to the bounds """
+        return (f"<svg x='{bounds.left:.3f}' y='{bounds.top:.3f}' width='{bounds.width:.3f}' "
+            f"height='{bounds.height:.3f}' viewBox='{bounds.left:.3f} {bounds.top:.3f} {bounds.width:.3f} "
+            f"{bounds.height:.3f}' overflow='hidden'>{content}</svg>")
+
+    def _href(self, c: ImageComponent, output_dir: str, elem_id: str) -> str:
+        if not self._embed_images:
+            filename = self._export_file(c.data, "raster", c.bounds.width, c.bounds.height,
+                os.path.join(output_dir, "img-" + elem_id), elem_id)
+            return os.path.relpath(filename, output_dir).replace(os.sep, "/")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = self._export_file(c.data, "raster", c.bounds.width, c.bounds.height,
+                os.path.join(tmpdir, "image"), elem_id, share=False)
+            with open(filename, "rb") as f:
+                payload = base64.b64encode(f.read()).decode("ascii")
+        ext = os.path.splitext(filename)[1].lower()
+        mimetype = { ".jpg": "image/jpeg", ".jpeg": "image/jpeg" }.get(ext, "image/png")
+        return f"data:{mimetype};base64,{payload}"
+
+    def _make_image(self, c: ImageComponent, output_dir: str, elem_id: str) -> str:
+        b = c.bounds
+        # Repeated occurrences of an image with the same size reference the first one
+        first_id, first = self._shared(c.data, ("svg-image", f"{b.width:.4f}", f"{b.height:.4f}"),
+            lambda: (elem_id, b))
+        if first_id != elem_id:
+            code = (f"<use id='img-{elem_id}' href='#img-{first_id}' x='{b.left - first.left:.3f}' "
+                f"y='{b.top - first.top:.3f}'/>")
+        else:
+            code = (f"<image id='img-{elem_id}' x='{b.left:.3f}' y='{b.top:.3f}' width='{b.width:.3f}' "
+                f"height='{b.height:.3f}' preserveAspectRatio='none' href='{self._href(c, output_dir, elem_id)}'/>")
+        if c.has_frame:
+            # The frame is drawn inside the image
+            lw = calc.pt_to_mm(c.frame_linewidth)
+            code += (f"<rect x='{b.left + lw / 2:.3f}' y='{b.top + lw / 2:.3f}' width='{max(b.width - lw, 0):.3f}' "
+                f"height='{max(b.height - lw, 0):.3f}' fill='none' stroke='{self._svg_color(c.frame_color)}' "
+                f"stroke-width='{lw:.3f}'/>")
+        return code
+
+    def _make_text(self, c: TextComponent, elem_id: str) -> str:
+        b = c.bounds
+        code = ""
+        if c.background_color is not None:
+            code += (f"<rect x='{b.left:.3f}' y='{b.top:.3f}' width='{b.width:.3f}' height='{b.height:.3f}' "
+                f"fill='{self._svg_color(c.background_color)}'/>")
 
-        shutil.copy(svg_filename, filename)
\ No newline at end of file
+        lines = c.content.split("\\\\")
+        if "".join(lines).strip() == "":
+            return code
+
+        # Lay out the text in a local frame, centered on the bounds and rotated with them
+        rotated = round(c.rotation / 90) % 2 == 1
+        width, height = (b.height, b.width) if rotated else (b.width, b.height)
+        pad_x, pad_y = c.padding.width_mm, c.padding.height_mm
+        x, anchor = {
+            "left": (-width / 2 + pad_x, "start"),
+            "center": (0, "middle"),
+            "right": (width / 2 - pad_x, "end"),
+        }[c.horizontal_alignment]
+
+        size = calc.pt_to_mm(c.fontsize)
+        line_height = self._line_space * size
+        block = line_height * len(lines)
+        top = {
+            "top": -height / 2 + pad_y,
+            "center": -block / 2,
+            "bottom": height / 2 - pad_y - block,
+        }[c.vertical_alignment]
+
+        tspans = "".join(
+            f"<tspan x='{x:.3f}' y='{top + (i + 0.5) * line_height:.3f}'>{escape(line.strip())}</tspan>"
+            for i, line in enumerate(lines))
+        transform = f"translate({b.left + b.width / 2:.3f} {b.top + b.height / 2:.3f})"
+        if c.rotation != 0:
+            transform += f" rotate({-c.rotation})"
+        return code + (f"<text id='{c.type}-{elem_id}' transform='{transform}' font-size='{size:.3f}' "
+            f"fill='{self._svg_color(c.color)}' text-anchor='{anchor}' dominant-baseline='central'>{tspans}</text>")
+
+    def assemble_grid(self, components: List[Component], output_dir: str):
+        svg_lines = []
+        for c in components:
+            elem_id = component_id(c)
+            b = c.bounds
+
+            if isinstance(c, ImageComponent):
+                # Exported lazily while the output is streamed, see combine_rows
+                svg_lines.append(functools.partial(self._make_image, c, output_dir, elem_id))
+
+            if isinstance(c, TextComponent):
+                svg_lines.append(self._make_text(c, elem_id))
+
+            if isinstance(c, RectangleComponent):
+                dash = f" stroke-dasharray='{calc.pt_to_mm(3):.3f}'" if c.dashed else ""
+                svg_lines.append(self._clip(b, f"<rect x='{b.left:.3f}' y='{b.top:.3f}' width='{b.width:.3f}' "
+                    f"height='{b.height:.3f}' fill='none' stroke='{self._svg_color(c.color)}' "
+                    f"stroke-width='{calc.pt_to_mm(c.linewidth):.3f}'{dash}/>"))
+
+            if isinstance(c, LineComponent):
+                svg_lines.append(self._clip(b, f"<line x1='{c.from_x:.3f}' y1='{c.from_y:.3f}' x2='{c.to_x:.3f}' "
+                    f"y2='{c.to_y:.3f}' stroke='{self._svg_color(c.color)}' "
+                    f"stroke-width='{calc.pt_to_mm(c.linewidth):.3f}'/>"))
+        return svg_lines
+
+    def combine_grids(self, data, idx: int, bounds: Bounds):
+        return [ line for grid in data for line in grid ]
+
+    def combine_rows(self, data, bounds: Bounds) -> Iterator[str]:
+        # All coordinates are in mm
+        font = escape(self._font_family, { "'": "&apos;" })
+        header = (f"<svg xmlns='http://www.w3.org/2000/svg' xmlns:xlink='http://www.w3.org/1999/xlink' "
+            f"width='{bounds.width:.3f}mm' height='{bounds.height:.3f}mm' "
+            f"viewBox='0 0 {bounds.width:.3f} {bounds.height:.3f}' font-family='{font}'>\n")
+        return itertools.chain([header], self._stream_lines(data, self._max_buffered_images), ["</svg>\n"])
+
+    def write_to_file(self, data: str | Iterable[str], filename: str):
+        _, ext = os.path.splitext(filename)
+        assert ext.lower() == ".svg", "Filename should have .svg extension!"
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+            write_chunks(f, data)
@@ -1,20 +1,32 @@
-from typing import Union
+from typing import Iterator, Union
 from .backend import *
+from .pgf_lineplot import PgfLinePlot, make_pdf_batch
+from .cache import content_hash, export_key
 import importlib.resources as pkg_resources
-from concurrent.futures import ThreadPoolExecutor, Future
+from concurrent.futures import Future
+
+def _plot_batch_name(batch_key: str) -> str:
+    """ The file name (without extension) of a batch of PgfLinePlots that is cached under the given key """
+    return "img-pgfplots-" + batch_key[:16]
 
 class TikzBackend(Backend):
     """ Generates the code for a TikZ picture representing the figure.
     Default file ending is .tikz, use \\input{figure.tikz} to include in LaTeX.
     """
 
-    def __init__(self, include_header=True):
+    def __init__(self, include_header=True, batch_pgf_plots=True, **kwargs):
         """
         Args:
             include_header: boolean, set to false to not include the macro definitions in the generated file.
+            batch_pgf_plots: boolean, if true, all PgfLinePlots of a figure are compiled with a single pdflatex run
+                into one multi-page .pdf. With a render cache or incremental builds, plots that were compiled
+                before keep using their page of the earlier .pdf, and only the others are compiled.
+            kwargs: options shared by all backends, see Backend.__init__
         """
+        Backend.__init__(self, **kwargs)
         self._include_header = include_header
-        self._thread_pool = ThreadPoolExecutor()
+        self._batch_pgf_plots = batch_pgf_plots
+        self._pending_plots = []
 
     def add_overlay(self, tikz_code: str):
         """ Adds overlay code that will be stitched on top of the generated figure. """
@@ -44,21 +56,113 @@ class TikzBackend(Backend):
         prefix = "img-" + elem_id
         file_prefix = os.path.join(output_dir, prefix)
         try:
-            filename = c.data.make_pdf(c.bounds.width, c.bounds.height, file_prefix)
+            filename = self._export_file(c.data, "pdf", c.bounds.width, c.bounds.height, file_prefix, elem_id)
         except NotImplementedError:
-            filename = c.data.make_raster(c.bounds.width, c.bounds.height, file_prefix)
+            filename = self._export_file(c.data, "raster", c.bounds.width, c.bounds.height, file_prefix, elem_id)
+        return self._image_node(c, dims, anchor, filename, prefix)
 
+    def _image_node(self, c: ImageComponent, dims: str, anchor: str, filename: str, prefix: str,
+                    page: int | None = None) -> str:
         # Assemble the position arguments
         fname = "{" + self._sanitize_latex_path(filename) + "}"
         name = "{" + prefix + "}"
+        options = "" if page is None else f"[page={page}]"
 
         # Check if there is a frame and emit the correct command
         if c.has_frame:
             linewidth = "{" + f'{c.frame_linewidth}pt' + "}"
             color = "{" + self._latex_color(c.frame_color) + "}"
-            return "\\makeframedimagenode" + dims + fname + name + anchor + color + linewidth + "\n"
+            return "\\makeframedimagenode" + options + dims + fname + name + anchor + color + linewidth + "\n"
         else:
-            return "\\makeimagenode" + dims + fname + name + anchor + "\n"
+            return "\\makeimagenode" + options + dims + fname + name + anchor + "\n"
+
+    def _make_plot_batch(self, group: list, name: str):
+        """ Compiles a group of PgfLinePlots that use the same font into one .pdf and resolves their futures.
+
+        With a render cache or manifest, each plot is looked up on its own: plots that were compiled before are
+        taken from the page of the earlier batch, only the others are compiled together into a new batch.
+        """
+        output_dir = group[0][3]
+        try:
+            plots = [(c.data, c.bounds.width, c.bounds.height) for c, *_ in group]
+            keys = [None] * len(plots)
+            if self.render_cache is not None or self._manifest is not None:
+                keys = [export_key(*p[:1], "pdf", *p[1:]) for p in plots]
+
+            pages = [None] * len(plots)
+            if None not in keys:
+                batch_files = {}
+                for i, (key, (_, _, _, _, elem_id, _)) in enumerate(zip(keys, group)):
+                    pages[i] = self._cached_plot_page(key, os.path.join(output_dir, "img-" + elem_id), batch_files)
+
+            missing = [ i for i, page in enumerate(pages) if page is None ]
+            if missing:
+                batch = [ plots[i] for i in missing ]
+                batch_key = None if None in keys else content_hash(["pgf-batch", [keys[i] for i in missing]])
+                base_filename = os.path.join(output_dir, name if batch_key is None else _plot_batch_name(batch_key))
+                filename = self._export_cached(batch_key, base_filename,
+                    lambda base_filename: make_pdf_batch(batch, base_filename), name)
+                for page, i in enumerate(missing):
+                    pages[i] = (filename, page + 1)
+                    if batch_key is not None:
+                        self._record_plot_page(keys[i], os.path.join(output_dir, "img-" + group[i][4]),
+                            batch_key, filename, page + 1)
+
+            for (c, dims, anchor, _, elem_id, future), (filename, page) in zip(group, pages):
+                future.set_result(self._image_node(c, dims, anchor, filename, "img-" + elem_id, page))
+        except BaseException as err:
+            for *_, future in group:
+                future.set_exception(err)
+
+    def _cached_plot_page(self, key: str, base_filename: str, batch_files: dict) -> Tuple[str, int] | None:
+        """ The .pdf and page of a PgfLinePlot that an earlier batch compiled, from the manifest or render cache.
+
+        Args:
+            batch_files: maps the keys of batches that were already copied from the cache to their filename
+        """
+        if self._manifest is not None:
+            found = self._manifest.lookup_page(base_filename, key)
+            if found is not None and found[1] is not None:
+                return found
+        if self.render_cache is None:
+            return None
+
+        ref = self.render_cache.fetch_text(content_hash(["pgf-page", key]))
+        if ref is None:
+            return None
+        batch_key, page = ref.split()
+        filename = batch_files.get(batch_key)
+        if filename is None:
+            filename = self.render_cache.fetch(batch_key,
+                os.path.join(os.path.dirname(base_filename), _plot_batch_name(batch_key)))
+            if filename is None:
+                return None
+            batch_files[batch_key] = filename
+        if self._manifest is not None:
+            self._manifest.record(base_filename, key, filename, page=int(page))
+        return filename, int(page)
+
+    def _record_plot_page(self, key: str, base_filename: str, batch_key: str, filename: str, page: int):
+        """ Remembers which page of which batch holds the PgfLinePlot with the given key """
+        if self.render_cache is not None:
+            self.render_cache.store_text(content_hash(["pgf-page", key]), f"{batch_key} {page}")
+        if self._manifest is not None:
+            self._manifest.record(base_filename, key, filename, page=page)
+
+    def _set_build_state(self, manifest, shared_exports):
+        Backend._set_build_state(self, manifest, shared_exports)
+        # Plots of a figure that failed before combine_rows() must not end up in the next one
+        self._pending_plots = []
+
+    def _compile_pending_plots(self):
+        """ Starts one pdflatex run per font for all PgfLinePlots collected by assemble_grid """
+        groups = {}
+        for p in self._pending_plots:
+            groups.setdefault(p[0].data._make_preamble(), []).append(p)
+        self._pending_plots = []
+
+        for i, group in enumerate(groups.values()):
+            self._executor.submit(self._make_plot_batch, group, f"img-pgfplots{i}")
 
     def assemble_grid(self, components: List[Component], output_dir: str) -> List[Union[Future, str]]:
         tikz_lines = []
@@ -75,8 +179,14 @@ class TikzBackend(Backend):
                 anchor = "{(" + f"{c.bounds.left}mm, {-c.bounds.top}mm" + ")}"
 
             if isinstance(c, ImageComponent):
-                tikz_lines.append(self._thread_pool.submit(
-                    self._make_image, c, dims, anchor, output_dir, elem_id))
+                if self._batch_pgf_plots and isinstance(c.data, PgfLinePlot):
+                    # Resolved once the whole figure is assembled, see _compile_pending_plots()
+                    future = Future()
+                    self._pending_plots.append((c, dims, anchor, output_dir, elem_id, future))
+                    tikz_lines.append(future)
+                else:
+                    tikz_lines.append(self._executor.submit(
+                        self._make_image, c, dims, anchor, output_dir, elem_id))
 
             if isinstance(c, TextComponent):
                 prefix = c.type + "-" + elem_id
@@ -137,22 +247,17 @@ class TikzBackend(Backend):
                 result.append(d)
         return result
 
-    def combine_rows(self, data: List[List[Union[Future, str]]], bounds: Bounds) -> str:
-        # Synchronize all export futures and combine the lines
-        tikz_code = ""
-        for fig in data:
-            for c in fig:
-                if isinstance(c, Future):
-                    tikz_code += c.result() + "\n"
-                else:
-                    tikz_code += c + "\n"
-        return tikz_code
+    def combine_rows(self, data: List[List[Union[Future, str]]], bounds: Bounds) -> Iterator[str]:
+        self._compile_pending_plots()
+
+        # The lines are written in order as their export futures complete
+        return self._stream_lines(data)
 
-    def write_to_file(self, data: str, filename: str):
+    def write_to_file(self, data: str | Iterable[str], filename: str):
         with open(filename, "w") as f:
             if self._include_header:
                 f.write(self.header)
                 f.write("\n")
             f.write("\\begin{tikzpicture}\n")
-            f.write(data)
+            write_chunks(f, data)
             f.write("\\end{tikzpicture}")
\ No newline at end of file
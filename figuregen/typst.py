@@ -1,19 +1,21 @@
-from typing import Union
+from typing import Iterator, Union
+import itertools
 from .backend import *
 import importlib.resources as pkg_resources
-from concurrent.futures import ThreadPoolExecutor, Future
+from concurrent.futures import Future
 
 class TypstBackend(Backend):
     """ Generates Typst code for the figure.
     """
 
-    def __init__(self, include_header=True):
+    def __init__(self, include_header=True, **kwargs):
         """
         Args:
             include_header: boolean, set to false to not include the macro definitions in the generated file.
+            kwargs: options shared by all backends, see Backend.__init__
         """
+        Backend.__init__(self, **kwargs)
         self._include_header = include_header
-        self._thread_pool = ThreadPoolExecutor()
 
     @property
     def header(self) -> str:
@@ -30,7 +32,7 @@ class TypstBackend(Backend):
         prefix = "img-" + elem_id
         file_prefix = os.path.join(output_dir, prefix)
         # TODO implement a make_svg() and use make_raster here only as a fallback
-        filename = c.data.make_raster(c.bounds.width, c.bounds.height, file_prefix)
+        filename = self._export_file(c.data, "raster", c.bounds.width, c.bounds.height, file_prefix, elem_id)
         filename = os.path.relpath(filename, output_dir) # Typst only accepts relative paths (and they must be next to or below the .typ file...)
         filename = str.replace(filename, "\\", "\\\\") # escape backslashes
 
@@ -55,7 +57,7 @@ class TypstBackend(Backend):
                 dims = f"(width: {c.bounds.width:.2f}mm, height: {c.bounds.height:.2f}mm),(x: {c.bounds.left:.2f}mm, y: {c.bounds.top:.2f}mm)"
 
             if isinstance(c, ImageComponent):
-                typst_lines.append(self._thread_pool.submit(self._make_image, c, dims, output_dir, elem_id))
+                typst_lines.append(self._executor.submit(self._make_image, c, dims, output_dir, elem_id))
 
             if isinstance(c, TextComponent):
                 align = f"{c.horizontal_alignment}+{c.vertical_alignment}"
@@ -81,20 +83,23 @@ class TypstBackend(Backend):
                 result.append(d)
         return result
 
-    def combine_rows(self, data: List[List[Union[Future, str]]], bounds: Bounds) -> str:
-        # Synchronize all export futures and combine the lines
-        typst_code = f"#block(width:{bounds.width}mm,height:{bounds.height}mm,clip: true,{{"
-        for fig in data:
-            for c in fig:
-                if isinstance(c, Future):
-                    typst_code += c.result() + "\n"
-                else:
-                    typst_code += c + "\n"
-        return typst_code + "})\n"
-
-    def write_to_file(self, data: str, filename: str):
+    def combine_rows(self, data: List[List[Union[Future, str]]], bounds: Bounds) -> Iterator[str]:
+        # The lines are written in order as their export futures complete
+        return itertools.chain(
+            [f"#block(width:{bounds.width}mm,height:{bounds.height}mm,clip: true,{{"],
+            self._stream_lines(data),
+            ["})\n"])
+
+    def write_to_file(self, data: str | Iterable[str], filename: str, preamble: str = ""):
+        """
+        Args:
+            data: the code generated by combine_rows
+            filename: the .typ file to write
+            preamble: code to write before everything else, e.g., to set the page size
+        """
         with open(filename, "w") as f:
+            f.write(preamble)
             if self._include_header:
                 f.write(self.header)
                 f.write("\n")
-            f.write(data)
\ No newline at end of file
+            write_chunks(f, data)
\ No newline at end of file
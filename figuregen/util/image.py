@@ -1,3 +1,6 @@
+from typing import List, Iterator, Tuple
+import os
+import tempfile
 import numpy as np
 
 from simpleimageio import lin_to_srgb, luminance, exposure, average_color_channels, zoom
@@ -14,6 +17,78 @@ def crop(img, left, top, width, height):
     elif img.ndim == 2:
         return img[top:top+height,left:left+width]
 
+def _srgb_curve(lin: np.ndarray) -> np.ndarray:
+    ''' The sRGB transfer function, for linear values in [0, 1] '''
+    return np.where(lin <= 0.0031308, 12.92 * lin, 1.055 * np.power(lin, 1 / 2.4) - 0.055)
+
+_SRGB_LUT_SIZE = 65536
+_srgb_lut = None
+
+def _get_srgb_lut() -> np.ndarray:
+    global _srgb_lut
+    if _srgb_lut is None:
+        lin = np.linspace(0, 1, _SRGB_LUT_SIZE, dtype=np.float64)
+        _srgb_lut = np.round(_srgb_curve(lin) * 255).astype(np.uint8)
+    return _srgb_lut
+
+def tonemap_uint8(img, exposure: float = 0, lut: bool = True, band_pixels: int = 1 << 16) -> np.ndarray:
+    ''' Converts a linear image to 8-bit sRGB, in a single pass over the image.
+
+    Scales by 2^exposure, clamps to [0, 1], applies the sRGB curve and quantizes. The image is processed in
+    bands of rows, so the temporaries stay in the cache. The result can be passed to PNG or JPEG, which
+    write 8-bit data without converting it again. Works tile by tile with TiledImage.apply().
+
+    args:
+        img: a 2D or 3D array of linear values
+        exposure: exposure value, in stops
+        lut: if true, the sRGB curve is read from a table with 65536 entries, which is faster than evaluating it
+            and differs by at most one step near the rounding boundaries
+        band_pixels: approximate number of values in each band
+
+    Returns:
+        uint8 array with the same shape
+    '''
+    img = np.asarray(img)
+    out = np.empty(img.shape, dtype=np.uint8)
+    scale = np.float32(2.0**exposure)
+    table = _get_srgb_lut() if lut else None
+    row_size = max(1, int(np.prod(img.shape[1:])))
+    band = max(1, band_pixels // row_size)
+    for top in range(0, img.shape[0], band):
+        x = np.multiply(img[top:top + band], scale, dtype=np.float32)
+        np.clip(x, 0, 1, out=x)
+        if table is not None:
+            x *= _SRGB_LUT_SIZE - 1
+            x += 0.5
+            out[top:top + band] = table[x.astype(np.uint16)]
+        else:
+            out[top:top + band] = np.round(_srgb_curve(x) * 255)
+    return out
+
+RESAMPLE_FILTERS = [ "nearest", "box", "bilinear", "bicubic", "lanczos" ]
+
+def resize(img, width, height, filter="lanczos"):
+    ''' Resamples an image to the given resolution in pixels.
+
+    Each channel is filtered separately in floating point via Pillow, which is installed along with matplotlib.
+
+    args:
+        img: a 2D or 3D image array
+        width, height: the new resolution in pixels
+        filter: one of RESAMPLE_FILTERS
+    '''
+    from PIL import Image as PILImage
+    assert filter in RESAMPLE_FILTERS, f"unknown filter '{filter}', use one of {RESAMPLE_FILTERS}"
+    resample = getattr(PILImage.Resampling, filter.upper())
+
+    def resize_channel(channel):
+        channel = PILImage.fromarray(np.ascontiguousarray(channel, dtype=np.float32), mode="F")
+        return np.asarray(channel.resize((width, height), resample))
+
+    if img.ndim == 2:
+        return resize_channel(img)
+    return np.stack([ resize_channel(img[:,:,c]) for c in range(img.shape[2]) ], axis=2)
+
 class Cropbox:
     def __init__(self, top, left, height, width, scale=1):
         self.top = top
@@ -28,6 +103,10 @@ class Cropbox:
         c = crop(image, self.left, self.top, self.width, self.height)
         return zoom(c, self.scale)
 
+    def view(self, image):
+        ''' The cropped region without magnification, as a view of the image (no copy is made) '''
+        return crop(image, self.left, self.top, self.width, self.height)
+
     @property
     def marker_pos(self):
         return self.get_marker_pos()
@@ -42,8 +121,127 @@ class Cropbox:
     def get_marker_size(self):
         return [self.right - self.left, self.bottom - self.top]
 
+class TiledImage:
+    ''' A large image that is processed in tiles, so that only a small part of it is in memory at once.
+
+    The pixels are read from an array that supports slicing, typically an np.memmap, so only the regions that are
+    accessed are loaded. Indexing returns float32 copies of a region, so crop() and Cropbox work as with arrays,
+    but only read the cropped pixels. Full-image operations (apply, downsample) run tile by tile.
+
+    A TiledImage is not a figure element itself: exporting a RasterImage writes all of its pixels at once. Put the
+    regions that are shown in a figure into a PNG or JPEG instead, e.g., a crop, or the full image downsampled to
+    the resolution it is shown at.
+    '''
+    def __init__(self, source, tile_size: int = 1024):
+        '''
+        args:
+            source: a 2D or 3D array (e.g., an np.memmap), or the filename of a .npy file, which is memory-mapped.
+                Other formats (e.g., .exr) would have to be decoded as a whole, convert them to .npy once, e.g.,
+                with np.save("image.npy", simpleimageio.read("image.exr")).
+            tile_size: width and height of the tiles, in pixels
+        '''
+        self._tmpdir = None
+        if isinstance(source, str):
+            if os.path.splitext(source)[1].lower() != ".npy":
+                raise ValueError(f"'{source}' is not a .npy file. Convert it once, e.g., with "
+                    f"np.save(\"image.npy\", simpleimageio.read(\"{source}\")), and pass the .npy file instead")
+            source = np.load(source, mmap_mode="r")
+        assert source.ndim == 2 or source.ndim == 3, "not an image"
+        self._source = source
+        self.tile_size = tile_size
+
+    @classmethod
+    def empty(cls, shape, dtype=np.float32, tile_size: int = 1024) -> "TiledImage":
+        ''' Creates an uninitialized image in a temporary memory-mapped file, which is removed along with the
+        returned object. Fill it by assigning to regions of its source array.
+        '''
+        tmpdir = tempfile.TemporaryDirectory()
+        filename = os.path.join(tmpdir.name, "image.npy")
+        result = cls(np.lib.format.open_memmap(filename, mode="w+", dtype=dtype, shape=shape), tile_size)
+        result._tmpdir = tmpdir
+        return result
+
+    @property
+    def source(self):
+        ''' The array that the pixels are read from '''
+        return self._source
+
+    @property
+    def shape(self):
+        return self._source.shape
+
+    @property
+    def ndim(self):
+        return self._source.ndim
+
+    @property
+    def height(self):
+        return self._source.shape[0]
+
+    @property
+    def width(self):
+        return self._source.shape[1]
+
+    def __getitem__(self, key) -> np.ndarray:
+        # Always a contiguous copy: some functions in simpleimageio do not support views with gaps between rows
+        return np.array(self._source[key], dtype=np.float32)
+
+    def tiles(self) -> Iterator[Tuple[int, int, np.ndarray]]:
+        ''' Yields (top, left, pixels) of every tile, row by row '''
+        for top in range(0, self.height, self.tile_size):
+            for left in range(0, self.width, self.tile_size):
+                yield top, left, self[top:top + self.tile_size, left:left + self.tile_size]
+
+    def apply(self, fn, out=None) -> "TiledImage":
+        ''' Applies a per-pixel function, e.g., lin_to_srgb, tile by tile.
+
+        args:
+            fn: function that maps an array of pixels to an array with the same width and height
+            out: array that receives the result, by default a temporary memory-mapped file
+
+        Returns:
+            The result as a TiledImage
+        '''
+        result = None
+        for top, left, tile in self.tiles():
+            tile = fn(tile)
+            if result is None and out is not None:
+                result = TiledImage(out, self.tile_size)
+            elif result is None:
+                result = TiledImage.empty((self.height, self.width, *tile.shape[2:]), tile.dtype, self.tile_size)
+            result.source[top:top + tile.shape[0], left:left + tile.shape[1]] = tile
+        return result
+
+    def downsample(self, width: int, height: int, filter: str = "lanczos") -> np.ndarray:
+        ''' Downsamples the image to the given resolution, reading it in bands of rows.
+
+        The image is first reduced by the largest integer factor that keeps it at least as large as the target,
+        by averaging blocks of pixels, so only one band of the input is in memory at a time. The reduced image is
+        then resampled to the exact resolution with the given filter, see resize(). If the target has the aspect
+        ratio of the image, the reduced image has less than four times as many pixels as the target.
+
+        This is meant for targets that fit in memory, like the resolution of an image in a figure: the result is
+        an in-memory array, and memory use grows with the target size. Use apply() for full-resolution results.
+        '''
+        k = max(1, min(self.height // height, self.width // width))
+        # Bands of rows span the full width and have about as many pixels as a tile
+        band = max(k, self.tile_size * self.tile_size // self.width // k * k)
+        cols = np.arange(0, self.width, k)
+        col_counts = np.diff(np.append(cols, self.width))
+        reduced = np.empty((-(-self.height // k), len(cols), *self.shape[2:]), dtype=np.float32)
+        for top in range(0, self.height, band):
+            pixels = self[top:top + band]
+            rows = np.arange(0, pixels.shape[0], k)
+            row_counts = np.diff(np.append(rows, pixels.shape[0]))
+            blocks = np.add.reduceat(np.add.reduceat(pixels, rows, axis=0), cols, axis=1)
+            counts = np.outer(row_counts, col_counts)
+            reduced[top // k:top // k + len(rows)] = blocks / (counts if blocks.ndim == 2 else counts[..., None])
+        if reduced.shape[:2] == (height, width):
+            return reduced
+        return resize(reduced, width, height, filter)
+
 class SplitImage:
-    def __init__(self, list_img, vertical=True, degree=15, weights=None):
+    def __init__(self, list_img, vertical=True, degree=15, weights=None, antialias=False):
             '''
             This class allows to split several images and make one image out of them.
             The weights define how much space each image will take within that new image,
@@ -56,6 +254,7 @@ class SplitImage:
                 degree (integer): A value between -45° and 45°.
                 vertical (boolean): Either uses a vertical or horizontal splitting.
                 weights (list of floats): Matches the weights to each image in list_img.
+                antialias (boolean): Blends the images along the split lines, weighted by pixel coverage.
             '''
             self.degree = degree
             if self.degree > 45 or self.degree < -45:
@@ -64,13 +263,14 @@ class SplitImage:
                     f'Try setting "vertical = {not vertical}" instead.'
                 )
             self.is_vertical = vertical
+            self.antialias = antialias
             self.num_img = len(list_img)
             assert self.num_img > 1, "at least two images are required"
 
             self.weights = self._normalize_weights(weights)
             self.img_width = list_img[0].shape[1]
             self.img_height = list_img[0].shape[0]
-            self.split_image = np.tile([x / 255 for x in [0,0,0]], (self.img_height, self.img_width, 1))
+            self.split_image = np.zeros((self.img_height, self.img_width, 3))
             # self.degree_rad = degree * np.pi / 180.0
             self.tan_degree_rad = np.tan(degree * np.pi / 180.0)
 
@@ -97,60 +297,77 @@ class SplitImage:
         return weights
 
     def _make_split_image(self, list_img):
-        if not self.is_vertical:
-            cur_pos = 0
-            for i in range(len(list_img)):
-                for col in range(self.img_width):
-                    rel_w = float(self.img_width) * 0.5 - col
-                    offset = self.tan_degree_rad * rel_w
-
-                    if i == 0:
-                        start = 0
-                    else:
-                        start = int(cur_pos + offset)
-
-                    if i == len(list_img) - 1:
-                        end = self.img_height
-                    else:
-                        end = int(cur_pos + self.weights[i] * self.img_height + offset)
-
-                    start = max(0, start)
-                    end = min(self.img_height, end)
-
-                    # save start and end position to draw a line between images
-                    self.split_image[start:end, col] = list_img[i][start:end, col]
-                    if col == 0 and start != 0.:
-                        self.start_pos.append((start, col))
-                    if col == self.img_width-1 and end != self.img_height:
-                        self.end_pos.append((end, col))
-
-                cur_pos += self.weights[i] * self.img_height
-
+        # Pixels are assigned to images along the "split axis": columns if vertical, rows otherwise.
+        # Each line perpendicular to it is shifted by an offset that depends on its distance to the center.
+        if self.is_vertical:
+            length, num_lines = self.img_width, self.img_height
         else:
-            cur_pos = 0
-            for i in range(len(list_img)):
-                for row in range(self.img_height):
-                    rel_h = float(self.img_height) * 0.5 - row
-                    offset = self.tan_degree_rad * rel_h
-
-                    if i == 0:
-                        start = 0
-                    else:
-                        start = int(cur_pos + offset)
-
-                    if i == len(list_img) - 1:
-                        end = self.img_width
-                    else:
-                        end = int(cur_pos + self.weights[i] * self.img_width + offset)
-
-                    start = max(0, start)
-                    end = min(self.img_width, end)
-
-                    self.split_image[row,start:end] = list_img[i][row,start:end]
-
+            length, num_lines = self.img_height, self.img_width
+
+        lines = np.arange(num_lines)
+        offsets = self.tan_degree_rad * (float(num_lines) * 0.5 - lines)
+
+        # Position where image i starts on each line, for i > 0
+        cur_pos = np.cumsum(np.asarray(self.weights[:-1]) * length)
+        boundaries = cur_pos[:, None] + offsets[None, :]
+
+        # Index of the image that each pixel belongs to. Truncation and clamping match the pixel
+        # ranges [start, end) computed by int(cur_pos + offset) for each line.
+        bounds = np.clip(np.trunc(boundaries), 0, length).astype(np.int64)
+        pixels = np.arange(length)
+        index = np.zeros((num_lines, length), dtype=np.min_scalar_type(self.num_img))
+        for b in bounds:
+            index += pixels[None, :] >= b[:, None]
+        if not self.is_vertical:
+            index = index.T
 
+        self._copy_regions(list_img, index)
+        if self.antialias:
+            self._blend_boundaries(list_img, boundaries, lines, length)
 
-                cur_pos += self.weights[i] * self.img_width
+        if not self.is_vertical:
+            # Row where each boundary enters the first and leaves the last column
+            for b in boundaries:
+                start = max(0, int(b[0]))
+                if start != 0:
+                    self.start_pos.append((start, 0))
+            for b in boundaries:
+                end = min(self.img_height, int(b[-1]))
+                if end != self.img_height:
+                    self.end_pos.append((end, self.img_width - 1))
+
+    def _copy_regions(self, list_img, index):
+        # The boundaries are straight lines, so every image covers one interval of columns in each row.
+        # Copying these as contiguous blocks of rows is much faster than masked assignment.
+        for i, img in enumerate(list_img):
+            mask = index == i
+            count = np.sum(mask, axis=1)
+            first = np.where(count > 0, np.argmax(mask, axis=1), 0)
+            last = first + count
+
+            changes = np.flatnonzero((np.diff(first) != 0) | (np.diff(last) != 0)) + 1
+            for r0, r1 in zip(np.concatenate([[0], changes]), np.concatenate([changes, [self.img_height]])):
+                c0, c1 = first[r0], last[r0]
+                if c1 > c0:
+                    self.split_image[r0:r1, c0:c1] = img[r0:r1, c0:c1]
+
+    def _blend_boundaries(self, list_img, boundaries, lines, length):
+        # Only the pixels that a boundary passes through are blended, weighted by the fraction
+        # of the pixel that each image covers.
+        for x in boundaries:
+            pixel = np.floor(x)
+            valid = (pixel >= 0) & (pixel < length)
+            line, pixel = lines[valid], pixel[valid].astype(np.int64)
+            rows, cols = (line, pixel) if self.is_vertical else (pixel, line)
+
+            # Fraction of the pixel that lies beyond each boundary
+            beyond = [ np.clip(pixel + 1 - b[valid], 0, 1) for b in boundaries ]
+            beyond = [np.ones(len(pixel))] + beyond + [np.zeros(len(pixel))]
+
+            value = 0
+            for i, img in enumerate(list_img):
+                value = value + (beyond[i] - beyond[i + 1])[:, None] * img[rows, cols]
+            self.split_image[rows, cols] = value
 
     def get_image(self):
         return self.split_image
@@ -216,4 +433,180 @@ def sape(img, ref):
 def smape(img, ref):
     ''' Computes the symmetric mean absolute percentage error
     '''
-    return np.average(sape(img,ref))
\ No newline at end of file
+    return np.average(sape(img,ref))
+
+# Per-pixel error maps that ErrorIndex can be built for, by name
+ERROR_MAPS = {
+    "squared": squared_error,
+    "relative_squared": relative_squared_error,
+    "sape": sape,
+}
+
+def _error_map(fn, img, ref) -> np.ndarray:
+    ''' Per-pixel error, summed over the color channels '''
+    err = fn(img, ref)
+    if err.ndim == 2:
+        return err
+    # Adding the channels one by one is much faster than a reduction over the (short) last axis
+    total = err[..., 0].copy()
+    for c in range(1, err.shape[2]):
+        total += err[..., c]
+    return total
+
+def _summed_area_table(values: np.ndarray) -> np.ndarray:
+    ''' Table t with a leading row and column of zeros, so that t[y, x] is the sum of values[:y, :x] '''
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(values, axis=0, dtype=np.float64), axis=1, out=table[1:, 1:])
+    return table
+
+def _window_sums(table: np.ndarray, height: int, width: int) -> np.ndarray:
+    ''' Sum of every window with the given size, from a summed-area table '''
+    return table[height:, width:] - table[:-height, width:] - table[height:, :-width] + table[:-height, :-width]
+
+class ErrorIndex:
+    ''' Summed-area tables of the error maps of one image with respect to a reference.
+
+    Built once per (reference, method) pair, after which the mean error over any Cropbox is computed from
+    four table lookups, regardless of its size. Useful to evaluate many candidate crops, e.g., while
+    selecting them interactively.
+    '''
+    def __init__(self, reference, method, metrics=("squared", "relative_squared", "sape")):
+        '''
+        args:
+            reference: the reference image, a 2D or 3D array
+            method: the image to compare to the reference, with the same resolution
+            metrics: names of error maps in ERROR_MAPS, or a dict from names to functions
+                (img, ref) -> per-pixel error, like squared_error()
+        '''
+        reference = np.asarray(reference, dtype=np.float32)
+        method = np.asarray(method, dtype=np.float32)
+        assert reference.shape == method.shape, "Images must have the same resolution"
+        assert reference.ndim == 2 or reference.ndim == 3, "not an image"
+
+        if not isinstance(metrics, dict):
+            metrics = { name: ERROR_MAPS[name] for name in metrics }
+
+        self.height, self.width = reference.shape[:2]
+        self._channels = 1 if reference.ndim == 2 else reference.shape[2]
+        self._tables = {}
+        for name, fn in metrics.items():
+            self._tables[name] = _summed_area_table(_error_map(fn, method, reference))
+
+    @property
+    def metrics(self):
+        return list(self._tables.keys())
+
+    def mean(self, metric="relative_squared", crop: Cropbox | None = None) -> float:
+        ''' Mean error within a crop, or over the full image if crop is None '''
+        if crop is None:
+            top, left, height, width = 0, 0, self.height, self.width
+        else:
+            top, left, height, width = crop.top, crop.left, crop.height, crop.width
+            assert top >= 0 and left >= 0, "crop is outside the image"
+            assert top + height <= self.height and left + width <= self.width, "crop is outside the image"
+        t = self._tables[metric]
+        total = t[top + height, left + width] - t[top, left + width] - t[top + height, left] + t[top, left]
+        return float(total / (height * width * self._channels))
+
+    def window_means(self, metric: str, height: int, width: int) -> np.ndarray:
+        ''' Mean error of every window with the given size.
+
+        Returns:
+            Array where element [top, left] is the mean error of the window at that position,
+            with shape (self.height - height + 1, self.width - width + 1)
+        '''
+        assert 0 < height <= self.height and 0 < width <= self.width, "window is larger than the image"
+        return _window_sums(self._tables[metric], height, width) / (height * width * self._channels)
+
+def _block_error_sums(fn, images, ref, factor: int, stride: int = 1, band_rows: int = 256) -> List[np.ndarray]:
+    ''' Error maps of all images, summed over blocks of factor x factor pixels. Within each block, only every
+    stride-th pixel in each direction is evaluated. The maps are computed in bands of rows, so only a small part
+    of each map is in memory at once.
+    '''
+    assert factor % stride == 0
+    rows, cols = ref.shape[0] // factor, ref.shape[1] // factor
+    n = factor // stride
+    result = [ np.empty((rows, cols), dtype=np.float64) for _ in images ]
+    step = max(1, band_rows // factor)
+    for r0 in range(0, rows, step):
+        r1 = min(rows, r0 + step)
+        region = (slice(r0 * factor, r1 * factor, stride), slice(0, cols * factor, stride))
+        r = np.asarray(ref[region], dtype=np.float32)
+        for img, out in zip(images, result):
+            err = _error_map(fn, np.asarray(img[region], dtype=np.float32), r)
+            # Sum the rows of each block first, then the (much fewer) columns
+            err = err.reshape(r1 - r0, n, cols * n).sum(axis=1)
+            out[r0:r1] = err.reshape(r1 - r0, cols, n).sum(axis=2)
+    return result
+
+def _difference_score(means: np.ndarray) -> np.ndarray:
+    ''' Spread of the errors between methods (first axis), or the error itself if there is only one '''
+    return means[0] if len(means) == 1 else means.max(axis=0) - means.min(axis=0)
+
+def suggest_crops(reference, method_images, height: int, width: int, num_crops: int = 3, scale: int = 1,
+                  metric="relative_squared", max_coarse_size: int = 512) -> List[Cropbox]:
+    ''' Finds windows where the methods differ the most, as candidates for the crops of a comparison figure.
+
+    The score of a window is the difference between the largest and smallest mean error of the methods within
+    it (or the mean error, if there is only one method). Windows are first ranked on error maps that are
+    summed over blocks of pixels, so their longer side has at most max_coarse_size blocks, and each chosen
+    window is then refined at full resolution. The windows do not overlap. For large blocks, the error is only
+    evaluated on a regular subset of the pixels in each block (one in every 2x2 pixels for 8x8 blocks), which
+    keeps per-pixel noise in the ranking, unlike comparing downsampled images.
+
+    args:
+        reference: the reference image, a 2D or 3D array
+        method_images: list of images to compare, with the same resolution as the reference
+        height, width: size of the crops in pixels
+        num_crops: the number of crops to find. Fewer are returned if no more fit without overlapping.
+        scale: magnification of the returned Cropboxes
+        metric: name of an error map in ERROR_MAPS, or a function (img, ref) -> per-pixel error
+
+    Returns:
+        List of Cropbox, best first
+    '''
+    fn = ERROR_MAPS[metric] if isinstance(metric, str) else metric
+    img_height, img_width = reference.shape[:2]
+    assert 0 < height <= img_height and 0 < width <= img_width, "crop is larger than the image"
+
+    # Coarse windows must fit into the crop, so refinement only needs to search within one block
+    factor = max(1, min(-(-max(img_height, img_width) // max_coarse_size), height, width))
+    coarse_h, coarse_w = height // factor, width // factor
+    stride = max(d for d in range(1, max(1, factor // 4) + 1) if factor % d == 0)
+    blocks = _block_error_sums(fn, method_images, reference, factor, stride)
+    means = np.stack([ _window_sums(_summed_area_table(b), coarse_h, coarse_w) for b in blocks ])
+    scores = _difference_score(means)
+    coarse_tops = np.arange(scores.shape[0]) * factor
+    coarse_lefts = np.arange(scores.shape[1]) * factor
+
+    crops = []
+    while len(crops) < num_crops and np.isfinite(scores).any():
+        i, j = np.unravel_index(np.argmax(scores), scores.shape)
+
+        # Refine by evaluating all full-resolution windows within one block of the coarse window
+        t0, t1 = max(0, coarse_tops[i] - factor), min(img_height - height, coarse_tops[i] + factor)
+        l0, l1 = max(0, coarse_lefts[j] - factor), min(img_width - width, coarse_lefts[j] + factor)
+        region = (slice(t0, t1 + height), slice(l0, l1 + width))
+        ref = np.asarray(reference[region], dtype=np.float32)
+        local = np.stack([
+            _window_sums(_summed_area_table(_error_map(fn, np.asarray(m[region], dtype=np.float32), ref)),
+                height, width)
+            for m in method_images
+        ])
+        local = _difference_score(local)
+        tops = np.arange(t0, t1 + 1)[:, None]
+        lefts = np.arange(l0, l1 + 1)[None, :]
+        for c in crops:
+            local[(tops < c.bottom) & (tops + height > c.top) & (lefts < c.right) & (lefts + width > c.left)] = -np.inf
+        if not np.isfinite(local).any():
+            scores[i, j] = -np.inf
+            continue
+        y, x = np.unravel_index(np.argmax(local), local.shape)
+        crop = Cropbox(top=int(t0 + y), left=int(l0 + x), height=height, width=width, scale=scale)
+        crops.append(crop)
+
+        # Exclude all coarse windows that overlap the chosen one
+        rows = (coarse_tops < crop.bottom) & (coarse_tops + coarse_h * factor > crop.top)
+        cols = (coarse_lefts < crop.right) & (coarse_lefts + coarse_w * factor > crop.left)
+        scores[np.ix_(rows, cols)] = -np.inf
+    return crops
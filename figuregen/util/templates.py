@@ -1,9 +1,56 @@
 from typing import Tuple, List
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
 from . import image
 from .. import figuregen as fig
 
+def _relative_mse_batch(reference_image, method_images, crops: List[image.Cropbox],
+                        max_workers: int | None) -> Tuple[List[float], List[List[float]]]:
+    """ relative_mse of every method, over the full image and within every crop.
+
+    Crops are evaluated on views of the images, without magnifying them first. Each method is processed by
+    one task, the tasks run in parallel threads (the error computation releases the GIL).
+    """
+    def errors_of(method) -> List[float]:
+        return [ float(image.relative_mse(method, reference_image)) ] + [
+            float(image.relative_mse(crop.view(method), crop.view(reference_image)))
+            for crop in crops
+        ]
+
+    if max_workers == 1 or len(method_images) < 2:
+        results = [ errors_of(m) for m in method_images ]
+    else:
+        with ThreadPoolExecutor(max_workers) as pool:
+            results = list(pool.map(errors_of, method_images))
+
+    errors = [ values[0] for values in results ]
+    crop_errors = [ [ values[1 + i] for values in results ] for i in range(len(crops)) ]
+    return errors, crop_errors
+
+def _compute_errors(template, base, reference_image, method_images, crops: List[image.Cropbox],
+                    max_workers: int | None) -> Tuple[List[float], List[List[float]]]:
+    """ Computes the errors of all methods over the full image and within each crop.
+
+    Uses the batched computation if the template uses the default metric, and calls compute_error() for each
+    pair of images otherwise.
+    """
+    if type(template).compute_error is base.compute_error:
+        return _relative_mse_batch(reference_image, method_images, crops, max_workers)
+
+    errors = [
+        template.compute_error(reference_image, m)
+        for m in method_images
+    ]
+    crop_errors = [
+        [
+            template.compute_error(crop.crop(reference_image), crop.crop(m))
+            for m in method_images
+        ]
+        for crop in crops
+    ]
+    return errors, crop_errors
+
 class CropComparison:
     """ Matrix of cropped and zoomed images next to a reference image.
 
@@ -14,7 +61,7 @@ class CropComparison:
     grids in the generated list of grids.
     """
     def __init__(self, reference_image, method_images, crops: List[image.Cropbox],
-                 scene_name = None, method_names = None, use_latex = False):
+                 scene_name = None, method_names = None, use_latex = False, max_workers: int | None = None):
         """ Shows a reference image next to a grid of crops from different methods.
 
         Args:
@@ -24,6 +71,7 @@ class CropComparison:
             scene_name: [optional] string, name of the scene to put underneath the reference image
             method_names: [optional] list of string, names for the reference and each method, to put above the crops
             use_latex: set to true to pretty-print captions with LaTeX commands (requires TikZ backend)
+            max_workers: number of threads that compute the error values, 1 to compute them serially
 
         Returns:
             A list of two grids:
@@ -33,17 +81,8 @@ class CropComparison:
         self._method_images = method_images
         self.use_latex = use_latex
 
-        self._errors = [
-            self.compute_error(reference_image, m)
-            for m in method_images
-        ]
-        self._crop_errors = [
-            [
-                self.compute_error(crop.crop(reference_image), crop.crop(m))
-                for m in method_images
-            ]
-            for crop in crops
-        ]
+        self._errors, self._crop_errors = _compute_errors(self, CropComparison, reference_image, method_images,
+            crops, max_workers)
 
         # Create the grid for the reference image
         self._ref_grid = fig.Grid(1, 1)
@@ -57,9 +96,9 @@ class CropComparison:
         # Create the grid with the crops
         self._crop_grid = fig.Grid(num_cols=len(method_images) + 1, num_rows=len(crops))
         for row in range(len(crops)):
-            self._crop_grid[row, 0].image = self.tonemap(crops[row].crop(reference_image))
+            self._crop_grid[row, 0].image = self.tonemap_crop(crops[row], reference_image)
             for col in range(len(method_images)):
-                self._crop_grid[row, col + 1].image = self.tonemap(crops[row].crop(method_images[col]))
+                self._crop_grid[row, col + 1].image = self.tonemap_crop(crops[row], method_images[col])
 
         # Put error values underneath the columns
         error_strings = [ f"{self.error_metric_name}" ]
@@ -80,7 +119,17 @@ class CropComparison:
         self._ref_grid.layout.padding[fig.RIGHT] = 1
 
     def tonemap(self, img):
-        return fig.JPEG(image.lin_to_srgb(img), quality=80)
+        return fig.JPEG(image.tonemap_uint8(img), quality=80)
+
+    def tonemap_crop(self, crop: image.Cropbox, img):
+        """ Tonemaps the cropped region of an image. The crop is magnified when it is exported, so only the
+        (unmagnified) cropped pixels are tonemapped and kept in memory.
+        """
+        elem = self.tonemap(crop.view(img))
+        if not isinstance(elem, fig.RasterImage):
+            return self.tonemap(crop.crop(img))
+        elem.scale = crop.scale
+        return elem
 
     @property
     def error_metric_name(self) -> str:
@@ -128,7 +177,7 @@ class FullSizeWithCrops:
     grids in the generated list of grids.
     """
     def __init__(self, reference_image, method_images, crops: List[image.Cropbox],
-                 crops_below = True, method_names = None, use_latex = False):
+                 crops_below = True, method_names = None, use_latex = False, max_workers: int | None = None):
         """ Shows a reference image next to a grid of crops from different methods.
 
         Args:
@@ -138,6 +187,7 @@ class FullSizeWithCrops:
             crops_below: [optional] if False, the crops will be a column to the right of each image
             method_names: [optional] list of string, names for the reference and each method, to put above the crops
             use_latex: set to true to pretty-print captions with LaTeX commands (requires TikZ backend)
+            max_workers: number of threads that compute the error values, 1 to compute them serially
 
         Returns:
             A list of two grids:
@@ -148,17 +198,8 @@ class FullSizeWithCrops:
         self.use_latex = use_latex
         self._crops_below = crops_below
 
-        self._errors = [
-            self.compute_error(reference_image, m)
-            for m in method_images
-        ]
-        self._crop_errors = [
-            [
-                self.compute_error(crop.crop(reference_image), crop.crop(m))
-                for m in method_images
-            ]
-            for crop in crops
-        ]
+        self._errors, self._crop_errors = _compute_errors(self, FullSizeWithCrops, reference_image, method_images,
+            crops, max_workers)
 
         # Put in one list to make our life easier in the following
         images = [reference_image]
@@ -179,7 +220,7 @@ class FullSizeWithCrops:
             ]
             for i in range(len(images)):
                 for col in range(len(crops)):
-                    self._crop_grid[i][0, col].image = self.tonemap(crops[col].crop(images[i]))
+                    self._crop_grid[i][0, col].image = self.tonemap_crop(crops[col], images[i])
         else:
             self._crop_grid = [
                 fig.Grid(num_cols=1, num_rows=len(crops))
@@ -187,7 +228,7 @@ class FullSizeWithCrops:
             ]
             for i in range(len(images)):
                 for row in range(len(crops)):
-                    self._crop_grid[i][row, 0].image = self.tonemap(crops[row].crop(images[i]))
+                    self._crop_grid[i][row, 0].image = self.tonemap_crop(crops[row], images[i])
 
         # Add padding to the right of all but the last image
         for i in range(len(images) - 1):
@@ -231,7 +272,17 @@ class FullSizeWithCrops:
         # TODO set appropriate paddings for alignment etc
 
     def tonemap(self, img):
-        return fig.JPEG(image.lin_to_srgb(img), quality=80)
+        return fig.JPEG(image.tonemap_uint8(img), quality=80)
+
+    def tonemap_crop(self, crop: image.Cropbox, img):
+        """ Tonemaps the cropped region of an image. The crop is magnified when it is exported, so only the
+        (unmagnified) cropped pixels are tonemapped and kept in memory.
+        """
+        elem = self.tonemap(crop.view(img))
+        if not isinstance(elem, fig.RasterImage):
+            return self.tonemap(crop.crop(img))
+        elem.scale = crop.scale
+        return elem
 
     @property
     def error_metric_name(self) -> str:
@@ -21,10 +21,14 @@ setuptools.setup(
     python_requires='>=3.11',
     install_requires=[
         'matplotlib>=3.2.1',
+        'Pillow>=9.1',
         'python-pptx',
         'simpleimageio',
         'texsnip>=1.1.0'
     ],
+    extras_require={
+        'pdf': ['pypdf>=4.0,<7', 'fonttools>=4.0'],
+    },
     zip_safe=False,
     include_package_data=True
 )
@@ -0,0 +1,87 @@
+import unittest
+import asyncio
+import os
+import stat
+import subprocess
+import tempfile
+from unittest import mock
+import numpy as np
+
+import figuregen
+from figuregen.latex_compiler import LatexCompiler
+
+# Stands in for pdflatex: writes <jobname>.pdf, or fails if the document contains "FAIL"
+FAKE_PDFLATEX = """#!/bin/sh
+for last; do true; done
+if grep -q FAIL "$last"; then exit 1; fi
+echo pdf > "${last%.tex}.pdf"
+"""
+
+class TestAsync(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _grid(self, color):
+        grid = figuregen.Grid(1, 2)
+        grid[0, 0].image = figuregen.PNG(np.tile(color, (16, 32, 1)))
+        grid[0, 1].image = figuregen.PNG(np.tile(color[::-1], (16, 32, 1)))
+        grid.set_title("top", "Title")
+        return grid
+
+    def test_same_output_as_sync(self):
+        for ext in ["html", "tikz", "typ"]:
+            grid = self._grid([0.1, 0.2, 0.3])
+            sync_dir = os.path.join(self.tmpdir.name, "sync-" + ext)
+            async_dir = os.path.join(self.tmpdir.name, "async-" + ext)
+            os.makedirs(sync_dir)
+            os.makedirs(async_dir)
+            figuregen.figure([[grid]], 10, os.path.join(sync_dir, "figure." + ext))
+            asyncio.run(figuregen.figure_async([[grid]], 10, os.path.join(async_dir, "figure." + ext)))
+
+            self.assertEqual(sorted(os.listdir(sync_dir)), sorted(os.listdir(async_dir)))
+            for name in os.listdir(sync_dir):
+                with open(os.path.join(sync_dir, name), "rb") as a, open(os.path.join(async_dir, name), "rb") as b:
+                    self.assertEqual(a.read(), b.read(), name)
+
+    def test_concurrent_figures(self):
+        async def run():
+            semaphore = asyncio.Semaphore(2)
+            await asyncio.gather(*[
+                figuregen.figure_async([[self._grid([0.1 * i, 0.2, 0.3])]], 10,
+                    os.path.join(self.tmpdir.name, f"figure{i}.html"), semaphore=semaphore)
+                for i in range(5)
+            ])
+        asyncio.run(run())
+        for i in range(5):
+            self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, f"figure{i}.html")))
+
+    def test_compile_async(self):
+        bin_dir = os.path.join(self.tmpdir.name, "bin")
+        os.makedirs(bin_dir)
+        script = os.path.join(bin_dir, "pdflatex")
+        with open(script, "w") as f:
+            f.write(FAKE_PDFLATEX)
+        os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+
+        compiler = LatexCompiler(os.path.join(self.tmpdir.name, "formats"), max_jobs=2, use_formats=False)
+        doc = "\\documentclass{article}\n\\begin{document}\n%s\n\\end{document}\n"
+
+        async def run():
+            return await asyncio.gather(*[
+                compiler.compile_async(doc % "hi", self.tmpdir.name, f"doc{i}") for i in range(4)
+            ])
+
+        with mock.patch.dict(os.environ, { "PATH": bin_dir + os.pathsep + os.environ["PATH"] }):
+            results = asyncio.run(run())
+            for i, pdf in enumerate(results):
+                self.assertEqual(pdf, os.path.join(self.tmpdir.name, f"doc{i}.pdf"))
+                self.assertTrue(os.path.exists(pdf))
+
+            with self.assertRaises(subprocess.CalledProcessError):
+                asyncio.run(compiler.compile_async(doc % "FAIL", self.tmpdir.name, "bad"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import os
+import tempfile
+import threading
+from unittest import mock
+import numpy as np
+
+import figuregen
+from figuregen.cache import RenderCache
+from figuregen.html import HtmlBackend
+
+class TestFigureBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _grid(self, color):
+        grid = figuregen.Grid(1, 2)
+        grid[0, 0].image = figuregen.PNG(np.tile([0.1, 0.2, 0.3], (16, 32, 1))) # shared by all figures
+        grid[0, 1].image = figuregen.PNG(np.tile(color, (16, 32, 1)))
+        return grid
+
+    def _jobs(self, n, ext):
+        # Each figure gets its own directory, as the image files of different figures would have the same names
+        jobs = []
+        for i in range(n):
+            os.makedirs(os.path.join(self.tmpdir.name, f"scene{i}"), exist_ok=True)
+            jobs.append(([[self._grid([0.1 * i, 0.5, 0.5])]], 10,
+                os.path.join(self.tmpdir.name, f"scene{i}", f"figure.{ext}")))
+        return jobs
+
+    def test_build_many(self):
+        timings = figuregen.build_many(self._jobs(6, "tikz"), max_parallel_figures=3)
+        self.assertEqual([t.filename for t in timings], [j[2] for j in self._jobs(6, "tikz")])
+        for t in timings:
+            self.assertIsNone(t.error)
+            self.assertGreater(t.seconds, 0)
+            self.assertTrue(os.path.exists(t.filename))
+
+    def test_shared_elements_are_exported_once(self):
+        make_raster = figuregen.PNG.make_raster
+        with mock.patch.object(figuregen.PNG, "make_raster", autospec=True, side_effect=make_raster) as m:
+            with figuregen.FigureBatch(render_cache=RenderCache(os.path.join(self.tmpdir.name, "cache"))) as batch:
+                for job in self._jobs(5, "tikz"):
+                    batch.add(*job)
+                batch.build()
+                self.assertEqual(batch.cache_stats.hits, 4)
+            # One export for the shared image, one for each distinct image
+            self.assertEqual(m.call_count, 6)
+
+    def test_shared_elements_without_cache(self):
+        make_raster = figuregen.PNG.make_raster
+        shutdown = figuregen.backend.Backend.shutdown
+        with mock.patch.object(figuregen.PNG, "make_raster", autospec=True, side_effect=make_raster) as m, \
+             mock.patch.object(figuregen.backend.Backend, "shutdown", autospec=True, side_effect=shutdown) as s:
+            with figuregen.FigureBatch() as batch:
+                self.assertIsNone(batch.render_cache.directory)
+                for job in self._jobs(5, "tikz"):
+                    batch.add(*job)
+                for t in batch.build():
+                    self.assertIsNone(t.error)
+                self.assertEqual(batch.cache_stats.hits, 4)
+            self.assertEqual(m.call_count, 6)
+            # The backends that the batch created for the figures
+            self.assertEqual(s.call_count, 5)
+        with open(os.path.join(self.tmpdir.name, "scene4", "img-fig0-grid0-row0-col0.png"), "rb") as f:
+            with open(os.path.join(self.tmpdir.name, "scene0", "img-fig0-grid0-row0-col0.png"), "rb") as g:
+                self.assertEqual(f.read(), g.read())
+
+    def test_concurrent_exports_of_same_key_wait(self):
+        cache = RenderCache(os.path.join(self.tmpdir.name, "cache"))
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def export():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return "<img/>"
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(cache.fetch_text_or_export("k", export)))
+        first.start()
+        started.wait()
+        second = threading.Thread(target=lambda: results.append(cache.fetch_text_or_export("k", export)))
+        second.start()
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual(results, ["<img/>", "<img/>"])
+        self.assertEqual(len(calls), 1)
+
+    def test_errors_are_reported(self):
+        with figuregen.FigureBatch() as batch:
+            jobs = self._jobs(2, "html")
+            batch.add(*jobs[0])
+            batch.add(jobs[1][0], 10, os.path.join(self.tmpdir.name, "figure.unknown"))
+            batch.add(*jobs[1], backend=HtmlBackend(inline=True, **batch.backend_options))
+            timings = batch.build()
+        self.assertIsNone(timings[0].error)
+        self.assertIsInstance(timings[1].error, ValueError)
+        self.assertIsNone(timings[2].error)
+
+    def test_backend_per_figure(self):
+        with figuregen.FigureBatch() as batch:
+            jobs = self._jobs(2, "html")
+            backend = HtmlBackend(**batch.backend_options)
+            batch.add(*jobs[0], backend=backend)
+            with self.assertRaises(ValueError):
+                batch.add(*jobs[1], backend=backend)
+            batch.build()
+            # Once the batch is built, the backend can be used again
+            batch.add(*jobs[1], backend=backend)
+            self.assertIsNone(batch.build()[0].error)
+
+if __name__ == "__main__":
+    unittest.main()
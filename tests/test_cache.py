@@ -0,0 +1,77 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+
+import figuregen
+from figuregen.cache import RenderCache
+from figuregen.html import HtmlBackend
+from figuregen.tikz import TikzBackend
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmpdir.name, "cache")
+        self.out_dir = os.path.join(self.tmpdir.name, "out")
+        os.makedirs(self.out_dir)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _grid(self, color):
+        grid = figuregen.Grid(1, 2)
+        grid[0, 0].image = figuregen.PNG(np.tile(color, (16, 32, 1)))
+        grid[0, 1].image = figuregen.PNG(np.tile(color[::-1], (16, 32, 1)))
+        return grid
+
+    def test_key_depends_on_content_and_size(self):
+        cache = RenderCache(self.cache_dir)
+        a = figuregen.PNG(np.zeros((4, 4, 3)))
+        b = figuregen.PNG(np.zeros((4, 4, 3)))
+        c = figuregen.PNG(np.ones((4, 4, 3)))
+        self.assertEqual(cache.key(a, "raster", 10, 10), cache.key(b, "raster", 10, 10))
+        self.assertNotEqual(cache.key(a, "raster", 10, 10), cache.key(c, "raster", 10, 10))
+        self.assertNotEqual(cache.key(a, "raster", 10, 10), cache.key(a, "raster", 10, 11))
+        self.assertNotEqual(cache.key(a, "raster", 10, 10), cache.key(a, "pdf", 10, 10))
+
+    def test_second_figure_hits_cache(self):
+        cache = RenderCache(self.cache_dir)
+        filename = os.path.join(self.out_dir, "figure.tikz")
+
+        figuregen.figure([[self._grid([0.5, 0.2, 0.1])]], 10, filename, TikzBackend(render_cache=cache))
+        self.assertEqual(cache.stats.hits, 0)
+        self.assertEqual(cache.stats.misses, 2)
+
+        figuregen.figure([[self._grid([0.5, 0.2, 0.1])]], 10, filename, TikzBackend(render_cache=cache))
+        self.assertEqual(cache.stats.hits, 2)
+        self.assertEqual(cache.stats.misses, 2)
+        self.assertTrue(os.path.exists(os.path.join(self.out_dir, "img-fig0-grid0-row0-col1.png")))
+
+        # Entries persist across sessions
+        cache = RenderCache(self.cache_dir)
+        self.assertEqual(cache.stats.num_entries, 2)
+
+    def test_html_is_cached(self):
+        cache = RenderCache(self.cache_dir)
+        filename = os.path.join(self.out_dir, "figure.html")
+        figuregen.figure([[self._grid([0.1, 0.2, 0.1])]], 10, filename, HtmlBackend(render_cache=cache))
+        with open(filename) as f:
+            first = f.read()
+        figuregen.figure([[self._grid([0.1, 0.2, 0.1])]], 10, filename, HtmlBackend(render_cache=cache))
+        with open(filename) as f:
+            second = f.read()
+        self.assertEqual(first, second)
+        # Both images are identical, so each figure only exports (or looks up) one of them
+        self.assertEqual(cache.stats.hits, 1)
+        self.assertEqual(cache.stats.num_entries, 1)
+
+    def test_lru_eviction(self):
+        cache = RenderCache(self.cache_dir, max_size_mb=1e-3)
+        for i in range(3):
+            cache.store_text(str(i), "x" * 400)
+        self.assertEqual(cache.stats.evictions, 1)
+        self.assertIsNone(cache.fetch_text("0"))
+        self.assertEqual(cache.fetch_text("2"), "x" * 400)
+
+if __name__ == "__main__":
+    unittest.main()
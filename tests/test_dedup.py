@@ -0,0 +1,80 @@
+import unittest
+import os
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+import numpy as np
+from pypdf import PdfReader
+
+import figuregen
+from figuregen.tikz import TikzBackend
+from figuregen.typst import TypstBackend
+from figuregen.powerpoint import PptxBackend
+from figuregen.svg import NativeSvgBackend
+from figuregen.pdfwriter import NativePdfBackend
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+class TestDeduplication(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.pixels = np.tile([0.1, 0.2, 0.3], (16, 32, 1))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _generate(self, images, filename, backend, width=10):
+        grid = figuregen.Grid(1, len(images))
+        for i, img in enumerate(images):
+            grid[0, i].image = img
+        filename = os.path.join(self.tmpdir.name, filename)
+        figuregen.figure([[grid]], width, filename, backend=backend)
+        return filename
+
+    def _images(self, filename):
+        with open(filename) as f:
+            return re.findall(r"img-fig\S*?\.png", f.read())
+
+    def test_same_object(self):
+        img = figuregen.PNG(self.pixels)
+        filename = self._generate([img, img, figuregen.PNG(self.pixels * 0.5)], "figure.tikz", TikzBackend())
+        images = self._images(filename)
+        self.assertEqual(len(images), 3)
+        self.assertEqual(images[0], images[1])
+        self.assertNotEqual(images[0], images[2])
+        self.assertEqual(len([ f for f in os.listdir(self.tmpdir.name) if f.endswith(".png") ]), 2)
+
+    def test_same_content(self):
+        images = [ figuregen.PNG(self.pixels.copy()) for _ in range(3) ]
+        filename = self._generate(images, "figure.typ", TypstBackend())
+        self.assertEqual(len(set(self._images(filename))), 1)
+
+    def test_disabled(self):
+        images = [ figuregen.PNG(self.pixels.copy()) for _ in range(3) ]
+        filename = self._generate(images, "figure.typ", TypstBackend(deduplicate=False))
+        self.assertEqual(len(set(self._images(filename))), 3)
+
+    def test_pptx(self):
+        from pptx import Presentation
+        images = [ figuregen.PNG(self.pixels.copy()) for _ in range(3) ]
+        filename = self._generate(images, "figure.pptx", PptxBackend(), width=30)
+        prs = Presentation(filename)
+        pictures = [ s for s in prs.slides[0].shapes if s.shape_type == 13 ]
+        self.assertEqual(len(pictures), 3)
+        self.assertEqual(len({ p.image.sha1 for p in pictures }), 1)
+        self.assertEqual(len([ p for p in prs.part.package.iter_parts() if p.partname.startswith("/ppt/media/") ]), 1)
+
+    def test_native_svg(self):
+        images = [ figuregen.PNG(self.pixels.copy()) for _ in range(2) ]
+        root = ET.parse(self._generate(images, "figure.svg", NativeSvgBackend())).getroot()
+        self.assertEqual(len(root.findall(SVG + "image")), 1)
+        self.assertEqual(len(root.findall(SVG + "use")), 1)
+
+    def test_native_pdf(self):
+        images = [ figuregen.PNG(self.pixels.copy()) for _ in range(2) ]
+        page = PdfReader(self._generate(images, "figure.pdf", NativePdfBackend())).pages[0]
+        self.assertEqual(len(page["/Resources"]["/XObject"]), 1)
+        self.assertEqual(page.get_contents().get_data().count(b" Do"), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+
+from figuregen.util import image
+from figuregen.util.image import Cropbox, ErrorIndex
+
+class TestErrorIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        self.reference = rng.random((48, 64, 3)).astype(np.float32)
+        self.method = self.reference + rng.normal(0, 0.2, self.reference.shape).astype(np.float32)
+        self.index = ErrorIndex(self.reference, self.method)
+
+    def test_matches_error_maps(self):
+        crop = Cropbox(top=5, left=7, height=20, width=30)
+        for name, fn in image.ERROR_MAPS.items():
+            expected = np.mean(fn(crop.view(self.method), crop.view(self.reference)))
+            self.assertAlmostEqual(self.index.mean(name, crop), expected, places=5)
+        self.assertAlmostEqual(self.index.mean("sape"), image.smape(self.method, self.reference), places=5)
+
+    def test_window_means(self):
+        means = self.index.window_means("squared", 10, 12)
+        self.assertEqual(means.shape, (39, 53))
+        self.assertAlmostEqual(means[3, 4], self.index.mean("squared", Cropbox(top=3, left=4, height=10, width=12)))
+
+    def test_custom_metric(self):
+        index = ErrorIndex(self.reference[..., 0], self.method[..., 0], { "abs": lambda a, b: np.abs(a - b) })
+        self.assertEqual(index.metrics, ["abs"])
+        self.assertAlmostEqual(index.mean("abs"), np.mean(np.abs(self.method[..., 0] - self.reference[..., 0])),
+            places=5)
+        with self.assertRaises(AssertionError):
+            index.mean("abs", Cropbox(top=40, left=0, height=10, width=10))
+
+if __name__ == "__main__":
+    unittest.main()
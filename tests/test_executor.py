@@ -0,0 +1,65 @@
+import unittest
+import os
+import tempfile
+from multiprocessing import resource_tracker, shared_memory
+from unittest import mock
+import numpy as np
+
+import figuregen
+from figuregen.tikz import TikzBackend
+from figuregen.executor import ProcessExecutor, _attach_shared_memory
+
+class TestExecutor(unittest.TestCase):
+    def _make_grid(self):
+        grid = figuregen.Grid(1, 2)
+        # One image small enough to be pickled and one large enough to go through shared memory
+        grid[0, 0].image = figuregen.PNG(np.tile([0.1, 0.4, 0.8], (8, 16, 1)))
+        grid[0, 1].image = figuregen.PNG(np.random.default_rng(1).random((512, 1024, 3)))
+        return grid
+
+    def _generate(self, **kwargs):
+        grid = self._make_grid()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "figure.tikz")
+            figuregen.figure([[grid]], 10, filename, TikzBackend(**kwargs))
+            result = {}
+            for name in sorted(os.listdir(tmpdir)):
+                with open(os.path.join(tmpdir, name), "rb") as f:
+                    result[name] = f.read()
+            return result
+
+    def test_executors_produce_same_files(self):
+        expected = self._generate()
+        self.assertEqual(len(expected), 3)
+        self.assertEqual(self._generate(executor="inline"), expected)
+
+        executor = ProcessExecutor(max_workers=2)
+        try:
+            self.assertEqual(self._generate(executor=executor), expected)
+        finally:
+            executor.shutdown()
+
+    def test_attached_memory_is_not_tracked(self):
+        shm = shared_memory.SharedMemory(create=True, size=64)
+        try:
+            with mock.patch.object(resource_tracker, "register") as register:
+                attached = _attach_shared_memory(shm.name)
+                attached.close()
+            register.assert_not_called()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_process_executor_threads(self):
+        executor = ProcessExecutor(max_workers=3)
+        try:
+            self.assertEqual(executor._thread_pool._max_workers, 3)
+        finally:
+            executor.shutdown()
+
+    def test_unknown_executor(self):
+        with self.assertRaises(ValueError):
+            TikzBackend(executor="gpu")
+
+if __name__ == "__main__":
+    unittest.main()
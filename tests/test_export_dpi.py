@@ -0,0 +1,61 @@
+import unittest
+import glob
+import os
+import tempfile
+import numpy as np
+import simpleimageio
+
+import figuregen
+from figuregen.tikz import TikzBackend
+from figuregen.util.image import resize
+
+class TestExportDpi(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _export(self, image, width_cm, **kwargs):
+        out_dir = os.path.join(self.tmpdir.name, f"out{len(os.listdir(self.tmpdir.name))}")
+        os.makedirs(out_dir)
+        grid = figuregen.Grid(1, 1)
+        grid[0, 0].image = image
+        figuregen.figure([[grid]], width_cm, os.path.join(out_dir, "figure.tikz"),
+            backend=TikzBackend(**kwargs))
+        files = glob.glob(os.path.join(out_dir, "img-*"))
+        self.assertEqual(len(files), 1)
+        return files[0]
+
+    def test_large_image_is_downsampled(self):
+        img = figuregen.PNG(np.tile([0.2, 0.5, 0.8], (200, 400, 1)))
+        filename = self._export(img, 2.54, export_dpi=100)
+        result = simpleimageio.read(filename)
+        self.assertEqual(result.shape, (50, 100, 3))
+        full = simpleimageio.read(self._export(img, 2.54))
+        np.testing.assert_allclose(result[25, 50], full[100, 200], atol=1e-3)
+
+    def test_small_image_is_not_upsampled(self):
+        img = figuregen.PNG(np.tile([0.2, 0.5, 0.8], (20, 40, 1)))
+        filename = self._export(img, 2.54, export_dpi=300)
+        self.assertEqual(simpleimageio.read(filename).shape, (20, 40, 3))
+
+    def test_source_file_is_downsampled(self):
+        source = os.path.join(self.tmpdir.name, "render.png")
+        simpleimageio.write(source, np.random.default_rng(0).random((200, 400, 3)).astype(np.float32))
+        filename = self._export(figuregen.PNG(source), 2.54, export_dpi=100, resample_filter="box")
+        self.assertEqual(simpleimageio.read(filename).shape, (50, 100, 3))
+
+    def test_unknown_filter(self):
+        with self.assertRaises(ValueError):
+            TikzBackend(resample_filter="gaussian")
+
+    def test_resize(self):
+        img = np.random.default_rng(0).random((64, 32, 3))
+        for filter in ["nearest", "box", "bilinear", "bicubic", "lanczos"]:
+            self.assertEqual(resize(img, 8, 16, filter).shape, (16, 8, 3))
+        box = resize(img[:, :, 0], 16, 32, "box")
+        np.testing.assert_allclose(box[0, 0], np.mean(img[:2, :2, 0]), rtol=1e-5)
+
+if __name__ == "__main__":
+    unittest.main()
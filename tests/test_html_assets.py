@@ -0,0 +1,68 @@
+import unittest
+import json
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+
+import figuregen
+from figuregen.html import HtmlBackend
+
+class TestHtmlAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "report.html")
+        self.grid = figuregen.Grid(1, 3)
+        self.grid[0, 0].image = figuregen.PNG(np.tile([0.1, 0.2, 0.3], (16, 32, 1)))
+        self.grid[0, 1].image = figuregen.PNG(np.tile([0.1, 0.2, 0.3], (16, 32, 1)))
+        self.grid[0, 2].image = figuregen.JPEG(np.tile([0.9, 0.2, 0.3], (16, 32, 1)))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _generate(self, **kwargs):
+        figuregen.figure([[self.grid]], 10, self.filename, backend=HtmlBackend(asset_dir="assets", **kwargs))
+        with open(self.filename) as f:
+            return f.read()
+
+    def test_images_are_referenced(self):
+        html = self._generate()
+        assets = sorted(os.listdir(os.path.join(self.tmpdir.name, "assets")))
+
+        # Identical images share one file
+        self.assertEqual(len(assets), 2)
+        self.assertEqual(sorted(os.path.splitext(a)[1] for a in assets), [".jpg", ".png"])
+        for a in assets:
+            self.assertIn(f"src='assets/{a}' loading='lazy' decoding='async'", html)
+        self.assertNotIn("base64", html)
+
+    def test_unchanged_images_keep_their_names(self):
+        self._generate()
+        before = sorted(os.listdir(os.path.join(self.tmpdir.name, "assets")))
+        self.grid[0, 2].image = figuregen.JPEG(np.tile([0.1, 0.9, 0.3], (16, 32, 1)))
+        html = self._generate()
+        after = sorted(os.listdir(os.path.join(self.tmpdir.name, "assets")))
+
+        png = [ a for a in before if a.endswith(".png") ][0]
+        self.assertIn(png, after)
+        self.assertIn(f"assets/{png}", html)
+        self.assertEqual(len(set(after) - set(before)), 1)
+
+    def test_incremental(self):
+        self._generate(incremental=True)
+        with open(os.path.join(self.tmpdir.name, ".report.html.manifest.json")) as f:
+            entries = json.load(f)["entries"]
+        for entry in entries.values():
+            self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, entry["file"])))
+
+        make_raster = figuregen.PNG.make_raster
+        with mock.patch.object(figuregen.PNG, "make_raster", autospec=True, side_effect=make_raster) as m:
+            html = self._generate(incremental=True)
+            self.assertEqual(m.call_count, 0)
+        assets = os.listdir(os.path.join(self.tmpdir.name, "assets"))
+        self.assertEqual(len(assets), 2)
+        for a in assets:
+            self.assertIn(f"src='assets/{a}'", html)
+
+if __name__ == "__main__":
+    unittest.main()
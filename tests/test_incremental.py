@@ -0,0 +1,55 @@
+import unittest
+import glob
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+
+import figuregen
+from figuregen.tikz import TikzBackend
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "figure.tikz")
+        self.grid = figuregen.Grid(1, 2)
+        self.grid[0, 0].image = figuregen.PNG(np.tile([0.1, 0.2, 0.3], (16, 32, 1)))
+        self.grid[0, 1].image = figuregen.PNG(np.tile([0.3, 0.2, 0.1], (16, 32, 1)))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _generate(self, **kwargs):
+        """ Generates the figure and returns the number of exported images """
+        make_raster = figuregen.PNG.make_raster
+        with mock.patch.object(figuregen.PNG, "make_raster", autospec=True, side_effect=make_raster) as m:
+            figuregen.figure([[self.grid]], 10, self.filename, backend=TikzBackend(**kwargs))
+            return m.call_count
+
+    def test_unchanged_elements_are_reused(self):
+        self.assertEqual(self._generate(incremental=True), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, ".figure.tikz.manifest.json")))
+
+        self.grid.set_title("top", "A new title")
+        self.assertEqual(self._generate(incremental=True), 0)
+
+        self.grid[0, 1].image = figuregen.PNG(np.tile([0.9, 0.2, 0.1], (16, 32, 1)))
+        self.assertEqual(self._generate(incremental=True), 1)
+
+        with open(self.filename) as f:
+            tikz = f.read()
+        self.assertIn("A new title", tikz)
+        self.assertEqual(len(glob.glob(os.path.join(self.tmpdir.name, "img-*.png"))), 2)
+
+    def test_deleted_files_are_exported_again(self):
+        self._generate(incremental=True)
+        for f in glob.glob(os.path.join(self.tmpdir.name, "img-*.png")):
+            os.remove(f)
+        self.assertEqual(self._generate(incremental=True), 2)
+
+    def test_disabled_by_default(self):
+        self._generate(incremental=True)
+        self.assertEqual(self._generate(), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import asyncio
+import os
+import stat
+import subprocess
+import tempfile
+from unittest import mock
+
+from figuregen.latex_compiler import LatexCompiler
+
+# Stands in for pdflatex: "-ini" runs write the format file <jobname>.fmt, other runs fail if the document
+# contains "FAIL" or if the format they load contains "stale", and write <jobname>.pdf otherwise
+FAKE_PDFLATEX = """#!/bin/sh
+for last; do true; done
+fmt=""
+for arg; do
+    case "$arg" in
+        -jobname=*) jobname="${arg#-jobname=}" ;;
+        -fmt=*) fmt="${arg#-fmt=}" ;;
+    esac
+done
+case " $* " in
+    *" -ini "*) echo fmt > "$jobname.fmt"; exit 0 ;;
+esac
+if [ -n "$fmt" ] && grep -q stale "${TEXFORMATS%%:*}/$fmt.fmt"; then exit 1; fi
+if grep -q FAIL "$last"; then exit 1; fi
+echo pdf > "${last%.tex}.pdf"
+"""
+
+DOC = "\\documentclass{article}\n\\begin{document}\n%s\n\\end{document}\n"
+
+class TestLatexCompiler(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        bin_dir = os.path.join(self.tmpdir.name, "bin")
+        os.makedirs(bin_dir)
+        script = os.path.join(bin_dir, "pdflatex")
+        with open(script, "w") as f:
+            f.write(FAKE_PDFLATEX)
+        os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+        self.path = mock.patch.dict(os.environ, { "PATH": bin_dir + os.pathsep + os.environ["PATH"] })
+        self.path.start()
+        self.compiler = LatexCompiler(os.path.join(self.tmpdir.name, "formats"))
+
+    def tearDown(self):
+        self.path.stop()
+        self.tmpdir.cleanup()
+
+    def _formats(self):
+        return [ f for f in os.listdir(self.compiler.format_dir) if f.endswith(".fmt") ]
+
+    def _make_stale(self):
+        for name in self._formats():
+            with open(os.path.join(self.compiler.format_dir, name), "w") as f:
+                f.write("stale")
+
+    def test_stale_format_is_rebuilt(self):
+        self.compiler.compile(DOC % "a", self.tmpdir.name, "a")
+        self.assertEqual(len(self._formats()), 1)
+
+        self._make_stale()
+        self.assertTrue(os.path.exists(self.compiler.compile(DOC % "b", self.tmpdir.name, "b")))
+        self.assertEqual(self._formats(), [])
+
+        self.compiler.compile(DOC % "c", self.tmpdir.name, "c")
+        self.assertEqual(len(self._formats()), 1)
+        with open(os.path.join(self.tmpdir.name, "c.tex")) as f:
+            self.assertTrue(f.readline().startswith("%&fmt-"))
+
+    def test_format_is_rebuilt_only_once(self):
+        for i in range(2):
+            self.compiler.compile(DOC % "a", self.tmpdir.name, "a")
+            self.assertEqual(len(self._formats()), 1)
+            self._make_stale()
+            self.compiler.compile(DOC % "b", self.tmpdir.name, "b")
+        self.compiler.compile(DOC % "c", self.tmpdir.name, "c")
+        self.assertEqual(self._formats(), [])
+        with open(os.path.join(self.tmpdir.name, "c.tex")) as f:
+            self.assertFalse(f.readline().startswith("%&"))
+
+    def test_async(self):
+        asyncio.run(self.compiler.compile_async(DOC % "a", self.tmpdir.name, "a"))
+        self._make_stale()
+        pdf = asyncio.run(self.compiler.compile_async(DOC % "b", self.tmpdir.name, "b"))
+        self.assertTrue(os.path.exists(pdf))
+        self.assertEqual(self._formats(), [])
+
+    def test_document_errors_are_raised(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.compiler.compile(DOC % "FAIL", self.tmpdir.name, "bad")
+        with self.assertRaises(subprocess.CalledProcessError):
+            asyncio.run(self.compiler.compile_async(DOC % "FAIL", self.tmpdir.name, "bad"))
+        self.assertEqual(len(self._formats()), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import simpleimageio
+
+import figuregen
+from figuregen.image_header import read_size
+
+class TestLazyRasterImage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(1)
+        self.img = rng.random((21, 34, 3)).astype(np.float32)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, name, img=None):
+        filename = os.path.join(self.tmpdir.name, name)
+        simpleimageio.write(filename, self.img if img is None else img)
+        return filename
+
+    def test_read_size(self):
+        for ext in [".png", ".jpg", ".exr", ".pfm"]:
+            self.assertEqual(read_size(self._write("img" + ext)), (34, 21), ext)
+
+    def test_read_size_of_unsupported_or_invalid_file(self):
+        filename = os.path.join(self.tmpdir.name, "broken.png")
+        with open(filename, "wb") as f:
+            f.write(b"not an image")
+        self.assertIsNone(read_size(filename))
+        self.assertIsNone(read_size(os.path.join(self.tmpdir.name, "img.bmp")))
+
+    def test_lazy_image_is_not_decoded(self):
+        img = figuregen.PNG(self._write("img.exr"), lazy=True)
+        self.assertFalse(img.is_loaded)
+        self.assertEqual((img.width_px, img.height_px), (34, 21))
+        self.assertAlmostEqual(img.aspect_ratio, 21 / 34)
+
+    def test_lazy_export_matches_eager_export(self):
+        filename = self._write("img.exr")
+        eager = figuregen.PNG(filename).make_raster(10, 10, os.path.join(self.tmpdir.name, "eager"))
+        lazy_img = figuregen.PNG(filename, lazy=True)
+        lazy = lazy_img.make_raster(10, 10, os.path.join(self.tmpdir.name, "lazy"))
+        self.assertFalse(lazy_img.is_loaded)
+        np.testing.assert_array_equal(simpleimageio.read(eager), simpleimageio.read(lazy))
+
+    def test_matching_format_is_copied(self):
+        for cls, ext in [(figuregen.PNG, ".png"), (figuregen.JPEG, ".jpg")]:
+            filename = self._write("img" + ext)
+            out = cls(filename, lazy=True).make_raster(10, 10, os.path.join(self.tmpdir.name, "out"))
+            with open(filename, "rb") as a, open(out, "rb") as b:
+                self.assertEqual(a.read(), b.read(), ext)
+
+    def test_content_hash_follows_file(self):
+        filename = self._write("img.png")
+        h = figuregen.PNG(filename, lazy=True).content_hash()
+        self.assertEqual(h, figuregen.PNG(filename, lazy=True).content_hash())
+        self._write("img.png", self.img[::-1])
+        self.assertNotEqual(h, figuregen.PNG(filename, lazy=True).content_hash())
+
+    def test_unsupported_format_is_read_immediately(self):
+        filename = self._write("img.hdr")
+        img = figuregen.PNG(filename, lazy=True)
+        self.assertTrue(img.is_loaded)
+        self.assertEqual(img.raw.shape, (21, 34, 3))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import simpleimageio
+
+import figuregen
+from figuregen.tikz import TikzBackend
+from figuregen.executor import ProcessExecutor, _memmap_location
+from figuregen.util.image import Cropbox
+from figuregen.util.templates import CropComparison
+
+class TestMemmap(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.pixels = np.random.default_rng(2).random((256, 512, 3)).astype(np.float32)
+        np.save(os.path.join(self.tmpdir.name, "image.npy"), self.pixels)
+        self.mapped = np.load(os.path.join(self.tmpdir.name, "image.npy"), mmap_mode="r")
+
+    def tearDown(self):
+        del self.mapped
+        self.tmpdir.cleanup()
+
+    def test_stored_without_copy(self):
+        crop = Cropbox(top=10, left=20, height=30, width=40, scale=3)
+        img = figuregen.PNG(crop.view(self.mapped))
+        self.assertTrue(np.shares_memory(img.source, self.mapped))
+        self.assertEqual(img.raw.shape, (30, 40, 3))
+
+        img.scale = crop.scale
+        self.assertEqual((img.width_px, img.height_px), (120, 90))
+        np.testing.assert_array_equal(img.raw, crop.crop(self.mapped))
+
+    def test_magnified_data_is_kept(self):
+        img = figuregen.PNG(self.pixels[:8, :8].copy())
+        img.scale = 4
+        self.assertIs(img.raw, img.raw)
+        img.raw[0, 0] = 0
+        np.testing.assert_array_equal(simpleimageio.srgb_to_lin(img.raw)[0, 0], img._linear()[0, 0])
+        img.scale = 2
+        self.assertEqual(img.raw.shape, (16, 16, 3))
+
+    def test_content_hash_ignores_magnified_data(self):
+        img = figuregen.PNG(self.pixels[:8, :8].copy())
+        img.scale = 4
+        key = img.content_hash()
+        img.raw
+        self.assertEqual(img.content_hash(), key)
+        img.scale = 2
+        self.assertNotEqual(img.content_hash(), key)
+
+    def test_memmap_location(self):
+        filename, offset = _memmap_location(self.mapped[10:20, 5:])
+        self.assertEqual(os.path.abspath(filename), os.path.join(self.tmpdir.name, "image.npy"))
+        self.assertEqual(offset, self.mapped.offset + (10 * 512 + 5) * 3 * 4)
+        self.assertIsNone(_memmap_location(self.pixels))
+        self.assertIsNone(_memmap_location(self.mapped[::-1]))
+
+    def test_crops_are_magnified_on_export(self):
+        crops = [ Cropbox(top=10, left=20, height=30, width=40, scale=3) ]
+        template = CropComparison(self.mapped, [self.mapped * 0.5], crops)
+        elem = template.figure_row[1][0, 1].image
+        self.assertEqual(elem.scale, 3)
+        self.assertEqual((elem.width_px, elem.height_px), (120, 90))
+        expected = simpleimageio.relative_mse(crops[0].crop(self.mapped * 0.5), crops[0].crop(self.mapped))
+        self.assertAlmostEqual(template.crop_errors[0][0], expected, places=5)
+
+        filename = os.path.join(self.tmpdir.name, "figure.tikz")
+        figuregen.figure([template.figure_row], 15, filename, TikzBackend())
+        crop = simpleimageio.read(os.path.join(self.tmpdir.name, "img-fig0-grid1-row0-col1.jpg"))
+        self.assertEqual(crop.shape[:2], (90, 120))
+
+    def test_process_executor_maps_file(self):
+        grid = figuregen.Grid(1, 1)
+        grid[0, 0].image = figuregen.PNG(self.mapped[16:144, 32:288])
+        executor = ProcessExecutor(max_workers=1, shared_memory_threshold_mb=0)
+        try:
+            figuregen.figure([[grid]], 10, os.path.join(self.tmpdir.name, "figure.tikz"),
+                TikzBackend(executor=executor))
+        finally:
+            executor.shutdown()
+
+        result = simpleimageio.read(os.path.join(self.tmpdir.name, "img-fig0-grid0-row0-col0.png"))
+        expected = simpleimageio.srgb_to_lin(self.pixels[16:144, 32:288])
+        np.testing.assert_allclose(result, expected, atol=1e-2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from pypdf import PdfReader
+
+import figuregen
+from figuregen import NativePdfBackend
+
+class TestNativePdf(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "figure.pdf")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _grid(self, images):
+        grid = figuregen.Grid(1, len(images))
+        for i, img in enumerate(images):
+            grid[0, i].image = img
+            grid[0, i].set_frame(1, [255, 0, 0])
+        grid.set_title("top", "Title (1)")
+        grid.set_row_titles("left", ["Row"])
+        return grid
+
+    def test_images_and_text(self):
+        grid = self._grid([
+            figuregen.PNG(np.tile([0.1, 0.2, 0.3], (16, 32, 1))),
+            figuregen.JPEG(np.tile([0.3, 0.2, 0.1], (16, 32, 1))),
+        ])
+        figuregen.figure([[grid]], 10, self.filename, backend=NativePdfBackend())
+
+        page = PdfReader(self.filename).pages[0]
+        self.assertAlmostEqual(float(page.mediabox.width), 100 / 25.4 * 72, places=2)
+
+        xobjects = [ x.get_object() for x in page["/Resources"]["/XObject"].values() ]
+        self.assertEqual(sorted(x["/Filter"] for x in xobjects), ["/DCTDecode", "/FlateDecode"])
+        self.assertEqual(xobjects[0]["/Width"], 32)
+
+        font = page["/Resources"]["/Font"]["/F1"].get_object()
+        self.assertEqual(font["/Encoding"], "/Identity-H")
+        descendant = font["/DescendantFonts"][0].get_object()
+        self.assertIn("/FontFile2", descendant["/FontDescriptor"].get_object())
+        text = page.extract_text()
+        self.assertIn("Title (1)", text)
+        self.assertIn("Row", text)
+
+    def test_unicode_text(self):
+        grid = self._grid([ figuregen.PNG(np.tile([0.1, 0.2, 0.3], (16, 32, 1))) ])
+        grid.set_title("top", "α → β, Ünïcode")
+        figuregen.figure([[grid]], 10, self.filename, backend=NativePdfBackend())
+        self.assertIn("α → β, Ünïcode", PdfReader(self.filename).pages[0].extract_text())
+
+    def test_pdf_elements_stay_vector(self):
+        # Reuse the output of the first figure as a vector element of the second one
+        grid = self._grid([ figuregen.PNG(np.tile([0.1, 0.2, 0.3], (16, 32, 1))) ])
+        figuregen.figure([[grid]], 10, self.filename, backend=NativePdfBackend())
+
+        nested = os.path.join(self.tmpdir.name, "nested.pdf")
+        figuregen.figure([[self._grid([ figuregen.PDF(self.filename) ])]], 10, nested, backend=NativePdfBackend())
+
+        page = PdfReader(nested).pages[0]
+        form = list(page["/Resources"]["/XObject"].values())[0].get_object()
+        self.assertEqual(form["/Subtype"], "/Form")
+        self.assertIn("/XObject", form["/Resources"])
+        self.assertIn("Title (1)", page.extract_text())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+import numpy as np
+
+import figuregen
+from figuregen.figuregen import _backend_from_filename
+from figuregen.svg import NativeSvgBackend, SvgBackend
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+class TestNativeSvg(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.grid = figuregen.Grid(1, 2)
+        self.grid[0, 0].image = figuregen.PNG(np.tile([0.1, 0.2, 0.3], (16, 32, 1)))
+        self.grid[0, 1].image = figuregen.JPEG(np.tile([0.3, 0.2, 0.1], (16, 32, 1)))
+        self.grid[0, 0].set_frame(1, [255, 0, 0])
+        self.grid[0, 1].set_marker(pos=[4, 4], size=[8, 8], color=[0, 255, 0], is_dashed=True)
+        self.grid.set_title("top", "A & B")
+        self.grid.set_row_titles("left", ["Row"])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _generate(self, **kwargs) -> ET.Element:
+        filename = os.path.join(self.tmpdir.name, "figure.svg")
+        figuregen.figure([[self.grid]], 10, filename, backend=NativeSvgBackend(**kwargs))
+        return ET.parse(filename).getroot()
+
+    def test_embedded(self):
+        root = self._generate()
+        self.assertEqual(root.get("width"), "100.000mm")
+
+        images = root.findall(SVG + "image")
+        self.assertEqual(len(images), 2)
+        self.assertTrue(images[0].get("href").startswith("data:image/png;base64,"))
+        self.assertTrue(images[1].get("href").startswith("data:image/jpeg;base64,"))
+        self.assertEqual(os.listdir(self.tmpdir.name), ["figure.svg"])
+
+        texts = { t.get("id"): "".join(t.itertext()) for t in root.iter(SVG + "text") }
+        self.assertEqual(texts["title-north-fig0-grid0"], "A & B")
+        self.assertIn("rotate(-90", root.find(f".//{SVG}text[@id='rowtitle-west-fig0-grid0-row0']").get("transform"))
+
+        rects = [ r for r in root.iter(SVG + "rect") if r.get("stroke-dasharray") is not None ]
+        self.assertEqual(len(rects), 1)
+
+    def test_external_images(self):
+        root = self._generate(embed_images=False)
+        hrefs = sorted(i.get("href") for i in root.findall(SVG + "image"))
+        self.assertEqual(hrefs, ["img-fig0-grid0-row0-col0.png", "img-fig0-grid0-row0-col1.jpg"])
+        for href in hrefs:
+            self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, href)))
+
+    def test_opt_in(self):
+        # The typst-based backend stays the default for .svg
+        self.assertNotIsInstance(_backend_from_filename("figure.svg"), NativeSvgBackend)
+        self.assertIsInstance(_backend_from_filename("figure.svg"), SvgBackend)
+
+if __name__ == "__main__":
+    unittest.main()
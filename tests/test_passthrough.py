@@ -0,0 +1,92 @@
+import unittest
+import base64
+import glob
+import os
+import tempfile
+import numpy as np
+import simpleimageio
+
+import figuregen
+from figuregen.cache import RenderCache
+
+class TestPassthrough(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(3)
+        self.png = os.path.join(self.tmpdir.name, "render.png")
+        self.jpg = os.path.join(self.tmpdir.name, "render.jpg")
+        simpleimageio.write(self.png, rng.random((12, 20, 3)).astype(np.float32))
+        simpleimageio.write(self.jpg, rng.random((12, 20, 3)).astype(np.float32))
+        self.out_dir = os.path.join(self.tmpdir.name, "out")
+        os.makedirs(self.out_dir)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _read(self, filename):
+        with open(filename, "rb") as f:
+            return f.read()
+
+    def test_matching_files_are_not_decoded(self):
+        self.assertTrue(figuregen.PNG(self.png).can_passthrough())
+        self.assertTrue(figuregen.JPEG(self.jpg).can_passthrough())
+        self.assertFalse(figuregen.PNG(self.jpg).can_passthrough())
+        self.assertFalse(figuregen.PNG(self.png, lazy=False).can_passthrough())
+
+    def test_assigning_raw_disables_passthrough(self):
+        img = figuregen.PNG(self.png)
+        img.raw = img.raw * 0.5
+        self.assertFalse(img.can_passthrough())
+        filename = img.make_raster(10, 10, os.path.join(self.out_dir, "half"))
+        self.assertNotEqual(self._read(filename), self._read(self.png))
+
+    def test_modifying_raw_in_place(self):
+        img = figuregen.PNG(self.png)
+        img.raw *= 0.5
+        img.raw[0, 0] = 1
+        self.assertFalse(img.can_passthrough())
+        filename = img.make_raster(10, 10, os.path.join(self.out_dir, "half"))
+        self.assertAlmostEqual(float(simpleimageio.lin_to_srgb(simpleimageio.read(filename))[0, 0, 0]), 1, places=2)
+        self.assertNotEqual(self._read(filename), self._read(self.png))
+
+    def test_jpeg_quality_is_applied(self):
+        self.assertFalse(figuregen.JPEG(self.jpg, quality=20).can_passthrough())
+        filename = figuregen.JPEG(self.jpg, quality=20).make_raster(10, 10, os.path.join(self.out_dir, "low"))
+        self.assertNotEqual(self._read(filename), self._read(self.jpg))
+
+    def test_hardlink(self):
+        filename = figuregen.PNG(self.png, hardlink=True).make_raster(10, 10, os.path.join(self.out_dir, "a"))
+        self.assertTrue(os.path.samefile(filename, self.png))
+        filename = figuregen.PNG(self.png).make_raster(10, 10, os.path.join(self.out_dir, "b"))
+        self.assertFalse(os.path.samefile(filename, self.png))
+        self.assertEqual(self._read(filename), self._read(self.png))
+
+    def test_html_embeds_original_bytes(self):
+        grid = figuregen.Grid(1, 2)
+        grid[0, 0].image = figuregen.PNG(self.png)
+        grid[0, 1].image = figuregen.JPEG(self.jpg)
+        filename = os.path.join(self.out_dir, "figure.html")
+        cache = RenderCache(os.path.join(self.tmpdir.name, "cache"))
+        figuregen.figure([[grid]], 10, filename, backend=figuregen.HtmlBackend(render_cache=cache))
+
+        with open(filename) as f:
+            html = f.read()
+        self.assertIn("data:image/png;base64," + base64.b64encode(self._read(self.png)).decode("utf-8"), html)
+        self.assertIn("data:image/jpeg;base64," + base64.b64encode(self._read(self.jpg)).decode("utf-8"), html)
+        self.assertEqual(cache.stats.num_entries, 0)
+
+    def test_tikz_copies_original_files(self):
+        grid = figuregen.Grid(1, 2)
+        grid[0, 0].image = figuregen.PNG(self.png)
+        grid[0, 1].image = figuregen.JPEG(self.jpg)
+        figuregen.figure([[grid]], 10, os.path.join(self.out_dir, "figure.tikz"))
+
+        pngs = glob.glob(os.path.join(self.out_dir, "*.png"))
+        jpgs = glob.glob(os.path.join(self.out_dir, "*.jpg"))
+        self.assertEqual(len(pngs), 1)
+        self.assertEqual(len(jpgs), 1)
+        self.assertEqual(self._read(pngs[0]), self._read(self.png))
+        self.assertEqual(self._read(jpgs[0]), self._read(self.jpg))
+
+if __name__ == "__main__":
+    unittest.main()
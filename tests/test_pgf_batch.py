@@ -0,0 +1,115 @@
+import unittest
+from unittest import mock
+import os
+import shutil
+import tempfile
+
+import figuregen
+import figuregen.tikz
+from figuregen.tikz import TikzBackend
+from figuregen.cache import RenderCache
+
+def fake_batch(batches):
+    def make_pdf_batch(plots, filename):
+        batches.append(plots)
+        with open(filename + ".pdf", "w") as f:
+            f.write(str(len(batches)))
+        return filename + ".pdf"
+    return make_pdf_batch
+
+class TestPgfBatch(unittest.TestCase):
+    def _make_grid(self, changed=0):
+        grid = figuregen.Grid(1, 3)
+        for col in range(3):
+            offset = changed if col == 1 else 0
+            grid[0, col].image = figuregen.PgfLinePlot(0.5, [[[0, 1, 2], [col, col + 1 + offset, col * 2]]])
+        return grid
+
+    def test_one_compilation_per_figure(self):
+        batches = []
+
+        with tempfile.TemporaryDirectory() as tmpdir, \
+             mock.patch.object(figuregen.tikz, "make_pdf_batch", fake_batch(batches)):
+            filename = os.path.join(tmpdir, "figure.tikz")
+            figuregen.figure([[self._make_grid()]], 10, filename, TikzBackend())
+            with open(filename) as f:
+                tikz = f.read()
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(len(batches[0]), 3)
+        for page in range(1, 4):
+            self.assertIn(f"\\makeimagenode[page={page}]", tikz)
+        self.assertIn("img-pgfplots0.pdf", tikz)
+
+    def test_failed_figure_does_not_leak_plots(self):
+        batches = []
+
+        backend = TikzBackend()
+        with tempfile.TemporaryDirectory() as tmpdir, \
+             mock.patch.object(figuregen.tikz, "make_pdf_batch", fake_batch(batches)):
+            filename = os.path.join(tmpdir, "figure.tikz")
+            with mock.patch.object(TikzBackend, "combine_grids", side_effect=RuntimeError("layout failed")):
+                with self.assertRaises(RuntimeError):
+                    figuregen.figure([[self._make_grid()]], 10, filename, backend)
+            figuregen.figure([[self._make_grid()]], 10, filename, backend)
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(len(batches[0]), 3)
+
+    def test_batch_document_has_one_page_per_plot(self):
+        plots = [ figuregen.PgfLinePlot(0.5, [[[0, 1], [0, 1]]]) for _ in range(2) ]
+        with mock.patch.object(figuregen.PgfLinePlot, "_compile_tex") as compile_tex:
+            figuregen.pgf_lineplot.make_pdf_batch([(p, 30, 15) for p in plots], "plots")
+        tex = compile_tex.call_args[0][0]
+        self.assertEqual(tex.count("\\shipout"), 2)
+        self.assertEqual(tex.count("\\begin{tikzpicture}"), 2)
+        self.assertEqual(tex.count("\\documentclass"), 1)
+        self.assertNotIn("\\geometry{", tex)
+
+    def _build_twice(self, tmpdir, **backend_options):
+        batches = []
+        filename = os.path.join(tmpdir, "figure.tikz")
+        with mock.patch.object(figuregen.tikz, "make_pdf_batch", fake_batch(batches)):
+            figuregen.figure([[self._make_grid()]], 10, filename, TikzBackend(**backend_options))
+            figuregen.figure([[self._make_grid(changed=1)]], 10, filename, TikzBackend(**backend_options))
+        with open(filename) as f:
+            return batches, f.read()
+
+    def _check_only_changed_plot_is_compiled(self, batches, tikz):
+        self.assertEqual([len(b) for b in batches], [3, 1])
+        # The unchanged plots still use their pages of the first batch
+        self.assertEqual(tikz.count("\\makeimagenode[page=1]"), 2)
+        self.assertIn("\\makeimagenode[page=3]", tikz)
+        self.assertEqual(len({ line.split("img-pgfplots-")[1][:16] for line in tikz.splitlines()
+            if "img-pgfplots-" in line }), 2)
+
+    def test_changed_plot_is_compiled_alone(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = RenderCache(os.path.join(tmpdir, "cache"))
+            os.makedirs(os.path.join(tmpdir, "out"))
+            batches, tikz = self._build_twice(os.path.join(tmpdir, "out"), render_cache=cache)
+        self._check_only_changed_plot_is_compiled(batches, tikz)
+
+    def test_changed_plot_is_compiled_alone_incremental(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            batches, tikz = self._build_twice(tmpdir, incremental=True)
+        self._check_only_changed_plot_is_compiled(batches, tikz)
+
+    @unittest.skipIf(shutil.which("pdflatex") is None, "pdflatex is not installed")
+    def test_pdflatex(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = RenderCache(os.path.join(tmpdir, "cache"))
+            filename = os.path.join(tmpdir, "figure.tikz")
+            figuregen.figure([[self._make_grid()]], 10, filename, TikzBackend(render_cache=cache))
+            figuregen.figure([[self._make_grid(changed=1)]], 10, filename, TikzBackend(render_cache=cache))
+            with open(filename) as f:
+                tikz = f.read()
+            pdfs = { line.split("{\\detokenize{")[1].split("}")[0] for line in tikz.splitlines()
+                if "img-pgfplots-" in line }
+            self.assertEqual(len(pdfs), 2)
+            for pdf in pdfs:
+                with open(os.path.join(tmpdir, pdf), "rb") as f:
+                    self.assertTrue(f.read().startswith(b"%PDF"))
+
+if __name__ == "__main__":
+    unittest.main()
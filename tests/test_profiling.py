@@ -0,0 +1,69 @@
+import unittest
+import json
+import os
+import tempfile
+import numpy as np
+
+import figuregen
+from figuregen.cache import RenderCache
+from figuregen.html import HtmlBackend
+from figuregen.tikz import TikzBackend
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.grid = figuregen.Grid(1, 2)
+        self.grid[0, 0].image = figuregen.PNG(np.tile([0.1, 0.2, 0.3], (16, 32, 1)))
+        self.grid[0, 1].image = figuregen.PNG(np.tile([0.3, 0.2, 0.1], (16, 32, 1)))
+        self.grid.set_title("top", "Title")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_stages_and_elements(self):
+        profiler = figuregen.Profiler()
+        filename = os.path.join(self.tmpdir.name, "figure.tikz")
+        figuregen.figure([[self.grid]], 10, filename, backend=TikzBackend(profiler=profiler))
+
+        report = profiler.report()
+        stages = report.by_stage()
+        for stage in ["layout", "gen_grid", "assemble_grid", "combine_grids", "combine_rows", "write_to_file", "export"]:
+            self.assertIn(stage, stages)
+
+        exports = sorted(e.name for e in report.events if e.stage == "export")
+        self.assertEqual(exports, ["fig0-grid0-row0-col0", "fig0-grid0-row0-col1"])
+        for e in report.events:
+            if e.stage == "export":
+                self.assertGreater(e.bytes_written, 0)
+                self.assertIsNone(e.cache_hit)
+
+        write = report.slowest("write_to_file", 1)[0]
+        self.assertEqual(write.bytes_written, os.path.getsize(filename))
+        self.assertIn("export", str(report))
+
+    def test_cache_hits(self):
+        profiler = figuregen.Profiler()
+        cache = RenderCache(os.path.join(self.tmpdir.name, "cache"))
+        for i in range(2):
+            filename = os.path.join(self.tmpdir.name, f"figure{i}.html")
+            figuregen.figure([[self.grid]], 10, filename, backend=HtmlBackend(render_cache=cache, profiler=profiler))
+
+        report = profiler.report()
+        self.assertEqual(report.cache_misses, 2)
+        self.assertEqual(report.cache_hits, 2)
+
+    def test_chrome_trace(self):
+        profiler = figuregen.Profiler()
+        figuregen.figure([[self.grid]], 10, os.path.join(self.tmpdir.name, "figure.typ"),
+            backend=figuregen.typst.TypstBackend(profiler=profiler))
+
+        trace_file = os.path.join(self.tmpdir.name, "trace.json")
+        profiler.write_chrome_trace(trace_file)
+        with open(trace_file) as f:
+            trace = json.load(f)["traceEvents"]
+        self.assertEqual(len(trace), len(profiler.report().events))
+        self.assertTrue(all(e["ph"] == "X" and e["dur"] >= 0 for e in trace))
+        self.assertIn("fig0-grid0-row0-col1", [e["name"] for e in trace])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import simpleimageio
+
+import figuregen
+from figuregen.raster import RasterBackend
+
+class TestRasterBackend(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _read(self, filename):
+        return simpleimageio.lin_to_srgb(simpleimageio.read(filename))
+
+    def test_image_placement(self):
+        grid = figuregen.Grid(1, 2)
+        grid[0, 0].image = figuregen.PNG(np.tile([1.0, 0.0, 0.0], (10, 20, 1)))
+        grid[0, 1].image = figuregen.PNG(np.tile([0.0, 0.0, 1.0], (10, 20, 1)))
+        grid.layout.set_padding(column=0)
+
+        filename = os.path.join(self.tmpdir.name, "figure.png")
+        figuregen.figure([[grid]], 2.54, filename, backend=RasterBackend(dpi=200))
+
+        img = self._read(filename)
+        self.assertEqual(img.shape[:2], (50, 200))
+        np.testing.assert_allclose(img[25, 50], [1, 0, 0], atol=0.01)
+        np.testing.assert_allclose(img[25, 150], [0, 0, 1], atol=0.01)
+
+    def test_text_frame_and_markers(self):
+        grid = figuregen.Grid(1, 1)
+        grid[0, 0].image = figuregen.PNG(np.full((32, 64, 3), 0.5))
+        grid[0, 0].set_frame(2, [255, 0, 0])
+        grid[0, 0].set_marker(pos=[16, 8], size=[32, 16], color=[0, 255, 0], linewidth_pt=2)
+        grid.set_title("top", "Title")
+        grid.layout.titles[figuregen.TOP].size = 5
+
+        filename = os.path.join(self.tmpdir.name, "figure.png")
+        figuregen.figure([[grid]], 5, filename, backend=RasterBackend(dpi=150))
+        img = self._read(filename)
+
+        px_per_mm = 150 / 25.4
+        title = img[:round(5 * px_per_mm)]
+        self.assertLess(title.min(), 0.2) # black text on white
+        self.assertAlmostEqual(title[0, 0, 0], 1, places=2)
+
+        image_top = round(5 * px_per_mm)
+        np.testing.assert_allclose(img[image_top + 1, 10], [1, 0, 0], atol=0.01)
+        marker_top = image_top + round(8 / 32 * (img.shape[0] - image_top))
+        self.assertGreater(img[marker_top, img.shape[1] // 2, 1], 0.9)
+
+    def test_formats(self):
+        grid = figuregen.Grid(1, 1)
+        grid[0, 0].image = figuregen.PNG(np.full((16, 16, 3), 0.25))
+        for ext in ["jpg", "exr"]:
+            filename = os.path.join(self.tmpdir.name, "figure." + ext)
+            figuregen.figure([[grid]], 2, filename)
+            img = self._read(filename)
+            self.assertAlmostEqual(float(np.mean(img)), 0.25, delta=0.02)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import numpy as np
+
+from figuregen.util.image import SplitImage
+
+def reference_split(list_img, weights, tan_degree, vertical):
+    """ The original per-row / per-column loop, used as ground truth """
+    height, width = list_img[0].shape[:2]
+    result = np.zeros((height, width, 3))
+    start_pos, end_pos = [], []
+    length, num_lines = (width, height) if vertical else (height, width)
+    cur_pos = 0
+    for i in range(len(list_img)):
+        for line in range(num_lines):
+            offset = tan_degree * (float(num_lines) * 0.5 - line)
+            start = 0 if i == 0 else int(cur_pos + offset)
+            end = length if i == len(list_img) - 1 else int(cur_pos + weights[i] * length + offset)
+            start = max(0, start)
+            end = min(length, end)
+            if vertical:
+                result[line, start:end] = list_img[i][line, start:end]
+            else:
+                result[start:end, line] = list_img[i][start:end, line]
+                if line == 0 and start != 0.:
+                    start_pos.append((start, line))
+                if line == num_lines - 1 and end != length:
+                    end_pos.append((end, line))
+        cur_pos += weights[i] * length
+    return result, start_pos, end_pos
+
+def reference_antialiased(list_img, weights, tan_degree, vertical):
+    """ Weights every pixel of every image by the fraction of the pixel it covers """
+    height, width = list_img[0].shape[:2]
+    length, num_lines = (width, height) if vertical else (height, width)
+    offsets = tan_degree * (float(num_lines) * 0.5 - np.arange(num_lines))
+    pixels = np.arange(length)
+    beyond = [np.ones((num_lines, length))]
+    cur_pos = 0
+    for w in weights[:-1]:
+        cur_pos += w * length
+        beyond.append(np.clip(pixels[None, :] + 1 - (cur_pos + offsets)[:, None], 0, 1))
+    beyond.append(np.zeros((num_lines, length)))
+    result = 0
+    for i, img in enumerate(list_img):
+        coverage = beyond[i] - beyond[i + 1]
+        result = result + (coverage if vertical else coverage.T)[..., None] * img
+    return result
+
+class TestSplitImage(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.images = [ rng.random((37, 53, 3)) for _ in range(3) ]
+
+    def test_matches_reference(self):
+        for vertical in [True, False]:
+            for degree in [-45, -20, 0, 7, 15, 45, 60]:
+                for weights in [None, [1.0, 1.0, 1.0], [0.1, 3.0, 0.5]]:
+                    w = None if weights is None else np.array(weights)
+                    split = SplitImage(self.images, vertical, degree, w)
+                    expected, start_pos, end_pos = reference_split(self.images, split.get_weights(),
+                        split.tan_degree_rad, vertical)
+                    msg = f"vertical={vertical}, degree={degree}, weights={weights}"
+                    np.testing.assert_array_equal(split.get_image(), expected, msg)
+                    self.assertEqual(split.start_pos, start_pos, msg)
+                    self.assertEqual(split.end_pos, end_pos, msg)
+
+    def test_antialias_blends_only_along_boundaries(self):
+        hard = SplitImage(self.images, True, 15, np.array([1.0, 1.0, 1.0]))
+        smooth = SplitImage(self.images, True, 15, np.array([1.0, 1.0, 1.0]), antialias=True)
+        differs = np.any(hard.get_image() != smooth.get_image(), axis=2)
+        # At most one blended pixel per row and boundary
+        self.assertLessEqual(np.max(np.sum(differs, axis=1)), 2)
+        self.assertGreater(np.sum(differs), 0)
+
+    def test_antialias_matches_reference(self):
+        for vertical in [True, False]:
+            for degree in [-30, 0, 15, 45]:
+                split = SplitImage(self.images, vertical, degree, np.array([0.2, 1.0, 0.01]), antialias=True)
+                expected = reference_antialiased(self.images, split.get_weights(), split.tan_degree_rad, vertical)
+                np.testing.assert_allclose(split.get_image(), expected, atol=1e-12,
+                    err_msg=f"vertical={vertical}, degree={degree}")
+
+    def test_antialias_of_identical_images(self):
+        img = self.images[0]
+        split = SplitImage([img, img], False, 10, antialias=True)
+        np.testing.assert_allclose(split.get_image(), img)
+
+if __name__ == "__main__":
+    unittest.main()
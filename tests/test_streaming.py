@@ -0,0 +1,39 @@
+import unittest
+import time
+
+from figuregen.backend import Backend
+
+class TestStreaming(unittest.TestCase):
+    def test_order_is_preserved(self):
+        backend = Backend(executor="thread", max_workers=4)
+
+        def slow(text, seconds):
+            time.sleep(seconds)
+            return text
+
+        data = [
+            ["a", backend._executor.submit(slow, "b", 0.05), lambda: slow("c", 0.02)],
+            [lambda: slow("d", 0.0), "e"],
+        ]
+        self.assertEqual("".join(backend._stream_lines(data, 2)), "a\nb\nc\nd\ne\n")
+        self.assertEqual(data, [])
+
+    def test_lookahead_bounds_pending_results(self):
+        backend = Backend(executor="inline")
+        started = []
+
+        def task(i):
+            started.append(i)
+            return str(i)
+
+        data = [[ "title" ] + [ (lambda i=i: task(i)) for i in range(10) ]]
+        stream = backend._stream_lines(data, 3)
+        self.assertEqual(next(stream), "title\n")
+        self.assertEqual(len(started), 3)
+        for i in range(10):
+            self.assertEqual(next(stream), f"{i}\n")
+            self.assertLessEqual(len(started), i + 4)
+        self.assertEqual(started, list(range(10)))
+
+if __name__ == "__main__":
+    unittest.main()
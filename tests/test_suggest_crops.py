@@ -0,0 +1,40 @@
+import unittest
+import numpy as np
+
+from figuregen.util.image import Cropbox, suggest_crops
+
+def overlap(a: Cropbox, b: Cropbox) -> bool:
+    return a.top < b.bottom and b.top < a.bottom and a.left < b.right and b.left < a.right
+
+class TestSuggestCrops(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.reference = rng.random((600, 900, 3)).astype(np.float32) + 0.5
+        self.methods = [ self.reference + rng.normal(0, 0.01, self.reference.shape).astype(np.float32)
+            for _ in range(2) ]
+        self.methods[1][300:340, 600:660] += 1
+        self.methods[0][50:80, 100:150] += 0.5
+
+    def test_finds_differences(self):
+        crops = suggest_crops(self.reference, self.methods, 40, 60, num_crops=2, scale=4, max_coarse_size=128)
+        self.assertEqual(len(crops), 2)
+        self.assertEqual((crops[0].top, crops[0].left), (300, 600))
+        self.assertEqual(crops[0].scale, 4)
+        self.assertTrue(overlap(crops[1], Cropbox(top=50, left=100, height=30, width=50)))
+
+    def test_no_overlap(self):
+        crops = suggest_crops(self.reference, self.methods, 200, 300, num_crops=20, metric="squared")
+        # At most 3 x 3 crops fit, greedy placement may leave gaps that are too small for another one
+        self.assertTrue(2 <= len(crops) <= 9)
+        for i, a in enumerate(crops):
+            self.assertTrue(0 <= a.top <= 400 and 0 <= a.left <= 600)
+            for b in crops[i + 1:]:
+                self.assertFalse(overlap(a, b))
+
+    def test_single_method(self):
+        crops = suggest_crops(self.reference[..., 0], [self.methods[1][..., 0]], 20, 20, num_crops=1,
+            metric=lambda img, ref: np.abs(img - ref))
+        self.assertTrue(overlap(crops[0], Cropbox(top=300, left=600, height=40, width=60)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+import simpleimageio
+
+from figuregen.util.image import Cropbox
+from figuregen.util.templates import CropComparison, FullSizeWithCrops
+
+class TestTemplateErrors(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.reference = rng.random((64, 96, 3)).astype(np.float32)
+        self.methods = [ self.reference + rng.normal(0, s, self.reference.shape).astype(np.float32)
+            for s in [0.1, 0.2, 0.4] ]
+        self.crops = [ Cropbox(top=4, left=8, height=16, width=24, scale=2),
+            Cropbox(top=30, left=50, height=20, width=40, scale=2) ]
+
+    def test_matches_relative_mse(self):
+        cmp = CropComparison(self.reference, self.methods, self.crops)
+        for i, m in enumerate(self.methods):
+            self.assertAlmostEqual(cmp.errors[i], simpleimageio.relative_mse(m, self.reference), places=4)
+            for j, crop in enumerate(self.crops):
+                expected = simpleimageio.relative_mse(crop.crop(m), crop.crop(self.reference))
+                self.assertAlmostEqual(cmp.crop_errors[j][i], expected, places=4)
+
+        serial = FullSizeWithCrops(self.reference, self.methods, self.crops, method_names=["a"] * 4,
+            max_workers=1)
+        self.assertEqual(serial.errors, cmp.errors)
+        self.assertEqual(serial.crop_errors, cmp.crop_errors)
+
+    def test_modified_in_place(self):
+        before = CropComparison(self.reference, self.methods, self.crops).errors[0]
+        self.methods[0] *= 2
+        after = CropComparison(self.reference, self.methods, self.crops).errors[0]
+        self.assertNotAlmostEqual(before, after)
+        self.assertAlmostEqual(after, simpleimageio.relative_mse(self.methods[0], self.reference), places=5)
+
+    def test_overridden_metric(self):
+        class Mse(CropComparison):
+            def compute_error(self, reference_image, method_image):
+                return simpleimageio.mse(method_image, reference_image)
+
+        cmp = Mse(self.reference, self.methods, self.crops)
+        self.assertAlmostEqual(cmp.errors[1], simpleimageio.mse(self.methods[1], self.reference), places=6)
+        crop = self.crops[0]
+        self.assertAlmostEqual(cmp.crop_errors[0][1],
+            simpleimageio.mse(crop.crop(self.methods[1]), crop.crop(self.reference)), places=6)
+
+if __name__ == "__main__":
+    unittest.main()
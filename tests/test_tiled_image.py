@@ -0,0 +1,68 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import simpleimageio
+
+from figuregen.util import image
+from figuregen.util.image import Cropbox, TiledImage
+
+class TestTiledImage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.pixels = np.random.default_rng(6).random((150, 230, 3)).astype(np.float32)
+        self.filename = os.path.join(self.tmpdir.name, "image.npy")
+        np.save(self.filename, self.pixels)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_regions(self):
+        img = TiledImage(self.filename, tile_size=64)
+        self.assertIsInstance(img.source, np.memmap)
+        self.assertEqual(img.shape, (150, 230, 3))
+
+        crop = Cropbox(top=10, left=200, height=20, width=30, scale=2)
+        np.testing.assert_array_equal(crop.view(img), crop.view(self.pixels))
+        np.testing.assert_array_equal(crop.crop(img), crop.crop(self.pixels))
+
+        tiles = list(img.tiles())
+        self.assertEqual(len(tiles), 3 * 4)
+        self.assertEqual(tiles[-1][2].shape, (150 - 128, 230 - 192, 3))
+
+    def test_apply(self):
+        img = TiledImage(self.pixels, tile_size=64)
+        srgb = img.apply(image.lin_to_srgb)
+        self.assertIsInstance(srgb.source, np.memmap)
+        np.testing.assert_allclose(srgb[:], image.lin_to_srgb(self.pixels), atol=1e-6)
+
+        gray = img.apply(lambda tile: tile.mean(axis=2), out=np.zeros((150, 230), dtype=np.float32))
+        np.testing.assert_allclose(gray[:], self.pixels.mean(axis=2), atol=1e-6)
+
+    def test_downsample(self):
+        img = TiledImage(self.filename, tile_size=32)
+        # Integer factor, including a partial block at the border
+        small = img.downsample(46, 30)
+        np.testing.assert_allclose(small[3, 5], self.pixels[15:20, 25:30].mean(axis=(0, 1)), atol=1e-5)
+        self.assertEqual(small.shape, (30, 46, 3))
+
+        small = img.downsample(100, 60, "bilinear")
+        self.assertEqual(small.shape, (60, 100, 3))
+        expected = image.resize(self.pixels.reshape(75, 2, 115, 2, 3).mean(axis=(1, 3)), 100, 60, "bilinear")
+        np.testing.assert_allclose(small, expected, atol=1e-5)
+
+    def test_npy_file(self):
+        filename = os.path.join(self.tmpdir.name, "image.npy")
+        np.save(filename, self.pixels)
+        img = TiledImage(filename)
+        self.assertIsInstance(img.source, np.memmap)
+        np.testing.assert_array_equal(img[5:10, 7:9], self.pixels[5:10, 7:9])
+
+    def test_other_formats_are_rejected(self):
+        filename = os.path.join(self.tmpdir.name, "image.exr")
+        simpleimageio.write(filename, self.pixels)
+        with self.assertRaises(ValueError):
+            TiledImage(filename)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import simpleimageio
+from PIL import Image
+
+import figuregen
+from figuregen.tikz import TikzBackend
+from figuregen.util import image
+
+class TestTonemap(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.lin = np.random.default_rng(7).random((40, 60, 3)).astype(np.float32) * 1.5
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_matches_lin_to_srgb(self):
+        expected = np.round(np.clip(simpleimageio.lin_to_srgb(self.lin * 0.5), 0, 1) * 255)
+        for lut in [True, False]:
+            result = image.tonemap_uint8(self.lin, exposure=-1, lut=lut, band_pixels=500)
+            self.assertEqual(result.dtype, np.uint8)
+            self.assertLessEqual(np.abs(result.astype(int) - expected).max(), 1)
+
+        gray = image.tonemap_uint8(self.lin[..., 0])
+        self.assertEqual(gray.shape, (40, 60))
+
+    def test_8bit_png_is_written_exactly(self):
+        pixels = image.tonemap_uint8(self.lin)
+        img = figuregen.PNG(pixels)
+        self.assertTrue(img.is_8bit)
+        np.testing.assert_allclose(img.raw_float, pixels / 255)
+
+        filename = img.make_raster(1, 1, os.path.join(self.tmpdir.name, "image"))
+        np.testing.assert_array_equal(np.asarray(Image.open(filename)), pixels)
+
+    def test_8bit_jpeg_with_scale(self):
+        smooth = np.tile(np.linspace(0, 1, 60, dtype=np.float32)[None, :, None], (40, 1, 3))
+        img = figuregen.JPEG(image.tonemap_uint8(smooth), quality=95)
+        img.scale = 2
+        self.assertEqual(img.raw.dtype, np.uint8)
+        self.assertEqual(img.raw.shape, (80, 120, 3))
+
+        filename = img.make_raster(1, 1, os.path.join(self.tmpdir.name, "image"))
+        result = np.asarray(Image.open(filename)).astype(int)
+        self.assertEqual(result.shape, (80, 120, 3))
+        self.assertLess(np.abs(result - img.raw).mean(), 2)
+
+    def test_downsampled_export(self):
+        pixels = image.tonemap_uint8(self.lin)
+        results = []
+        for data in [pixels, pixels / 255]:
+            grid = figuregen.Grid(1, 1)
+            grid[0, 0].image = figuregen.PNG(data)
+            figuregen.figure([[grid]], 10, os.path.join(self.tmpdir.name, "figure.tikz"), TikzBackend(export_dpi=5))
+            results.append(np.asarray(Image.open(os.path.join(self.tmpdir.name, "img-fig0-grid0-row0-col0.png"))))
+        self.assertEqual(results[0].shape, (13, 20, 3))
+        self.assertLessEqual(np.abs(results[0].astype(int) - results[1]).max(), 1)
+
+if __name__ == "__main__":
+    unittest.main()